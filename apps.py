@@ -17,3 +17,9 @@ from django.apps import AppConfig
 
 class VycinityConfig(AppConfig):
     name = 'vycinity'
+
+    def ready(self):
+        from vycinity.meta import list_membership
+        list_membership.connect_signals()
+        from vycinity.s42.adapter import vyos13 as vyos13_adapter
+        vyos13_adapter.connectSignals()
@@ -15,17 +15,58 @@
 
 import base64
 import binascii
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
 import logging
 import re
 from rest_framework import authentication
 from rest_framework import exceptions
+from rest_framework import permissions
 from vycinity.models import customer_models
 
 logger = logging.getLogger(__name__)
 invalid_auth_chars = re.compile(r'[\x00-\x1F\x7F]')
 
+CREDENTIAL_CACHE_TTL = 300
+'''
+Seconds a verified Authorization header is cached, so only the first request pays for the slow
+password hash. Can be overridden by the setting `VYCINITY_CREDENTIAL_CACHE_TTL`, 0 disables the
+cache.
+'''
+
+CREDENTIAL_CACHE_SALT = 'vycinity.authentication.LocalUserAuthentication'
+
+def get_credential_cache_key(authorization: str) -> str:
+    '''
+    Returns the cache key for an Authorization header. The header is hashed with a key derived
+    from `SECRET_KEY`, so the cache neither contains credentials nor allows to verify guesses.
+    '''
+    return 'vycinity.auth.' + salted_hmac(CREDENTIAL_CACHE_SALT, authorization).hexdigest()
+
+def get_auth_fingerprint(localauth: customer_models.LocalUserAuth) -> str:
+    '''
+    Returns a keyed hash of the stored password hash. A cached verification is only valid as long
+    as the fingerprint matches, so changing or removing the password invalidates it.
+    '''
+    return salted_hmac(CREDENTIAL_CACHE_SALT, localauth.auth).hexdigest()
+
 class LocalUserAuthentication(authentication.BaseAuthentication):
+    def get_cached_credentials(self, authorization: str, username: str):
+        '''
+        Returns the user and the verified LocalUserAuth, if the Authorization header was verified
+        recently and the password was not changed since. Returns None otherwise.
+        '''
+        cached = cache.get(get_credential_cache_key(authorization))
+        if cached is None:
+            return None
+        (localauth_id, fingerprint) = cached
+        localauth = customer_models.LocalUserAuth.objects.select_related('user__customer').filter(pk=localauth_id).first()
+        if localauth is None or localauth.user.name != username or not constant_time_compare(fingerprint, get_auth_fingerprint(localauth)):
+            return None
+        return (localauth.user, localauth)
+
     def authenticate(self, request):
         authorization = request.META.get("HTTP_AUTHORIZATION")
         if not authorization:
@@ -48,6 +89,12 @@ class LocalUserAuthentication(authentication.BaseAuthentication):
             logger.info('Dekodieren von Authorization fehlgeschlagen', exc_info = e)
             return None
 
+        ttl = getattr(settings, 'VYCINITY_CREDENTIAL_CACHE_TTL', CREDENTIAL_CACHE_TTL)
+        if ttl > 0:
+            cached_credentials = self.get_cached_credentials(authorization, username)
+            if cached_credentials is not None:
+                return cached_credentials
+
         user = None
         try:
             user = customer_models.User.objects.get(name = username)
@@ -56,9 +103,45 @@ class LocalUserAuthentication(authentication.BaseAuthentication):
             return None
         for localauth in user.localuserauth_set.all():
             if check_password(password, localauth.auth):
+                if ttl > 0:
+                    cache.set(get_credential_cache_key(authorization), (localauth.id, get_auth_fingerprint(localauth)), ttl)
                 return (user, localauth)
         
         raise exceptions.AuthenticationFailed('Authentication failed')
 
     def authenticate_header(self, request):
-        return 'Basic realm="VyCinity User", charset="UTF-8"'
\ No newline at end of file
+        return 'Basic realm="VyCinity User", charset="UTF-8"'
+
+class APITokenAuthentication(authentication.BaseAuthentication):
+    '''
+    Authenticates requests with `Authorization: Bearer <token>` by an API token. The token is found
+    by its indexed lookup prefix and verified by a keyed hash, so no slow password hash is involved.
+    Tokens without the scope `write` may only be used for safe methods.
+    '''
+
+    def authenticate(self, request):
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if not authorization:
+            return None
+        authsplit = authorization.split(' ')
+        if authsplit[0] != 'Bearer' or len(authsplit) != 2:
+            return None
+        token_parts = customer_models.APIToken.split_token(authsplit[1])
+        if token_parts is None:
+            raise exceptions.AuthenticationFailed('Authentication failed')
+        (lookup, secret) = token_parts
+
+        api_token = customer_models.APIToken.objects.select_related('user__customer').filter(lookup=lookup).first()
+        if api_token is None or not api_token.verify(secret):
+            logger.debug('API-Token "%s" ist ungültig', lookup)
+            raise exceptions.AuthenticationFailed('Authentication failed')
+        # the scope write includes reading
+        required_scopes = {customer_models.API_TOKEN_SCOPE_WRITE}
+        if request.method in permissions.SAFE_METHODS:
+            required_scopes.add(customer_models.API_TOKEN_SCOPE_READ)
+        if len(required_scopes & set(api_token.scopes)) == 0:
+            raise exceptions.PermissionDenied('Token scopes do not allow this request.')
+        return (api_token.user, api_token)
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="VyCinity User"'
@@ -0,0 +1,128 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+'''
+Helpers for measuring query counts, wall time and memory usage of VyCinity operations.
+'''
+
+import json
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCHMARK_FORMAT_VERSION = 1
+
+@dataclass
+class Measurement:
+    '''
+    A single measurement of an operation at a given data size.
+    '''
+    name: str
+    size: int
+    queries: int
+    wall_time: float
+    peak_memory: int
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> Tuple[str, int]:
+        return (self.name, self.size)
+
+
+def measure(name: str, size: int, operation: Callable[[], Any]) -> Tuple[Measurement, Any]:
+    '''
+    Runs an operation and measures it.
+
+    params:
+        name: The name of the measured operation.
+        size: The data size the operation was run on.
+        operation: A callable without parameters doing the work.
+
+    returns: A tuple of the measurement and the result of the operation.
+    '''
+    with CaptureQueriesContext(connection) as captured_queries:
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            result = operation()
+        finally:
+            wall_time = time.perf_counter() - start
+            (_, peak_memory) = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return (Measurement(name=name, size=size, queries=len(captured_queries), wall_time=wall_time, peak_memory=peak_memory), result)
+
+
+def write_measurements(measurements: List[Measurement], path: str, meta: Optional[Dict[str, Any]] = None) -> None:
+    '''
+    Writes measurements as JSON to a file, so runs can be compared later.
+    '''
+    with open(path, 'w') as output:
+        json.dump({
+            'version': BENCHMARK_FORMAT_VERSION,
+            'meta': meta or {},
+            'measurements': [asdict(measurement) for measurement in measurements]
+        }, output, indent=2)
+
+
+def read_measurements(path: str) -> List[Measurement]:
+    '''
+    Reads measurements written by `write_measurements`.
+    '''
+    with open(path) as source:
+        content = json.load(source)
+    if content.get('version') != BENCHMARK_FORMAT_VERSION:
+        raise ValueError('Unsupported benchmark format version {}'.format(content.get('version')))
+    return [Measurement(**measurement) for measurement in content['measurements']]
+
+
+def find_query_regressions(baseline: List[Measurement], current: List[Measurement], tolerance: int = 0) -> List[Tuple[Measurement, Measurement]]:
+    '''
+    Compares query counts of two runs.
+
+    params:
+        baseline: The measurements of an earlier run.
+        current: The measurements of the current run.
+        tolerance: The number of additional queries accepted before reporting.
+
+    returns: A list of (baseline, current) tuples with more queries in the current run.
+    '''
+    baseline_by_key = {measurement.key: measurement for measurement in baseline}
+    rtn = []
+    for measurement in current:
+        previous = baseline_by_key.get(measurement.key)
+        if previous is not None and measurement.queries > previous.queries + tolerance:
+            rtn.append((previous, measurement))
+    return rtn
+
+
+def find_query_growth(measurements: List[Measurement]) -> Dict[str, Tuple[int, int]]:
+    '''
+    Finds operations whose query count grows with the data size, a typical sign of N+1 queries.
+
+    returns: A dict with the operation name as key and the query count of the smallest and the
+             largest size as value.
+    '''
+    by_name: Dict[str, List[Measurement]] = {}
+    for measurement in measurements:
+        by_name.setdefault(measurement.name, []).append(measurement)
+    rtn = {}
+    for (name, named_measurements) in by_name.items():
+        named_measurements.sort(key=lambda m: m.size)
+        if named_measurements[-1].queries > named_measurements[0].queries:
+            rtn[name] = (named_measurements[0].queries, named_measurements[-1].queries)
+    return rtn
@@ -0,0 +1,87 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+'''
+Benchmark of the configuration generation and the config operations for VyOS 1.3 routers.
+'''
+
+import copy
+from dataclasses import asdict
+from typing import Any, Dict, List
+from vycinity.benchmarks import Measurement, measure
+from vycinity.benchmarks.generators import FleetParameters
+from vycinity.models import basic_models
+from vycinity.s42.adapter import vyos13 as Vyos13Adapter
+from vycinity.s42.routerconfig.vyos13 import Vyos13RouterConfig
+
+PHASE_GENERATE = 'generateConfig'
+PHASE_MERGE = 'merge'
+PHASE_DIFF = 'diff'
+PHASE_GEN_API_COMMANDS = 'genApiCommands'
+
+def simulate_live_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Derives a configuration as it could be found on a router before deployment: every second
+    firewall rule is missing and some unmanaged configuration exists.
+    '''
+    rtn = copy.deepcopy(config)
+    for firewall_type in ['name', 'ipv6-name']:
+        for firewall in rtn.get('firewall', {}).get(firewall_type, {}).values():
+            rules = firewall.get('rule', {})
+            for rule_number in list(rules.keys())[::2]:
+                del rules[rule_number]
+    rtn.setdefault('system', {})['host-name'] = 'outdated'
+    return rtn
+
+
+def benchmark_config_operations(routers: List[basic_models.Vyos13Router], parameters: FleetParameters, size: int) -> List[Measurement]:
+    '''
+    Measures generation, merge, diff and command generation for a list of routers. Each phase is
+    measured for all routers together, as single runs are too short for a useful measurement.
+
+    params:
+        routers: The routers to generate the configuration for.
+        parameters: The parameters the fleet was generated with, stored with the measurements.
+        size: The size of this run.
+
+    returns: One measurement per phase.
+    '''
+    extra = asdict(parameters)
+    rtn = []
+
+    generated: List[Vyos13RouterConfig] = []
+    (measurement, _) = measure(PHASE_GENERATE, size, lambda: generated.extend(Vyos13Adapter.generateConfig(router) for router in routers))
+    rtn.append(measurement)
+    live_configs = [simulate_live_config(config.config) for config in generated]
+
+    # Configs get modified by merge and diff, so every phase gets its own copy.
+    merge_input = [(Vyos13RouterConfig([], copy.deepcopy(live)), Vyos13RouterConfig([], copy.deepcopy(config.config))) for (live, config) in zip(live_configs, generated)]
+    (measurement, _) = measure(PHASE_MERGE, size, lambda: [left.merge(right, False) for (left, right) in merge_input])
+    rtn.append(measurement)
+
+    diff_input = [(Vyos13RouterConfig([], copy.deepcopy(live)), Vyos13RouterConfig([], copy.deepcopy(config.config))) for (live, config) in zip(live_configs, generated)]
+    diffs = []
+    (measurement, _) = measure(PHASE_DIFF, size, lambda: diffs.extend(left.diff(right) for (left, right) in diff_input))
+    rtn.append(measurement)
+
+    commands = []
+    (measurement, _) = measure(PHASE_GEN_API_COMMANDS, size, lambda: commands.extend(diff.genApiCommands() for diff in diffs))
+    measurement.extra['commands'] = sum(len(router_commands) for router_commands in commands)
+    rtn.append(measurement)
+
+    for measurement in rtn:
+        measurement.extra.update(extra)
+        measurement.extra['config_size'] = sum(len(str(config.config)) for config in generated)
+    return rtn
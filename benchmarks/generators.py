@@ -0,0 +1,210 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+'''
+Generators for synthetic data used by benchmarks.
+'''
+
+from dataclasses import dataclass, field
+from django.contrib.auth.hashers import make_password
+from typing import Dict, List, Optional, Type
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED, AbstractOwnedObject, basic_models, change_models, customer_models, firewall_models, network_models
+
+@dataclass
+class GeneratedTenant:
+    '''
+    A customer with a user and all generated owned objects, grouped by their model.
+    '''
+    customer: customer_models.Customer
+    user: customer_models.User
+    password: str
+    objects: Dict[Type[AbstractOwnedObject], List[AbstractOwnedObject]] = field(default_factory=dict)
+
+    def first(self, model: Type[AbstractOwnedObject]) -> Optional[AbstractOwnedObject]:
+        if model in self.objects and len(self.objects[model]) > 0:
+            return self.objects[model][0]
+        return None
+
+
+class _ObjectFactory:
+    '''
+    Creates owned objects for a tenant either live or prepared inside a changeset.
+    '''
+    def __init__(self, tenant: GeneratedTenant, changeset: Optional[change_models.ChangeSet]):
+        self.tenant = tenant
+        self.changeset = changeset
+
+    def create(self, model: Type[AbstractOwnedObject], **kwargs) -> AbstractOwnedObject:
+        state = OWNED_OBJECT_STATE_LIVE if self.changeset is None else OWNED_OBJECT_STATE_PREPARED
+        instance = model.objects.create(state=state, **kwargs)
+        if self.changeset is not None:
+            change_models.Change.objects.create(changeset=self.changeset, entity=model.__name__, post=instance, action=change_models.ACTION_CREATED)
+        self.tenant.objects.setdefault(model, []).append(instance)
+        return instance
+
+
+def _network_index_offset() -> int:
+    return network_models.Network.objects.count()
+
+
+def create_tenant(name: str, password: str = 'benchmark', parent: Optional[customer_models.Customer] = None) -> GeneratedTenant:
+    '''
+    Creates a customer together with a user authenticating via basic auth.
+    '''
+    customer = customer_models.Customer.objects.create(name=name, parent_customer=parent)
+    user = customer_models.User.objects.create(name=name, customer=customer)
+    customer_models.LocalUserAuth.objects.create(user=user, auth=make_password(password))
+    return GeneratedTenant(customer=customer, user=user, password=password)
+
+
+def generate_tenant_tree(tenant: GeneratedTenant, networks: int, rulesets_per_firewall: int = 2, rules_per_ruleset: int = 10, hosts_per_network: int = 5, list_depth: int = 1, changeset: Optional[change_models.ChangeSet] = None) -> GeneratedTenant:
+    '''
+    Generates a synthetic tree of owned objects for a tenant.
+
+    For every network a network address object, a cidr address object, host address objects, a
+    list address object containing the hosts, a firewall with rulesets and basic and custom rules
+    are created. Additionally service objects are shared across the firewalls of the tenant.
+
+    params:
+        tenant: The tenant owning the objects.
+        networks: The number of networks to create.
+        rulesets_per_firewall: The number of rulesets attached to each firewall.
+        rules_per_ruleset: The number of basic rules per ruleset. Additionally a single custom
+                           rule is created per ruleset.
+        hosts_per_network: The number of host address objects in each network.
+        list_depth: The nesting depth of the list address object containing the hosts.
+        changeset: If given, all objects are created as prepared objects inside this changeset
+                   instead of being live.
+
+    returns: The tenant with the generated objects.
+    '''
+    factory = _ObjectFactory(tenant, changeset)
+    owner = tenant.customer
+
+    services = []
+    for port in [22, 80, 443]:
+        services.append(factory.create(firewall_models.SimpleServiceObject, owner=owner, name='tcp_%d' % port, protocol='tcp', port=port))
+    service_list = factory.create(firewall_models.ListServiceObject, owner=owner, name='tcp_web')
+    service_list.elements.set(services[1:])
+    services.append(service_list)
+    services.append(factory.create(firewall_models.RangeServiceObject, owner=owner, name='tcp_high', protocol='tcp', start_port=8000, end_port=8999))
+    foreign_address = factory.create(firewall_models.CIDRAddressObject, owner=owner, name='documentation', ipv4_network_address='192.0.2.0', ipv4_network_bits=24, ipv6_network_address='2001:db8::', ipv6_network_bits=32)
+
+    offset = _network_index_offset()
+    for network_index in range(offset, offset + networks):
+        network = factory.create(network_models.Network, owner=owner,
+            name='net%d' % network_index,
+            ipv4_network_address='10.%d.%d.0' % ((network_index >> 8) & 0xff, network_index & 0xff),
+            ipv4_network_bits=24,
+            ipv6_network_address='fd00:0:0:%x::' % network_index,
+            ipv6_network_bits=64,
+            layer2_network_id=(network_index % 4093) + 1)
+        network_address = factory.create(firewall_models.NetworkAddressObject, owner=owner, name='net%d' % network_index, related_network=network)
+        hosts = []
+        for host_index in range(hosts_per_network):
+            hosts.append(factory.create(firewall_models.HostAddressObject, owner=owner,
+                name='net%d_host%d' % (network_index, host_index),
+                ipv4_address='10.%d.%d.%d' % ((network_index >> 8) & 0xff, network_index & 0xff, host_index + 10),
+                ipv6_address='fd00:0:0:%x::%x' % (network_index, host_index + 10)))
+        host_list = factory.create(firewall_models.ListAddressObject, owner=owner, name='net%d_hosts' % network_index)
+        host_list.elements.set(hosts)
+        for depth in range(1, list_depth):
+            outer_list = factory.create(firewall_models.ListAddressObject, owner=owner, name='net%d_hosts_%d' % (network_index, depth))
+            outer_list.elements.set([host_list, hosts[depth % len(hosts)]] if len(hosts) > 0 else [host_list])
+            host_list = outer_list
+        factory.create(firewall_models.CIDRAddressObject, owner=owner, name='net%d_upper' % network_index,
+            ipv4_network_address='10.%d.%d.128' % ((network_index >> 8) & 0xff, network_index & 0xff), ipv4_network_bits=25)
+        destinations = [network_address, host_list] + hosts
+
+        firewall = factory.create(firewall_models.Firewall, owner=owner, name='fw%d' % network_index, stateful=True, related_network=network,
+            default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT)
+        for ruleset_index in range(rulesets_per_firewall):
+            ruleset = factory.create(firewall_models.RuleSet, owner=owner, priority=ruleset_index * 10, comment='fw%d_rs%d' % (network_index, ruleset_index))
+            ruleset.firewalls.set([firewall])
+            for rule_index in range(rules_per_ruleset):
+                factory.create(firewall_models.BasicRule, related_ruleset=ruleset, priority=rule_index * 10, disable=False,
+                    source_address=foreign_address,
+                    destination_address=destinations[rule_index % len(destinations)],
+                    destination_service=services[rule_index % len(services)],
+                    action=firewall_models.ACTION_ACCEPT, log=False)
+            factory.create(firewall_models.CustomRule, related_ruleset=ruleset, priority=rules_per_ruleset * 10, disable=False,
+                ip_version=firewall_models.IP_VERSION_4, direction=firewall_models.DIRECTION_FROM,
+                rule_definition={'action': 'accept', 'protocol': 'icmp'})
+    return tenant
+
+
+def generate_changeset(tenant: GeneratedTenant, networks: int = 1) -> change_models.ChangeSet:
+    '''
+    Creates a changeset for the tenant containing a generated tree of prepared objects.
+    '''
+    changeset = change_models.ChangeSet.objects.create(owner=tenant.customer, user=tenant.user, owner_name=tenant.customer.name, user_name=tenant.user.name)
+    prepared = GeneratedTenant(customer=tenant.customer, user=tenant.user, password=tenant.password)
+    generate_tenant_tree(prepared, networks=networks, rulesets_per_firewall=1, rules_per_ruleset=2, hosts_per_network=1, changeset=changeset)
+    return changeset
+
+
+@dataclass
+class FleetParameters:
+    '''
+    Parameters of a synthetic fleet of routers.
+    '''
+    routers: int = 1
+    networks_per_router: int = 5
+    rulesets_per_firewall: int = 2
+    rules_per_ruleset: int = 10
+    hosts_per_network: int = 5
+    list_depth: int = 1
+    static_sections: int = 2
+
+
+def generate_fleet(tenant: GeneratedTenant, parameters: FleetParameters) -> List[basic_models.Vyos13Router]:
+    '''
+    Generates VyOS 1.3 routers, each with its own networks including firewalls and managed
+    interfaces (every second one using VRRP). The static config sections are shared by all routers.
+    The firewall objects are generated for the given tenant.
+
+    returns: The list of generated routers.
+    '''
+    existing_networks = len(tenant.objects.get(network_models.Network, []))
+    generate_tenant_tree(tenant, networks=parameters.routers * parameters.networks_per_router,
+        rulesets_per_firewall=parameters.rulesets_per_firewall, rules_per_ruleset=parameters.rules_per_ruleset,
+        hosts_per_network=parameters.hosts_per_network, list_depth=parameters.list_depth)
+    networks = tenant.objects[network_models.Network][existing_networks:]
+
+    static_sections = []
+    for section_index in range(parameters.static_sections):
+        static_sections.append(basic_models.Vyos13StaticConfigSection.objects.create(description='benchmark section %d' % section_index, absolute=False,
+            context=['system'], content={'ntp': {'server': {'%d.pool.ntp.org' % section_index: {}}}, 'name-server': ['192.0.2.%d' % (section_index + 1)]}))
+    if parameters.static_sections > 0:
+        static_sections.append(basic_models.Vyos13StaticConfigSection.objects.create(description='benchmark absolute section', absolute=True,
+            context=['service', 'ssh'], content={'port': '22'}))
+
+    offset = basic_models.Router.objects.count()
+    rtn = []
+    for router_index in range(offset, offset + parameters.routers):
+        router = basic_models.Vyos13Router.objects.create(name='benchmark%d' % router_index, loopback='127.%d.%d.%d' % (((router_index >> 16) & 0xff) + 1, (router_index >> 8) & 0xff, router_index & 0xff),
+            deploy=False, token='benchmark', fingerprint='benchmark', managed_interface_context=['interfaces', 'ethernet', 'eth1'])
+        router.active_static_configs.set(static_sections)
+        first_network = (router_index - offset) * parameters.networks_per_router
+        for (interface_index, network) in enumerate(networks[first_network:first_network + parameters.networks_per_router]):
+            ipv4_prefix = network.ipv4_network_address.rsplit('.', 1)[0]
+            ipv6_prefix = network.ipv6_network_address.rstrip(':')
+            if interface_index % 2 == 0:
+                network_models.ManagedInterface.objects.create(router=router, network=network, ipv4_address=ipv4_prefix + '.1', ipv6_address=ipv6_prefix + '::1')
+            else:
+                network_models.ManagedVRRPInterface.objects.create(router=router, network=network, ipv4_address=ipv4_prefix + '.2', ipv6_address=ipv6_prefix + '::2',
+                    ipv4_service_address=ipv4_prefix + '.1', ipv6_service_address=ipv6_prefix + '::1', priority=100, vrid=(interface_index % 255) + 1)
+        rtn.append(router)
+    return rtn
@@ -0,0 +1,271 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+'''
+A local stand-in for the HTTP API of VyOS 1.3 routers. It keeps the configuration in memory and
+supports `showConfig` via `/retrieve` and `set`/`delete` via `/configure`, which is everything
+VyCinity uses. Many simulated routers can be run in one process for load testing deployments.
+'''
+
+import copy
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SimulatedRouterSettings:
+    '''
+    Behaviour of a simulated router.
+
+    attributes:
+        api_key: The key the router accepts.
+        latency: Seconds added to every request.
+        commit_duration: Seconds a successful `/configure` request takes additionally. Commits are
+                         serialized per router like on a real router.
+        configure_failure_rate: Probability (0-1) of a `/configure` request failing without
+                                changing the configuration.
+        retrieve_failure_rate: Probability (0-1) of a `/retrieve` request failing.
+        payload_entries: Number of synthetic address groups in the initial configuration, to
+                         simulate routers with big configurations.
+        initial_config: The configuration the router starts with.
+        seed: Seed for the failure injection, for reproducible runs.
+    '''
+    api_key: str = 'simulator'
+    latency: float = 0.0
+    commit_duration: float = 0.0
+    configure_failure_rate: float = 0.0
+    retrieve_failure_rate: float = 0.0
+    payload_entries: int = 0
+    initial_config: Dict[str, Any] = field(default_factory=dict)
+    seed: Optional[int] = None
+
+
+class SimulatedCommandError(Exception):
+    '''Describes an invalid command sent to the simulated router'''
+
+
+class SimulatedVyos13Router:
+    '''
+    The in-memory state of a single simulated router.
+    '''
+
+    def __init__(self, settings: SimulatedRouterSettings):
+        self.settings = settings
+        self.config = copy.deepcopy(settings.initial_config)
+        for index in range(settings.payload_entries):
+            self.config.setdefault('firewall', {}).setdefault('group', {}).setdefault('address-group', {})['simulated-%d' % index] = {
+                'address': ['198.51.%d.%d' % ((index >> 8) & 0xff, index & 0xff)],
+                'description': 'simulated payload %d' % index
+            }
+        self.lock = threading.Lock()
+        self.random = random.Random(settings.seed)
+        self.retrieve_count = 0
+        self.configure_count = 0
+        self.failed_count = 0
+
+    def show_config(self, path: List[str]) -> Union[Dict[str, Any], List[str], str]:
+        node: Any = self.config
+        for hop in path:
+            if not isinstance(node, dict) or hop not in node:
+                raise SimulatedCommandError('Configuration under specified path is empty')
+            node = node[hop]
+        return copy.deepcopy(node)
+
+    def _set(self, path: List[str], value: Optional[str]) -> None:
+        if len(path) == 0:
+            raise SimulatedCommandError('Path for set must not be empty')
+        node = self.config
+        for hop in path[:-1]:
+            child = node.get(hop)
+            if not isinstance(child, dict):
+                # a leaf in the way gets converted to a node, as VyOS does not allow this anyway
+                child = {}
+                node[hop] = child
+            node = child
+        key = path[-1]
+        if value is None:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+        elif key not in node or isinstance(node[key], dict):
+            node[key] = value
+        elif isinstance(node[key], list):
+            if value not in node[key]:
+                node[key].append(value)
+        elif node[key] != value:
+            node[key] = [node[key], value]
+
+    def _delete(self, path: List[str]) -> None:
+        if len(path) == 0:
+            self.config = {}
+            return
+        parent: Any = self.config
+        for hop in path[:-1]:
+            if not isinstance(parent, dict) or hop not in parent:
+                break
+            parent = parent[hop]
+        else:
+            if isinstance(parent, dict) and path[-1] in parent:
+                del parent[path[-1]]
+                return
+        # The last element may be a value of a leaf, like VyOS accepts `delete <leaf> <value>`.
+        (leaf_parent, leaf) = (self.config, None)
+        for hop in path[:-2]:
+            if not isinstance(leaf_parent, dict) or hop not in leaf_parent:
+                raise SimulatedCommandError('Nothing to delete at {}'.format(' '.join(path)))
+            leaf_parent = leaf_parent[hop]
+        if len(path) >= 2 and isinstance(leaf_parent, dict):
+            leaf = leaf_parent.get(path[-2])
+        if isinstance(leaf, list) and path[-1] in leaf:
+            leaf.remove(path[-1])
+            if len(leaf) == 0:
+                del leaf_parent[path[-2]]
+        elif isinstance(leaf, str) and leaf == path[-1]:
+            del leaf_parent[path[-2]]
+        else:
+            raise SimulatedCommandError('Nothing to delete at {}'.format(' '.join(path)))
+
+    def configure(self, commands: List[Dict[str, Any]]) -> None:
+        '''
+        Applies a list of commands atomically. Either all commands are applied or none.
+        '''
+        with self.lock:
+            self.configure_count += 1
+            if self.random.random() < self.settings.configure_failure_rate:
+                self.failed_count += 1
+                raise SimulatedCommandError('Simulated commit failure')
+            backup = copy.deepcopy(self.config)
+            try:
+                for command in commands:
+                    if not isinstance(command, dict) or 'op' not in command or not isinstance(command.get('path'), list):
+                        raise SimulatedCommandError('Invalid command {}'.format(json.dumps(command)))
+                    path = [str(hop) for hop in command['path']]
+                    if command['op'] == 'set':
+                        value = command.get('value')
+                        self._set(path, None if value is None else str(value))
+                    elif command['op'] == 'delete':
+                        self._delete(path)
+                    else:
+                        raise SimulatedCommandError('Unsupported operation {}'.format(command['op']))
+            except SimulatedCommandError:
+                self.config = backup
+                self.failed_count += 1
+                raise
+            if self.settings.commit_duration > 0:
+                time.sleep(self.settings.commit_duration)
+
+    def retrieve(self, command: Dict[str, Any]) -> Any:
+        with self.lock:
+            self.retrieve_count += 1
+            if self.random.random() < self.settings.retrieve_failure_rate:
+                self.failed_count += 1
+                raise SimulatedCommandError('Simulated retrieval failure')
+            if not isinstance(command, dict) or command.get('op') != 'showConfig':
+                raise SimulatedCommandError('Unsupported operation')
+            return self.show_config([str(hop) for hop in command.get('path', [])])
+
+
+class Vyos13SimulatorRequestHandler(BaseHTTPRequestHandler):
+    '''
+    Handles the HTTP requests for a single simulated router. The router is attached to the server.
+    '''
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug('%s: %s', self.address_string(), format % args)
+
+    def send_json(self, status: HTTPStatus, content: Dict[str, Any]) -> None:
+        body = json.dumps(content).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        router: SimulatedVyos13Router = self.server.router # type: ignore
+        if router.settings.latency > 0:
+            time.sleep(router.settings.latency)
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        if form.get('key', [None])[0] != router.settings.api_key:
+            self.send_json(HTTPStatus.FORBIDDEN, {'success': False, 'error': 'Valid API key is required', 'data': None})
+            return
+        try:
+            data = json.loads(form.get('data', ['null'])[0])
+        except json.JSONDecodeError:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'success': False, 'error': 'Failed to parse JSON', 'data': None})
+            return
+        try:
+            if self.path == '/retrieve':
+                self.send_json(HTTPStatus.OK, {'success': True, 'error': None, 'data': router.retrieve(data)})
+            elif self.path == '/configure':
+                router.configure(data if isinstance(data, list) else [data])
+                self.send_json(HTTPStatus.OK, {'success': True, 'error': None, 'data': None})
+            else:
+                self.send_json(HTTPStatus.NOT_FOUND, {'success': False, 'error': 'Not found', 'data': None})
+        except SimulatedCommandError as sce:
+            self.send_json(HTTPStatus.BAD_REQUEST, {'success': False, 'error': str(sce), 'data': None})
+
+
+class Vyos13Simulator:
+    '''
+    Runs simulated routers, each with its own HTTP server in a separate thread.
+    '''
+
+    def __init__(self):
+        self.servers: Dict[Tuple[str, int], ThreadingHTTPServer] = {}
+        self.threads: List[threading.Thread] = []
+
+    def add_router(self, host: str, port: int, settings: SimulatedRouterSettings) -> Tuple[Tuple[str, int], SimulatedVyos13Router]:
+        '''
+        Starts a simulated router listening on the given address. Port 0 selects a free port.
+
+        returns: The actual address of the server and the simulated router.
+        '''
+        server = ThreadingHTTPServer((host, port), Vyos13SimulatorRequestHandler)
+        server.daemon_threads = True
+        server.router = SimulatedVyos13Router(settings) # type: ignore
+        address = server.server_address[:2]
+        self.servers[address] = server
+        thread = threading.Thread(target=server.serve_forever, name='vyos13-simulator-%s:%d' % address, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return (address, server.router) # type: ignore
+
+    def routers(self) -> Dict[Tuple[str, int], SimulatedVyos13Router]:
+        return {address: server.router for (address, server) in self.servers.items()} # type: ignore
+
+    def stop(self) -> None:
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+        for thread in self.threads:
+            thread.join()
+        self.servers = {}
+        self.threads = []
+
+    def __enter__(self) -> 'Vyos13Simulator':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
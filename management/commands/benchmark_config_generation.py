@@ -0,0 +1,54 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import uuid
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from vycinity.benchmarks import write_measurements
+from vycinity.benchmarks.configuration import benchmark_config_operations
+from vycinity.benchmarks.generators import FleetParameters, create_tenant, generate_fleet
+from typing import Any, Optional
+
+class Command(BaseCommand):
+    help = 'Benchmarks config generation, merge, diff and command generation on a synthetic fleet. All generated data is rolled back afterwards.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--routers', dest='routers', type=int, nargs='+', default=[1, 5, 20], help='router counts to benchmark, one run per count')
+        parser.add_argument('--networks', dest='networks', type=int, default=5, help='networks per router')
+        parser.add_argument('--rulesets', dest='rulesets', type=int, default=2, help='rulesets per firewall')
+        parser.add_argument('--rules', dest='rules', type=int, default=10, help='basic rules per ruleset')
+        parser.add_argument('--hosts', dest='hosts', type=int, default=5, help='host address objects per network')
+        parser.add_argument('--list-depth', dest='list_depth', type=int, default=1, help='nesting depth of list address objects')
+        parser.add_argument('--static-sections', dest='static_sections', type=int, default=2, help='static config sections shared by all routers of a run, plus one absolute section if positive')
+        parser.add_argument('--output', dest='output', help='file to write the measurements to as JSON')
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        if min(options['routers']) < 1:
+            raise CommandError('Router counts have to be positive')
+        measurements = []
+        with transaction.atomic():
+            for router_count in options['routers']:
+                parameters = FleetParameters(routers=router_count, networks_per_router=options['networks'], rulesets_per_firewall=options['rulesets'],
+                    rules_per_ruleset=options['rules'], hosts_per_network=options['hosts'], list_depth=options['list_depth'],
+                    static_sections=options['static_sections'])
+                tenant = create_tenant('benchmark-%s' % uuid.uuid4())
+                routers = generate_fleet(tenant, parameters)
+                for measurement in benchmark_config_operations(routers, parameters, router_count):
+                    measurements.append(measurement)
+                    self.stdout.write('%-16s routers=%-5d queries=%-7d time=%9.4fs peak=%8.1fKiB' % (measurement.name, measurement.size, measurement.queries, measurement.wall_time, measurement.peak_memory / 1024))
+            transaction.set_rollback(True)
+        if options['output']:
+            write_measurements(measurements, options['output'], meta={'benchmark': 'config_generation'})
+            self.stdout.write('Measurements written to %s' % options['output'])
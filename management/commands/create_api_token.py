@@ -0,0 +1,44 @@
+# This file is part of VyCinity.
+# 
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+# 
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+# 
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.utils import timezone
+from vycinity.models.customer_models import API_TOKEN_SCOPE_READ, API_TOKEN_SCOPES, APIToken, User
+from typing import Any, Optional
+
+class Command(BaseCommand):
+    help = 'Creates an API token for a user. The token is printed once and can\'t be recovered later.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--user', dest='username', required=True, help='username')
+        parser.add_argument('--name', dest='name', required=True, help='name of the token, e.g. the pipeline using it')
+        parser.add_argument('--scope', dest='scopes', action='append', choices=[scope for (scope, _) in API_TOKEN_SCOPES], help='scope of the token, may be repeated (default: read)')
+        parser.add_argument('--expires-in', dest='expires_in', type=int, help='days until the token expires (default: never)')
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        user = None
+        try:
+            user = User.objects.get(name = options['username'])
+        except User.DoesNotExist:
+            raise CommandError('User does not exist')
+        expires = None
+        if options['expires_in'] is not None:
+            if options['expires_in'] <= 0:
+                raise CommandError('Expiry has to be at least one day')
+            expires = timezone.now() + datetime.timedelta(days=options['expires_in'])
+        (api_token, token) = APIToken.mint(user, options['name'], sorted(set(options['scopes'] or [API_TOKEN_SCOPE_READ])), expires)
+        self.stdout.write('New token id: %s' % api_token.id)
+        self.stdout.write('Token: %s' % token)
@@ -0,0 +1,68 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import time
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from vycinity.benchmarks.vyos13_simulator import SimulatedRouterSettings, Vyos13Simulator
+from vycinity.models.basic_models import Vyos13Router
+from typing import Any, Optional
+
+class Command(BaseCommand):
+    help = ('Runs simulated VyOS 1.3 routers for load testing deployments. Either every router in the database is simulated on its '
+        'loopback address (set VYCINITY_VYOS13_ENDPOINT to e.g. "http://{address}:8443") or a number of routers on consecutive ports.')
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--from-database', dest='from_database', action='store_true', help='simulate all VyOS 1.3 routers of the database on their loopback address')
+        parser.add_argument('--port', dest='port', type=int, default=8443, help='port (or first port when not using --from-database)')
+        parser.add_argument('--count', dest='count', type=int, default=1, help='number of routers when not using --from-database')
+        parser.add_argument('--host', dest='host', default='127.0.0.1', help='listen address when not using --from-database')
+        parser.add_argument('--api-key', dest='api_key', default='simulator', help='api key when not using --from-database, otherwise the router tokens are used')
+        parser.add_argument('--latency', dest='latency', type=float, default=0.0, help='seconds added to every request')
+        parser.add_argument('--commit-duration', dest='commit_duration', type=float, default=0.0, help='seconds a commit takes')
+        parser.add_argument('--configure-failure-rate', dest='configure_failure_rate', type=float, default=0.0, help='probability of a failing commit')
+        parser.add_argument('--retrieve-failure-rate', dest='retrieve_failure_rate', type=float, default=0.0, help='probability of a failing retrieval')
+        parser.add_argument('--payload-entries', dest='payload_entries', type=int, default=0, help='synthetic address groups in the initial configuration')
+        parser.add_argument('--seed', dest='seed', type=int, default=None, help='seed for the failure injection')
+
+    def handle(self, *args: Any, **options: Any) -> Optional[str]:
+        def router_settings(api_key: str, index: int) -> SimulatedRouterSettings:
+            return SimulatedRouterSettings(api_key=api_key, latency=options['latency'], commit_duration=options['commit_duration'],
+                configure_failure_rate=options['configure_failure_rate'], retrieve_failure_rate=options['retrieve_failure_rate'],
+                payload_entries=options['payload_entries'], seed=None if options['seed'] is None else options['seed'] + index)
+
+        simulator = Vyos13Simulator()
+        try:
+            if options['from_database']:
+                for (index, router) in enumerate(Vyos13Router.objects.all()):
+                    (address, _) = simulator.add_router(router.loopback, options['port'], router_settings(router.token, index))
+                    self.stdout.write('Simulating router %s on %s:%d' % (router.name, *address))
+            else:
+                for index in range(options['count']):
+                    (address, _) = simulator.add_router(options['host'], options['port'] + index, router_settings(options['api_key'], index))
+                    self.stdout.write('Simulating router on %s:%d' % address)
+        except OSError as ose:
+            simulator.stop()
+            raise CommandError('Failed to start simulated router: %s' % ose) from ose
+
+        self.stdout.write('%d simulated routers running, stop with Ctrl+C' % len(simulator.servers))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for (address, router) in simulator.routers().items():
+                self.stdout.write('%s:%d retrieved=%d configured=%d failed=%d' % (*address, router.retrieve_count, router.configure_count, router.failed_count))
+            simulator.stop()
@@ -0,0 +1,450 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+from dataclasses import dataclass, field
+from django.db.models import Model
+from django.db.models.base import ModelState
+from django.db.transaction import atomic
+from rest_framework.request import Request
+from rest_framework.serializers import Serializer
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Type
+from uuid import UUID, uuid4
+from vycinity.meta.registries import ChangeableObjectEntry, ChangeableObjectRegistry
+from vycinity.models import OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED, AbstractOwnedObject, change_models
+from vycinity.serializers.firewall_serializers import get_reference_fields
+
+MAX_BULK_OPERATIONS = 10000
+'''
+Maximum number of operations in a single bulk request.
+'''
+
+QUERY_CHUNK_SIZE = 500
+'''
+Maximum number of uuids in a single `uuid__in` lookup.
+'''
+
+@dataclass
+class BulkOperation:
+    '''
+    A single operation of a bulk request.
+
+    attributes:
+        index: Position of the operation in the request, used for error messages.
+        entry: The registry entry of the type of the object.
+        uuid: The uuid of the object. For created objects it may be chosen by the client, so
+              other new objects can reference it.
+        data: The data as accepted by the serializer of the type.
+    '''
+    index: int
+    entry: ChangeableObjectEntry
+    uuid: Optional[UUID]
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class BulkChangeResult:
+    '''
+    The uuids of the objects changed by a bulk request.
+    '''
+    created: List[UUID] = field(default_factory=list)
+    modified: List[UUID] = field(default_factory=list)
+    deleted: List[UUID] = field(default_factory=list)
+
+
+class BulkChangeError(Exception):
+    '''
+    Describes failed operations of a bulk request. `errors` maps the kind of operation to the errors
+    per position in the request.
+    '''
+    def __init__(self, errors: Dict[str, Dict[int, Any]]):
+        super().__init__('Bulk operations failed.')
+        self.errors = errors
+
+
+def _chunked(values: Iterable[Any], size: int = QUERY_CHUNK_SIZE) -> Iterable[List[Any]]:
+    chunk = []
+    for value in values:
+        chunk.append(value)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def get_referenced_uuids(operation: BulkOperation) -> Dict[UUID, Type[AbstractOwnedObject]]:
+    '''
+    Collects the uuids referenced by the data of an operation. Invalid values are skipped, they are
+    reported by the serializer.
+
+    returns: The expected model by referenced uuid.
+    '''
+    rtn = {}
+    for (name, (model, many)) in get_reference_fields(operation.entry.serializer).items():
+        value = operation.data.get(name)
+        if value is None:
+            continue
+        for single_value in (value if many and isinstance(value, list) else [value]):
+            try:
+                rtn[UUID(str(single_value))] = model
+            except ValueError:
+                pass
+    return rtn
+
+
+def load_visible_objects(model: Type[AbstractOwnedObject], uuids: Iterable[UUID], changeset: change_models.ChangeSet, visible_customers: list) -> Dict[UUID, AbstractOwnedObject]:
+    '''
+    Loads the versions of objects visible in a changeset, like a single request with
+    `?changeset=` would resolve them.
+
+    returns: The objects by uuid. Not found or invisible objects are missing.
+    '''
+    rtn = {}
+    for chunk in _chunked(uuids):
+        query = model.filter_by_changeset_and_visibility(query=model.objects.filter(uuid__in=chunk), changeset=changeset, visible_customers=visible_customers)
+        for instance in query.order_by('pk'):
+            rtn[instance.uuid] = instance
+    return rtn
+
+
+def resolve_references(operations: List[BulkOperation], resolved_objects: Dict[UUID, AbstractOwnedObject], changeset: change_models.ChangeSet, visible_customers: list) -> None:
+    '''
+    Loads all objects referenced by the operations, which are not resolved yet, with one query per
+    referenced model and chunk. The loaded objects are added to `resolved_objects`.
+    '''
+    missing: Dict[Type[AbstractOwnedObject], Set[UUID]] = {}
+    for operation in operations:
+        for (uuid, model) in get_referenced_uuids(operation).items():
+            if uuid not in resolved_objects:
+                missing.setdefault(model, set()).add(uuid)
+    for (model, uuids) in missing.items():
+        resolved_objects.update(load_visible_objects(model, uuids, changeset, visible_customers))
+
+
+def order_by_references(operations: List[BulkOperation]) -> Tuple[List[BulkOperation], List[BulkOperation]]:
+    '''
+    Orders operations creating objects, so referenced new objects are created before the objects
+    referencing them.
+
+    returns: The ordered operations and the operations that are part of a reference cycle.
+    '''
+    by_uuid = {operation.uuid: operation for operation in operations}
+    dependencies = {operation.index: {uuid for uuid in get_referenced_uuids(operation) if uuid in by_uuid and uuid != operation.uuid} for operation in operations}
+    dependents: Dict[UUID, List[BulkOperation]] = {}
+    for operation in operations:
+        for uuid in dependencies[operation.index]:
+            dependents.setdefault(uuid, []).append(operation)
+
+    ordered = []
+    ready = [operation for operation in operations if len(dependencies[operation.index]) == 0]
+    while len(ready) > 0:
+        operation = ready.pop()
+        ordered.append(operation)
+        for dependent in dependents.get(operation.uuid, []):
+            dependencies[dependent.index].discard(operation.uuid)
+            if len(dependencies[dependent.index]) == 0:
+                ready.append(dependent)
+    ordered_indexes = {operation.index for operation in ordered}
+    return (ordered, [operation for operation in operations if operation.index not in ordered_indexes])
+
+
+def set_many_to_many(model: Type[Model], name: str, values: List[Tuple[Model, Iterable[Model]]]) -> None:
+    '''
+    Sets a many-to-many relation for new instances with a single insert.
+
+    params:
+        model: The model defining the relation.
+        name: The name of the relation.
+        values: The saved instances and the related objects.
+    '''
+    many_to_many_field = model._meta.get_field(name)
+    through = many_to_many_field.remote_field.through
+    source_attname = through._meta.get_field(many_to_many_field.m2m_field_name()).attname
+    target_attname = through._meta.get_field(many_to_many_field.m2m_reverse_field_name()).attname
+    rows = []
+    for (instance, related_objects) in values:
+        for related_pk in dict.fromkeys(related_object.pk for related_object in related_objects):
+            rows.append(through(**{source_attname: instance.pk, target_attname: related_pk}))
+    through.objects.bulk_create(rows, batch_size=QUERY_CHUNK_SIZE)
+
+
+def copy_as_new_version(instance: AbstractOwnedObject, state: str) -> AbstractOwnedObject:
+    '''
+    Copies a live object as new version with the given state, without saving it.
+    '''
+    new_version = copy.copy(instance)
+    # All parent links have to be reset, otherwise Django restores the pk of the topmost parent
+    # from an intermediate link and overwrites the live version of multi-level inherited models.
+    for parent in type(instance)._meta.get_parent_list():
+        setattr(new_version, parent._meta.pk.attname, None)
+    new_version.pk = None
+    new_version._state = ModelState()
+    new_version._state.db = instance._state.db
+    new_version.state = state
+    return new_version
+
+
+class BulkChangeBuilder:
+    '''
+    Applies many operations to a changeset at once. References between objects of the same request
+    are resolved in memory and referenced objects of the database are loaded with one query per
+    type, instead of one request per object and one query per reference.
+
+    All operations are validated before anything is written. Objects are saved one by one as
+    multi-table inherited models can't be inserted by `bulk_create`, but changes and many-to-many
+    relations are inserted in bulk.
+    '''
+
+    def __init__(self, changeset: change_models.ChangeSet, request: Request):
+        self.changeset = changeset
+        self.request = request
+        self.visible_customers = request.user.customer.get_visible_customers()
+        self.resolved_objects: Dict[UUID, AbstractOwnedObject] = {}
+        self.errors: Dict[str, Dict[int, Any]] = {}
+        self.result = BulkChangeResult()
+
+    def _add_error(self, kind: str, operation: BulkOperation, error: Any) -> None:
+        self.errors.setdefault(kind, {})[operation.index] = error
+
+    def _serializer(self, operation: BulkOperation, instance: Optional[AbstractOwnedObject] = None) -> Serializer:
+        return operation.entry.serializer(instance, data=operation.data, context={'request': self.request, 'resolved_objects': self.resolved_objects})
+
+    def _load_targets(self, kind: str, operations: List[BulkOperation]) -> Dict[int, AbstractOwnedObject]:
+        by_model: Dict[Type[AbstractOwnedObject], Set[UUID]] = {}
+        for operation in operations:
+            by_model.setdefault(operation.entry.model, set()).add(operation.uuid) # type: ignore
+        loaded: Dict[Tuple[Type[AbstractOwnedObject], UUID], AbstractOwnedObject] = {}
+        for (model, uuids) in by_model.items():
+            for (uuid, instance) in load_visible_objects(model, uuids, self.changeset, self.visible_customers).items():
+                loaded[(model, uuid)] = instance
+        rtn = {}
+        for operation in operations:
+            instance = loaded.get((operation.entry.model, operation.uuid)) # type: ignore
+            if instance is None or instance.state not in [OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED]:
+                self._add_error(kind, operation, {'uuid': ['Object not found.']})
+            elif not instance.owned_by(self.request.user.customer):
+                # public objects of other customers are visible, but only readable
+                self._add_error(kind, operation, {'uuid': ['Access denied.']})
+            else:
+                rtn[operation.index] = instance
+        return rtn
+
+    def _load_changes(self, instances: Iterable[AbstractOwnedObject]) -> Dict[int, change_models.Change]:
+        prepared_pks = [instance.pk for instance in instances if instance.state == OWNED_OBJECT_STATE_PREPARED]
+        rtn = {}
+        for chunk in _chunked(prepared_pks):
+            for change in change_models.Change.objects.filter(changeset=self.changeset, post_id__in=chunk):
+                rtn[change.post_id] = change
+        return rtn
+
+    def _save_many_to_many(self, relations: List[Tuple[AbstractOwnedObject, Dict[str, Any]]], new_instances: bool) -> None:
+        by_field: Dict[Tuple[Type[Model], str], List[Tuple[Model, Any]]] = {}
+        for (instance, later_put_fields) in relations:
+            for (name, value) in later_put_fields.items():
+                if new_instances:
+                    by_field.setdefault((type(instance), name), []).append((instance, value))
+                else:
+                    getattr(instance, name).set(value)
+        for ((model, name), values) in by_field.items():
+            set_many_to_many(model, name, values)
+
+    def create(self, operations: List[BulkOperation]) -> List[change_models.Change]:
+        '''
+        Validates and creates new objects. Returns the unsaved changes for them.
+        '''
+        known_uuids = set()
+        for chunk in _chunked([operation.uuid for operation in operations]):
+            known_uuids.update(AbstractOwnedObject.objects.non_polymorphic().filter(uuid__in=chunk).values_list('uuid', flat=True))
+        seen_uuids = set()
+        for operation in operations:
+            if operation.uuid in known_uuids or operation.uuid in seen_uuids:
+                self._add_error('create', operation, {'uuid': ['UUID is already in use.']})
+            seen_uuids.add(operation.uuid)
+
+        (ordered, cyclic) = order_by_references(operations)
+        for operation in cyclic:
+            self._add_error('create', operation, {'general': ['Object is part of a reference cycle between new objects.']})
+        resolve_references(ordered, self.resolved_objects, self.changeset, self.visible_customers)
+
+        new_instances = []
+        for operation in ordered:
+            serializer = self._serializer(operation)
+            if not serializer.is_valid():
+                self._add_error('create', operation, serializer.errors)
+                continue
+            instance = operation.entry.model()
+            instance.uuid = operation.uuid
+            instance.state = OWNED_OBJECT_STATE_PREPARED
+            later_put_fields = serializer.assign_validated_data(instance, serializer.validated_data) # type: ignore
+            self.resolved_objects[operation.uuid] = instance # type: ignore
+            new_instances.append((instance, later_put_fields))
+        if len(self.errors) > 0:
+            return []
+
+        changes = []
+        for (instance, _) in new_instances:
+            instance.save()
+            changes.append(change_models.Change(changeset=self.changeset, entity=type(instance).__name__, action=change_models.ACTION_CREATED, post=instance))
+            self.result.created.append(instance.uuid)
+        self._save_many_to_many(new_instances, True)
+        return changes
+
+    def modify(self, operations: List[BulkOperation]) -> List[change_models.Change]:
+        '''
+        Validates and modifies objects. Live objects get a new prepared version, prepared objects of
+        the changeset are modified in place. Returns the unsaved new changes.
+        '''
+        targets = self._load_targets('update', operations)
+        existing_changes = self._load_changes(targets.values())
+        resolve_references(operations, self.resolved_objects, self.changeset, self.visible_customers)
+
+        modified_instances = []
+        for operation in operations:
+            if operation.index not in targets:
+                continue
+            instance = targets[operation.index]
+            serializer = self._serializer(operation, instance)
+            if not serializer.is_valid():
+                self._add_error('update', operation, serializer.errors)
+                continue
+            modified_instances.append((instance, serializer))
+        if len(self.errors) > 0:
+            return []
+
+        changes = []
+        new_versions = []
+        updated_versions = []
+        for (instance, serializer) in modified_instances:
+            if instance.state == OWNED_OBJECT_STATE_LIVE:
+                new_version = copy_as_new_version(instance, OWNED_OBJECT_STATE_PREPARED)
+                later_put_fields = serializer.assign_validated_data(new_version, serializer.validated_data) # type: ignore
+                new_version.save()
+                new_versions.append((new_version, later_put_fields))
+                changes.append(change_models.Change(changeset=self.changeset, entity=type(instance).__name__, action=change_models.ACTION_MODIFIED, pre=instance, post=new_version))
+            else:
+                later_put_fields = serializer.assign_validated_data(instance, serializer.validated_data) # type: ignore
+                instance.save()
+                updated_versions.append((instance, later_put_fields))
+                change = existing_changes.get(instance.pk)
+                if change is not None and change.action == change_models.ACTION_DELETED:
+                    change.action = change_models.ACTION_MODIFIED
+                    change.save()
+            self.result.modified.append(instance.uuid)
+        self._save_many_to_many(new_versions, True)
+        self._save_many_to_many(updated_versions, False)
+        return changes
+
+    def delete(self, operations: List[BulkOperation]) -> List[change_models.Change]:
+        '''
+        Marks objects as deleted. Objects created in the changeset are removed together with their
+        change. Returns the unsaved new changes.
+        '''
+        targets = self._load_targets('delete', operations)
+        existing_changes = self._load_changes(targets.values())
+        if len(self.errors) > 0:
+            return []
+
+        changes = []
+        for operation in operations:
+            instance = targets[operation.index]
+            if instance.state == OWNED_OBJECT_STATE_LIVE:
+                deleted_version = copy_as_new_version(instance, OWNED_OBJECT_STATE_DELETED)
+                deleted_version.save()
+                changes.append(change_models.Change(changeset=self.changeset, entity=type(instance).__name__, action=change_models.ACTION_DELETED, pre=instance, post=deleted_version))
+            else:
+                change = existing_changes.get(instance.pk)
+                if change is None or change.action == change_models.ACTION_CREATED:
+                    instance.delete()
+                else:
+                    instance.state = OWNED_OBJECT_STATE_DELETED
+                    instance.save()
+                    change.action = change_models.ACTION_DELETED
+                    change.save()
+            self.result.deleted.append(instance.uuid)
+        return changes
+
+    def insert_changes(self, changes: List[change_models.Change]) -> None:
+        '''
+        Inserts the changes returned by a step, if the step was successful. Raises a BulkChangeError
+        otherwise.
+        '''
+        if len(self.errors) > 0:
+            raise BulkChangeError(self.errors)
+        for change in changes:
+            change.pre_save_polymorphic()
+        change_models.Change.objects.bulk_create(changes, batch_size=QUERY_CHUNK_SIZE)
+
+    def apply(self, create: List[BulkOperation], update: List[BulkOperation], delete: List[BulkOperation]) -> BulkChangeResult:
+        '''
+        Applies all operations in one transaction: first creations, then modifications, then
+        deletions. Modifications and deletions may refer to objects created by the same request.
+
+        May raise a BulkChangeError, nothing is changed in this case.
+        '''
+        with atomic():
+            # Changes are inserted after each step, so later steps find the objects of earlier ones.
+            for (step, operations) in [(self.create, create), (self.modify, update), (self.delete, delete)]:
+                self.insert_changes(step(operations))
+            self.changeset.save()
+        return self.result
+
+
+def parse_operation(kind: str, index: int, item: Any, require_data: bool) -> Tuple[Optional[BulkOperation], Any]:
+    '''
+    Parses a single operation of a bulk request. The item has the registry name of the type as
+    `type`, the `uuid` of the object (optional for creations) and, except for deletions, the `data`.
+
+    returns: The parsed operation or the errors, if the item is invalid.
+    '''
+    if not isinstance(item, dict):
+        return (None, {'general': ['Expected an object.']})
+    entry = ChangeableObjectRegistry.instance().get(item.get('type', ''))
+    if entry is None or not issubclass(entry.model, AbstractOwnedObject):
+        return (None, {'type': ['Unknown type.']})
+    try:
+        if 'uuid' in item:
+            uuid = UUID(str(item['uuid']))
+        elif kind == 'create':
+            uuid = uuid4()
+        else:
+            return (None, {'uuid': ['This field is required.']})
+    except ValueError:
+        return (None, {'uuid': ['Must be a valid UUID.']})
+    data = item.get('data', {})
+    if require_data and not isinstance(data, dict):
+        return (None, {'data': ['Expected an object.']})
+    return (BulkOperation(index=index, entry=entry, uuid=uuid, data=data if require_data else {}), None)
+
+
+def parse_operations(kind: str, items: Any, require_data: bool) -> Tuple[List[BulkOperation], Dict[int, Any]]:
+    '''
+    Parses the operations of a bulk request, see `parse_operation`.
+
+    returns: The parsed operations and the errors by position.
+    '''
+    operations = []
+    errors: Dict[int, Any] = {}
+    if items is None:
+        return (operations, errors)
+    if not isinstance(items, list):
+        return (operations, {-1: ['Expected a list of operations.']})
+    for (index, item) in enumerate(items):
+        (operation, error) = parse_operation(kind, index, item, require_data)
+        if operation is None:
+            errors[index] = error
+        else:
+            operations.append(operation)
+    return (operations, errors)
@@ -15,12 +15,12 @@
 
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from django.db.models import Model
+from django.db.models import Model, Prefetch
 from django.db.transaction import atomic
 from typing import List
 from uuid import UUID
 from vycinity.meta.registries import ChangeableObjectRegistry
-from vycinity.models import OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_OUTDATED, OWNED_OBJECT_STATE_PREPARED, change_models
+from vycinity.models import OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_OUTDATED, OWNED_OBJECT_STATE_PREPARED, AbstractOwnedObject, change_models, load_concrete_instances
 
 @dataclass
 class ChangedObjectCollection:
@@ -44,8 +44,17 @@ def apply_changeset(changeset: change_models.ChangeSet):
 
     May raise a ChangeConflictError if any of the changes is not based on a live object.
     '''
+    # Load the changes with their dependents and all changed objects as their concrete types up
+    # front, instead of resolving every pre and post by a polymorphic query of its own.
+    changes = list(changeset.changes.non_polymorphic().prefetch_related(Prefetch('dependents', queryset=change_models.Change.objects.non_polymorphic())))
+    changed_objects = load_concrete_instances(AbstractOwnedObject, [pk for change in changes for pk in [change.pre_id, change.post_id] if pk is not None])
+    for change in changes:
+        if change.pre_id is not None:
+            change.pre = changed_objects[change.pre_id]
+        change.post = changed_objects[change.post_id]
+
     ordered_changes: List[change_models.Change] = []
-    for change in changeset.changes.all():
+    for change in changes:
         position = len(ordered_changes)
         for dependent_change in change.dependents.all():
             for index in range(position):
@@ -113,6 +122,7 @@ def apply_changeset(changeset: change_models.ChangeSet):
             else:
                 raise Exception('Change {:s} is invalid.'.format(change.id))
             changeable_object_registry.notify_about_change(change)
+        changeable_object_registry.notify_about_changeset(ordered_changes)
         changeset.applied = datetime.now(timezone.utc)
         changeset.save()
 
@@ -0,0 +1,160 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import m2m_changed
+from typing import Dict, Iterable, List, Set
+from uuid import UUID
+from vycinity.meta.change_management import ChangeConflictError
+from vycinity.models import CONCRETE_LOAD_CHUNK_SIZE, OWNED_OBJECT_STATE_LIVE, AbstractOwnedObject, change_models, firewall_models
+
+LIST_MODELS = [firewall_models.ListAddressObject, firewall_models.ListServiceObject]
+'''
+Models containing other owned objects by their `elements`.
+'''
+
+class ListCycleError(ChangeConflictError):
+    '''
+    A live list contains itself, directly or through nested lists.
+    '''
+    pass
+
+
+def _chunks(pks: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(pks), CONCRETE_LOAD_CHUNK_SIZE):
+        yield pks[start:start + CONCRETE_LOAD_CHUNK_SIZE]
+
+
+def _element_relations():
+    for list_model in LIST_MODELS:
+        elements_field = list_model._meta.get_field('elements')
+        through = elements_field.remote_field.through
+        yield (through, through._meta.get_field(elements_field.m2m_field_name()).attname, through._meta.get_field(elements_field.m2m_reverse_field_name()).attname)
+
+
+def get_containing_lists(pks: Iterable[int]) -> Set[int]:
+    '''
+    Finds all lists containing the given objects, directly or through nested lists, regardless of
+    their state. Given lists are part of the result.
+    '''
+    list_ctypes = [ContentType.objects.get_for_model(list_model).id for list_model in LIST_MODELS]
+    pending = list(set(pks))
+    rtn = set()
+    for chunk in _chunks(pending):
+        rtn |= set(AbstractOwnedObject.objects.non_polymorphic().filter(pk__in=chunk, polymorphic_ctype_id__in=list_ctypes).values_list('pk', flat=True))
+    seen = set(pending)
+    while len(pending) > 0:
+        parents = set()
+        for (through, list_attname, element_attname) in _element_relations():
+            for chunk in _chunks(pending):
+                parents |= set(through.objects.filter(**{element_attname + '__in': chunk}).values_list(list_attname, flat=True))
+        pending = list(parents - seen)
+        seen |= parents
+        rtn |= parents
+    return rtn
+
+
+def rebuild_list_memberships(list_pks: Iterable[int]) -> None:
+    '''
+    Recalculates the materialized members of the given lists. Lists which are not live lose their
+    members. Raises a ListCycleError, if a live list contains itself.
+    '''
+    list_pks = list(set(list_pks))
+    for chunk in _chunks(list_pks):
+        firewall_models.ListMembership.objects.filter(list_id__in=chunk).delete()
+
+    list_ctypes = {ContentType.objects.get_for_model(list_model).id for list_model in LIST_MODELS}
+    live_lists: Dict[int, UUID] = {}
+    for chunk in _chunks(list_pks):
+        for (pk, uuid) in AbstractOwnedObject.objects.non_polymorphic().filter(pk__in=chunk, polymorphic_ctype_id__in=list_ctypes, state=OWNED_OBJECT_STATE_LIVE).values_list('pk', 'uuid'):
+            live_lists[pk] = uuid
+
+    # load the live part of the element graph below the lists
+    elements: Dict[int, List[int]] = {}
+    nested_lists: Set[int] = set(live_lists.keys())
+    pending = list(live_lists.keys())
+    while len(pending) > 0:
+        edges = []
+        for (through, list_attname, element_attname) in _element_relations():
+            for chunk in _chunks(pending):
+                edges += through.objects.filter(**{list_attname + '__in': chunk}).order_by('pk').values_list('pk', list_attname, element_attname)
+        element_pks = list({element_pk for (_, _, element_pk) in edges})
+        live_elements = {}
+        for chunk in _chunks(element_pks):
+            for (pk, ctype_id, uuid) in AbstractOwnedObject.objects.non_polymorphic().filter(pk__in=chunk, state=OWNED_OBJECT_STATE_LIVE).values_list('pk', 'polymorphic_ctype_id', 'uuid'):
+                live_elements[pk] = (ctype_id in list_ctypes, uuid)
+        for pk in pending:
+            elements[pk] = []
+        for (_, list_pk, element_pk) in edges:
+            if element_pk in live_elements:
+                elements[list_pk].append(element_pk)
+        pending = []
+        for (pk, (is_list, uuid)) in live_elements.items():
+            if is_list and pk not in nested_lists:
+                nested_lists.add(pk)
+                live_lists.setdefault(pk, uuid)
+                pending.append(pk)
+
+    def flatten(pk: int, path: List[int], members: Dict[int, None]) -> None:
+        for element_pk in elements.get(pk, []):
+            if element_pk in path:
+                raise ListCycleError('List {} contains itself.'.format(live_lists[element_pk]))
+            if element_pk in nested_lists:
+                flatten(element_pk, path + [element_pk], members)
+            else:
+                members.setdefault(element_pk, None)
+
+    memberships = []
+    for list_pk in list_pks:
+        if list_pk not in elements:
+            continue
+        members: Dict[int, None] = {}
+        flatten(list_pk, [list_pk], members)
+        memberships += [firewall_models.ListMembership(list_id=list_pk, member_id=member_pk, position=position) for (position, member_pk) in enumerate(members)]
+    firewall_models.ListMembership.objects.bulk_create(memberships, batch_size=CONCRETE_LOAD_CHUNK_SIZE)
+
+
+def update_after_changeset(changes: List[change_models.Change]) -> None:
+    '''
+    Hook for applied changesets. Recalculates the members of all lists containing a changed
+    object.
+    '''
+    changed_pks = [pk for change in changes for pk in [change.pre_id, change.post_id] if pk is not None]
+    rebuild_list_memberships(get_containing_lists(changed_pks))
+
+
+def update_after_element_change(sender, instance, action, reverse, pk_set, **kwargs) -> None:
+    '''
+    Receiver for changed list elements outside of a changeset, e.g. of objects created directly.
+    Clearing the lists of an element doesn't tell the removed lists, so they are looked up before.
+    '''
+    cleared_lists_attname = '_vycinity_cleared_lists_{}'.format(sender._meta.model_name)
+    if action == 'pre_clear':
+        if reverse:
+            setattr(instance, cleared_lists_attname, get_containing_lists([instance.pk]))
+        return
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if reverse and action == 'post_clear':
+        rebuild_list_memberships(instance.__dict__.pop(cleared_lists_attname, set()))
+    elif reverse:
+        rebuild_list_memberships(get_containing_lists(pk_set or []))
+    else:
+        rebuild_list_memberships(get_containing_lists([instance.pk]))
+
+
+def connect_signals() -> None:
+    for list_model in LIST_MODELS:
+        m2m_changed.connect(update_after_element_change, sender=list_model.elements.through, dispatch_uid='vycinity_list_membership_{}'.format(list_model.__name__))
@@ -0,0 +1,210 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import json
+from functools import lru_cache
+from django.db.transaction import atomic
+from rest_framework.request import Request
+from rest_framework.serializers import Serializer
+from rest_framework.utils.encoders import JSONEncoder
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple, Type
+from uuid import UUID, uuid4
+from vycinity.meta.bulk_changes import BulkChangeBuilder, BulkChangeError, BulkOperation, get_referenced_uuids, parse_operation
+from vycinity.serializers.firewall_serializers import get_reference_fields
+from vycinity.meta.registries import ChangeableObjectEntry, ChangeableObjectRegistry
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, AbstractOwnedObject, change_models, customer_models
+
+EXPORT_CHUNK_SIZE = 500
+'''
+Number of objects loaded by a single query while exporting.
+'''
+
+IMPORT_BATCH_SIZE = 500
+'''
+Number of lines validated and inserted together while importing.
+'''
+
+@lru_cache(maxsize=None)
+def has_owner_field(serializer_class: Type[Serializer]) -> bool:
+    '''
+    Checks whether objects of a serializer are assigned to an owner directly.
+    '''
+    return 'owner' in serializer_class().fields
+
+
+def get_transferable_entries() -> List[ChangeableObjectEntry]:
+    '''
+    Returns the registered owned object types ordered by their references, so referenced types
+    come first. References of a type to itself (e.g. lists containing lists) are ignored.
+    '''
+    entries = [entry for entry in ChangeableObjectRegistry.instance().all() if issubclass(entry.model, AbstractOwnedObject)]
+    referenced_models = {entry.model: {model for (model, _) in get_reference_fields(entry.serializer).values()} for entry in entries}
+    ordered: List[ChangeableObjectEntry] = []
+    while len(ordered) < len(entries):
+        remaining = [entry for entry in entries if entry not in ordered]
+        for entry in remaining:
+            dependencies = [other for other in remaining if other is not entry and any(issubclass(other.model, model) for model in referenced_models[entry.model])]
+            if len(dependencies) == 0:
+                ordered.append(entry)
+                break
+        else:
+            # cyclic references between types, keep the registration order of the rest
+            ordered += remaining
+    return ordered
+
+
+def export_objects(customer: customer_models.Customer, request: Request) -> Iterator[bytes]:
+    '''
+    Exports all live objects owned by a customer as newline delimited JSON. Each line contains the
+    `type`, `uuid` and `data` of an object, like the entries of a bulk request. Types are exported
+    in the order of `get_transferable_entries`.
+
+    Objects are loaded in chunks by their primary key, so the memory usage does not depend on the
+    number of objects. A chunk loads its references with one query per relation.
+    '''
+    context = {'request': request, 'visible_customers': request.user.customer.get_visible_customers()}
+    for entry in get_transferable_entries():
+        reference_fields = get_reference_fields(entry.serializer)
+        query = entry.model.filter_query_by_owners(entry.model.objects.filter(state=OWNED_OBJECT_STATE_LIVE), [customer])
+        query = query.select_related(*[name for (name, (_, many)) in reference_fields.items() if not many])
+        query = query.prefetch_related(*[name for (name, (_, many)) in reference_fields.items() if many])
+        last_pk = None
+        while True:
+            chunk_query = query if last_pk is None else query.filter(pk__gt=last_pk)
+            chunk = list(chunk_query.order_by('pk')[:EXPORT_CHUNK_SIZE])
+            if len(chunk) == 0:
+                break
+            lines = []
+            for (instance, data) in zip(chunk, entry.serializer(chunk, many=True, context=context).data):
+                data.pop('uuid', None)
+                data.pop('changeset', None)
+                # unset references are omitted, as the related fields don't accept null
+                for name in reference_fields:
+                    if data.get(name, '') is None:
+                        del data[name]
+                lines.append(json.dumps({'type': entry.model.__name__, 'uuid': instance.uuid, 'data': data}, cls=JSONEncoder))
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            last_pk = chunk[-1].pk
+
+
+class ObjectImporter:
+    '''
+    Imports newline delimited JSON as created by `export_objects` into a changeset. All objects are
+    assigned to the given owner.
+
+    Every object gets a new uuid and references to objects of the import are rewritten to the new
+    uuids, so an export can be imported into the installation it was created by, even several times.
+    References to other objects, e.g. public objects of other customers, are kept.
+
+    Lines are processed in batches, so the import doesn't hold the whole file in memory. Objects
+    referencing objects of later lines are deferred until the referenced objects are imported. As
+    later lines aren't known in advance, objects referencing objects outside of the import are
+    deferred until the end.
+    '''
+
+    def __init__(self, changeset: change_models.ChangeSet, request: Request, owner: customer_models.Customer):
+        self.changeset = changeset
+        self.owner = owner
+        self.builder = BulkChangeBuilder(changeset, request)
+        self.pending: List[BulkOperation] = []
+        self.imported = 0
+        self.uuid_map: Dict[UUID, UUID] = {}
+        # new uuids are either part of the pending operations or imported by an earlier batch
+        self.new_uuids: Set[UUID] = set()
+
+    def _parse(self, line_number: int, line: bytes) -> BulkOperation:
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise BulkChangeError({'create': {line_number: {'general': ['Invalid JSON.']}}})
+        (operation, error) = parse_operation('create', line_number, item, True)
+        if operation is None:
+            raise BulkChangeError({'create': {line_number: error}})
+        if has_owner_field(operation.entry.serializer):
+            operation.data['owner'] = str(self.owner.id)
+        self.uuid_map[operation.uuid] = uuid4()
+        operation.uuid = self.uuid_map[operation.uuid]
+        self.new_uuids.add(operation.uuid)
+        return operation
+
+    def _remap(self, value: Any) -> Any:
+        try:
+            mapped = self.uuid_map.get(UUID(str(value)))
+        except ValueError:
+            return value
+        return value if mapped is None else str(mapped)
+
+    def _remap_references(self, operation: BulkOperation) -> None:
+        '''
+        Rewrites the references of an operation to objects of the import, which were parsed so far.
+        References to later lines are rewritten once these lines were parsed.
+        '''
+        for (name, (_, many)) in get_reference_fields(operation.entry.serializer).items():
+            value = operation.data.get(name)
+            if value is None:
+                continue
+            if many and isinstance(value, list):
+                operation.data[name] = [self._remap(single_value) for single_value in value]
+            else:
+                operation.data[name] = self._remap(value)
+
+    def _split_ready(self, operations: List[BulkOperation]) -> Tuple[List[BulkOperation], List[BulkOperation]]:
+        references = {operation.index: get_referenced_uuids(operation).keys() for operation in operations}
+        deferred_uuids: Set = set()
+        changed = True
+        while changed:
+            changed = False
+            for operation in operations:
+                if operation.uuid in deferred_uuids:
+                    continue
+                for uuid in references[operation.index]:
+                    if uuid in deferred_uuids or uuid not in self.new_uuids:
+                        deferred_uuids.add(operation.uuid)
+                        changed = True
+                        break
+        return ([operation for operation in operations if operation.uuid not in deferred_uuids], [operation for operation in operations if operation.uuid in deferred_uuids])
+
+    def _import_batch(self, operations: List[BulkOperation], final: bool) -> None:
+        operations = self.pending + operations
+        for operation in operations:
+            self._remap_references(operation)
+        if final:
+            (ready, self.pending) = (operations, [])
+        else:
+            (ready, self.pending) = self._split_ready(operations)
+        self.builder.insert_changes(self.builder.create(ready))
+        self.imported += len(ready)
+        # objects of earlier batches are found by the changeset from now on
+        self.builder.resolved_objects.clear()
+
+    def import_lines(self, lines: Iterable[bytes]) -> int:
+        '''
+        Imports all lines in a single transaction. Raises a BulkChangeError with the errors by line
+        number, nothing is imported in this case.
+
+        returns: The number of imported objects.
+        '''
+        with atomic():
+            batch = []
+            for (line_number, line) in enumerate(lines, start=1):
+                if len(line.strip()) == 0:
+                    continue
+                batch.append(self._parse(line_number, line))
+                if len(batch) >= IMPORT_BATCH_SIZE:
+                    self._import_batch(batch, False)
+                    batch = []
+            self._import_batch(batch, True)
+            self.changeset.save()
+        return self.imported
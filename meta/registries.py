@@ -40,6 +40,7 @@ class ChangeableObjectRegistry(object):
             ChangeableObjectRegistry.__instance = object.__new__(cls)
             ChangeableObjectRegistry.__instance.registry = {}
             ChangeableObjectRegistry.__instance.update_hook_registy = {}
+            ChangeableObjectRegistry.__instance.changeset_hook_registry = []
 
             # initialize at runtime to break import loop
             from vycinity.models import firewall_models, network_models
@@ -61,6 +62,11 @@ class ChangeableObjectRegistry(object):
             ChangeableObjectRegistry.__instance.register(network_models.ManagedVRRPInterface, network_serializers.ManagedVRRPInterfaceSerializer, 'managedinterfaces/vrrp', network_views.ManagedVRRPInterfaceDetailView, network_views.ManagedVRRPInterfaceList)
 
             ChangeableObjectRegistry.__instance.register_for_version_change(network_models.Network, network_models.ManagedInterface.update_networks)
+
+            from vycinity.meta import list_membership
+            ChangeableObjectRegistry.__instance.register_for_changeset_application(list_membership.update_after_changeset)
+            from vycinity.s42.adapter import vyos13 as vyos13_adapter
+            ChangeableObjectRegistry.__instance.register_for_changeset_application(vyos13_adapter.invalidateAfterChangeset)
         return ChangeableObjectRegistry.__instance
 
     @staticmethod
@@ -100,6 +106,20 @@ class ChangeableObjectRegistry(object):
             ChangeableObjectRegistry.__instance.update_hook_registy[name] = []
         ChangeableObjectRegistry.__instance.update_hook_registy[name].append(hook)
 
+    def register_for_changeset_application(self, hook: Callable[[List[Change]],None]) -> None:
+        '''
+        Registers a hook for getting notified when a changeset has been applied, after all of its
+        changes. Use this instead of `register_for_version_change` for updates that depend on
+        several changes at once.
+
+        Params:
+            hook: A callable getting the list of applied changes. It is called inside the
+                  transaction applying the changeset, so raising an exception (e.g. a
+                  `ChangeConflictError`) aborts the application. The result is ignored.
+        '''
+        if hook not in ChangeableObjectRegistry.__instance.changeset_hook_registry:
+            ChangeableObjectRegistry.__instance.changeset_hook_registry.append(hook)
+
     def get(self, name: str) -> Optional[ChangeableObjectEntry]:
         '''
         Retrieve a registered type and it's meta information.
@@ -122,11 +142,18 @@ class ChangeableObjectRegistry(object):
                     hook(change.pre, None)
 
 
+    def notify_about_changeset(self, changes: List[Change]) -> None:
+        '''
+        Notify registered hooks about an applied changeset.
+        '''
+        for hook in ChangeableObjectRegistry.__instance.changeset_hook_registry:
+            hook(changes)
+
     def all(self) -> List[ChangeableObjectEntry]:
         '''
         Retrieve all registered types.
         '''
-        return list(ChangeableObjectRegistry.registry.values())
+        return list(ChangeableObjectRegistry.__instance.registry.values())
 
     def create_url_patterns(self) -> List[URLPattern]:
         '''
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0004_auto_20221026_1405'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='addressobject',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='firewall',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='network',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='ruleset',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AlterField(
+            model_name='serviceobject',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddIndex(
+            model_name='abstractownedobject',
+            index=models.Index(fields=['state', 'uuid'], name='vycinity_ab_state_20fd67_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['changeset', 'entity', 'action'], name='vycinity_ch_changes_9daa13_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 11:02
+
+import hashlib
+import json
+from django.db import migrations, models
+
+
+def digest_configs(apps, schema_editor):
+    for model_name in ['Vyos13RouterConfig', 'Vyos13LiveRouterConfig']:
+        model = apps.get_model('vycinity', model_name)
+        for config in model.objects.exclude(config__isnull=True).iterator():
+            serialized = json.dumps(config.config, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            config.config_hash = hashlib.sha256(serialized).hexdigest()
+            config.config_size = len(serialized)
+            config.save(update_fields=['config_hash', 'config_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vyos13liverouterconfig',
+            name='config_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='vyos13liverouterconfig',
+            name='config_size',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='vyos13routerconfig',
+            name='config_hash',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='vyos13routerconfig',
+            name='config_size',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(digest_configs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0007_config_digest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='APIToken',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=64)),
+                ('lookup', models.CharField(editable=False, max_length=16, unique=True)),
+                ('digest', models.CharField(editable=False, max_length=64)),
+                ('scopes', models.JSONField(default=list)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('expires', models.DateTimeField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='api_tokens', to='vycinity.user')),
+            ],
+        ),
+    ]
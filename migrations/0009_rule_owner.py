@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_ruleset_owners(apps, schema_editor):
+    Rule = apps.get_model('vycinity', 'Rule')
+    RuleSet = apps.get_model('vycinity', 'RuleSet')
+    for ruleset in RuleSet.objects.iterator():
+        Rule.objects.filter(related_ruleset=ruleset).update(owner=ruleset.owner_id, public=ruleset.public)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0008_apitoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rule',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vycinity.customer'),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='public',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(copy_ruleset_owners, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='rule',
+            name='owner',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vycinity.customer'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-19 15:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def materialize_list_memberships(apps, schema_editor):
+    ListMembership = apps.get_model('vycinity', 'ListMembership')
+    lists = {}
+    for model_name in ['ListAddressObject', 'ListServiceObject']:
+        model = apps.get_model('vycinity', model_name)
+        for list_object in model.objects.filter(state='live'):
+            lists[list_object.pk] = [element.pk for element in list_object.elements.filter(state='live').order_by('pk')]
+
+    def flatten(pk, path, members):
+        for element_pk in lists[pk]:
+            if element_pk in path:
+                # cycles have been ignored before, keep ignoring them for existing lists
+                continue
+            if element_pk in lists:
+                flatten(element_pk, path + [element_pk], members)
+            else:
+                members.setdefault(element_pk, None)
+
+    memberships = []
+    for list_pk in lists:
+        members = {}
+        flatten(list_pk, [list_pk], members)
+        memberships += [ListMembership(list_id=list_pk, member_id=member_pk, position=position) for (position, member_pk) in enumerate(members)]
+    ListMembership.objects.bulk_create(memberships, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0009_rule_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListMembership',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vycinity.abstractownedobject')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='vycinity.abstractownedobject')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='listmembership',
+            index=models.Index(fields=['list', 'position'], name='vycinity_li_list_id_d1abe8_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='listmembership',
+            constraint=models.UniqueConstraint(fields=('list', 'member'), name='vycinity_unique_list_member'),
+        ),
+        migrations.RunPython(materialize_list_memberships, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0010_listmembership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirewallRuleNumber',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('firewall_uuid', models.UUIDField()),
+                ('direction', models.CharField(choices=[('into', 'into'), ('from', 'from')], max_length=4)),
+                ('ip_version', models.IntegerField(choices=[(4, 'IPv4'), (6, 'IPv6')])),
+                ('key', models.CharField(max_length=64)),
+                ('number', models.IntegerField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='firewallrulenumber',
+            constraint=models.UniqueConstraint(fields=('firewall_uuid', 'direction', 'ip_version', 'key'), name='vycinity_unique_firewall_rule_number'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.25 on 2026-10-19 17:20
+
+import hashlib
+import json
+from django.db import migrations
+
+
+def objectize(obj):
+    if isinstance(obj, str):
+        return {obj: {}}
+    if isinstance(obj, list):
+        rtn = {}
+        for item in obj:
+            rtn.update(objectize(item))
+        return rtn
+    if isinstance(obj, dict):
+        return {key: objectize(value) for (key, value) in obj.items()}
+
+
+def canonicalize(obj):
+    if isinstance(obj, dict):
+        return {str(key): canonicalize(value) for (key, value) in obj.items() if key != '__complete'}
+    if isinstance(obj, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in obj):
+            return canonicalize(objectize([canonicalize(item) for item in obj]))
+        values = list(dict.fromkeys(canonicalize(item) for item in obj))
+        return values[0] if len(values) == 1 else values
+    if obj is None or isinstance(obj, bool):
+        return obj
+    return str(obj)
+
+
+def canonicalize_configs(apps, schema_editor):
+    for model_name in ['Vyos13RouterConfig', 'Vyos13LiveRouterConfig']:
+        model = apps.get_model('vycinity', model_name)
+        for config in model.objects.exclude(config__isnull=True).iterator():
+            canonical = canonicalize(config.config)
+            if canonical == config.config:
+                continue
+            serialized = json.dumps(canonical, sort_keys=True, separators=(',', ':')).encode('utf-8')
+            config.config = canonical
+            config.config_hash = hashlib.sha256(serialized).hexdigest()
+            config.config_size = len(serialized)
+            config.save(update_fields=['config', 'config_hash', 'config_size'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0011_firewallrulenumber'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_configs, migrations.RunPython.noop),
+    ]
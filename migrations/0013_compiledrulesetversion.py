@@ -0,0 +1,26 @@
+# Generated by Django 3.2.25 on 2026-10-19 18:30
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    CompiledRuleSetVersion = apps.get_model('vycinity', 'CompiledRuleSetVersion')
+    CompiledRuleSetVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vycinity', '0012_canonical_configs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompiledRuleSetVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
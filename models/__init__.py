@@ -14,12 +14,14 @@
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
 from abc import abstractmethod, abstractstaticmethod
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from polymorphic.models import PolymorphicModel
 from django.db.models import constraints, manager, query
 from rest_framework import serializers
 from vycinity.models import customer_models, change_models
-from typing import Any, List, Union
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
 import uuid
 
 OWNED_OBJECT_STATE_PREPARED = 'prepared'
@@ -32,6 +34,34 @@ OWNED_OBJECT_STATES = [
     (OWNED_OBJECT_STATE_OUTDATED, OWNED_OBJECT_STATE_OUTDATED),
     (OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_DELETED)
 ]
+CONCRETE_LOAD_CHUNK_SIZE = 500
+
+def load_concrete_instances(model: Type[PolymorphicModel], pks: Iterable[Any], querysets: Optional[Dict[Type[PolymorphicModel], query.QuerySet]] = None) -> Dict[Any, PolymorphicModel]:
+    '''
+    Loads instances of a polymorphic model as their concrete types. In contrast to a polymorphic
+    queryset, the base rows are only read for their content type, then every concrete type is
+    loaded by a single non-polymorphic query (per chunk of primary keys).
+
+    params:
+        model: The polymorphic base model.
+        pks: The primary keys to load, missing ones are skipped.
+        querysets: Optional querysets by concrete type, e.g. with `select_related`.
+
+    returns: The concrete instances by primary key.
+    '''
+    pks = list(dict.fromkeys(pks))
+    pks_by_ctype: Dict[int, List[Any]] = defaultdict(list)
+    for start in range(0, len(pks), CONCRETE_LOAD_CHUNK_SIZE):
+        for (pk, ctype_id) in model.objects.non_polymorphic().filter(pk__in=pks[start:start + CONCRETE_LOAD_CHUNK_SIZE]).values_list('pk', 'polymorphic_ctype_id'):
+            pks_by_ctype[ctype_id].append(pk)
+    rtn = {}
+    for (ctype_id, concrete_pks) in pks_by_ctype.items():
+        concrete_model = ContentType.objects.get_for_id(ctype_id).model_class()
+        queryset = (querysets or {}).get(concrete_model, concrete_model.objects.all()).non_polymorphic()
+        for start in range(0, len(concrete_pks), CONCRETE_LOAD_CHUNK_SIZE):
+            for instance in queryset.filter(pk__in=concrete_pks[start:start + CONCRETE_LOAD_CHUNK_SIZE]):
+                rtn[instance.pk] = instance
+    return rtn
 
 class AbstractOwnedObject(PolymorphicModel):
     '''
@@ -45,6 +75,9 @@ class AbstractOwnedObject(PolymorphicModel):
         constraints = [
             constraints.UniqueConstraint(fields=['uuid', 'state'], name='%(app_label)s_max_one_%(class)s_live', condition=models.Q(state=OWNED_OBJECT_STATE_LIVE))
         ]
+        indexes = [
+            models.Index(fields=['state', 'uuid'])
+        ]
 
     def owned_by(self, customer: customer_models.Customer):
         '''
@@ -99,6 +132,20 @@ class AbstractOwnedObject(PolymorphicModel):
         '''
         raise NotImplementedError('filter_query_by_customers not yet implemented')
 
+    @abstractstaticmethod
+    def filter_query_by_owners(query: Any, customers: List[customer_models.Customer]):
+        '''
+        Filters a given query for objects owned by one of the given customers, regardless of the
+        attribute `public`.
+
+        params:
+            query: the query to extend with the filter
+            customers: the list of owning customers
+
+        returns: The modified QuerySet.
+        '''
+        raise NotImplementedError('filter_query_by_owners not yet implemented')
+
     @staticmethod
     def filter_query_by_liveness_or_changeset(query: Any, changeset: change_models.ChangeSet):
         '''
@@ -123,12 +170,15 @@ class AbstractOwnedObject(PolymorphicModel):
         
         returns: The filtered queryset-like object.
         '''
-        referenced_modified_changes = changeset.changes.filter(entity=cls.__name__, pre__isnull=False).only('pre')
-        pk_referenced_modified_objects_list = map(lambda change: change.pre.pk, referenced_modified_changes)
+        # Both parts are passed as subqueries, so the database resolves them without loading the
+        # changes into python.
+        changes_in_changeset = change_models.Change.objects.non_polymorphic().filter(changeset=changeset)
+        referenced_modified_pks = changes_in_changeset.filter(entity=cls.__name__, pre__isnull=False).values('pre_id')
+        prepared_pks = changes_in_changeset.filter(action__in=[change_models.ACTION_CREATED, change_models.ACTION_MODIFIED]).values('post_id')
         return cls.filter_query_by_customers_or_public(
             query.filter(
-                (models.Q(state=OWNED_OBJECT_STATE_LIVE) & (~models.Q(pk__in=pk_referenced_modified_objects_list))) | 
-                models.Q(state=OWNED_OBJECT_STATE_PREPARED, change__changeset=changeset, change__action__in=[change_models.ACTION_CREATED, change_models.ACTION_MODIFIED])),
+                (models.Q(state=OWNED_OBJECT_STATE_LIVE) & (~models.Q(pk__in=referenced_modified_pks))) | 
+                models.Q(state=OWNED_OBJECT_STATE_PREPARED, pk__in=prepared_pks)),
             visible_customers)
 
     @abstractstaticmethod
@@ -147,7 +197,7 @@ class OwnedObject(AbstractOwnedObject):
     '''
     
     owner = models.ForeignKey(customer_models.Customer, on_delete=models.CASCADE) # type: ignore
-    public = models.BooleanField(default=False)
+    public = models.BooleanField(default=False, db_index=True)
 
     class Meta:
         abstract = True
@@ -156,16 +206,46 @@ class OwnedObject(AbstractOwnedObject):
     def filter_query_by_customers_or_public(query: Any, customers: List[customer_models.Customer]):
         return query.filter(models.Q(public=True) | models.Q(owner__in=customers))
 
+    @staticmethod
+    def filter_query_by_owners(query: Any, customers: List[customer_models.Customer]):
+        return query.filter(owner__in=customers)
+
 
 class SemiOwnedObject(AbstractOwnedObject):
     '''
     Abstract object for approximating the relation to a `Customer`. This is required when the
     object itself does not have a direct relation to a `Customer`, but a related has.
+
+    The owner and visibility of the related object are copied on every save, so visibility filters
+    and permission checks don't need to join the related object. Changes of the related object
+    have to be propagated by it, e.g. by `update_owner_from`.
     '''
-    
+
+    owner = models.ForeignKey(customer_models.Customer, on_delete=models.CASCADE, editable=False, related_name='+') # type: ignore
+    public = models.BooleanField(default=False, db_index=True, editable=False)
+
     class Meta:
         abstract = True
-    
-    @property
-    def public(self):
-        raise NotImplementedError('Public is not defined')
\ No newline at end of file
+
+    @abstractmethod
+    def get_owning_object(self) -> OwnedObject:
+        '''
+        Returns the related object this object derives its owner and visibility from.
+        '''
+        raise NotImplementedError('get_owning_object not yet implemented')
+
+    def save(self, *args, **kwargs):
+        owning_object = self.get_owning_object()
+        self.owner_id = owning_object.owner_id
+        self.public = owning_object.public
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'owner', 'public'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def filter_query_by_customers_or_public(query: Any, customers: List[customer_models.Customer]):
+        return query.filter(models.Q(public=True) | models.Q(owner__in=customers))
+
+    @staticmethod
+    def filter_query_by_owners(query: Any, customers: List[customer_models.Customer]):
+        return query.filter(owner__in=customers)
\ No newline at end of file
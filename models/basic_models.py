@@ -13,10 +13,43 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+import hashlib
+import json
 import uuid
 from django.db import models
 from django.forms import ValidationError
 from polymorphic.models import PolymorphicModel
+from typing import Any, Optional, Tuple
+from vycinity.s42.routerconfig.vyos13 import canonicalizeConf
+
+def digest_config(config: Any) -> Tuple[Optional[str], Optional[int]]:
+    '''
+    Calculates the content hash and the size of a stored configuration, so lists and conditional
+    requests do not need to load the configuration itself.
+
+    returns: The SHA-256 hex digest of the configuration serialized as JSON with sorted keys and
+             the length of this serialization in bytes, or `(None, None)` for a missing
+             configuration.
+    '''
+    if config is None:
+        return (None, None)
+    serialized = json.dumps(config, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return (hashlib.sha256(serialized).hexdigest(), len(serialized))
+
+class DigestedConfigMixin:
+    '''
+    Stores the field `config` in the canonical form of VyOS 1.3 configurations and keeps the fields
+    `config_hash` and `config_size` in sync with it when saving.
+    '''
+
+    def save(self, *args, **kwargs):
+        if self.config is not None:
+            self.config = canonicalizeConf(self.config)
+        (self.config_hash, self.config_size) = digest_config(self.config)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'config' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'config_hash', 'config_size'}
+        super().save(*args, **kwargs)
 
 class StaticConfigSection(PolymorphicModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -53,19 +86,24 @@ class Vyos13Router(Router):
 
 class LiveRouterConfig(PolymorphicModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
     retrieved = models.DateTimeField(null=True)
     router = models.ForeignKey(Router, on_delete=models.CASCADE, null=False)
 
-class Vyos13LiveRouterConfig(LiveRouterConfig):
+class Vyos13LiveRouterConfig(DigestedConfigMixin, LiveRouterConfig):
     config = models.JSONField(null=True)
+    config_hash = models.CharField(max_length=64, null=True, editable=False)
+    config_size = models.PositiveIntegerField(null=True, editable=False)
 
 class RouterConfig(PolymorphicModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
     router = models.ForeignKey(Router, on_delete=models.CASCADE, null=False)
 
-class Vyos13RouterConfig(RouterConfig):
+class Vyos13RouterConfig(DigestedConfigMixin, RouterConfig):
     config = models.JSONField()
+    config_hash = models.CharField(max_length=64, null=True, editable=False)
+    config_size = models.PositiveIntegerField(null=True, editable=False)
 
 DEPLOYMENT_STATE_PREPARATION = 'preparation'
 DEPLOYMENT_STATE_READY = 'ready'
@@ -82,7 +120,7 @@ DEPLOYMENT_STATES = [
 
 class Deployment(PolymorphicModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    triggered = models.DateTimeField(auto_now_add=True)
+    triggered = models.DateTimeField(auto_now_add=True, db_index=True)
     last_update = models.DateTimeField(auto_now=True)
     configs = models.ManyToManyField(RouterConfig)
     change = models.JSONField()
@@ -36,7 +36,7 @@ class ChangeSet(PolymorphicModel):
     user = models.ForeignKey(customer_models.User, on_delete=models.SET_NULL, null=True)
     owner_name = models.CharField(max_length=customer_models.NAME_LENGTH, editable=False)
     user_name = models.CharField(max_length=customer_models.NAME_LENGTH, editable=False)
-    created = models.DateTimeField(editable=False, auto_now_add=True)
+    created = models.DateTimeField(editable=False, auto_now_add=True, db_index=True)
     modified = models.DateTimeField(editable=False, auto_now=True)
     applied = models.DateTimeField(null=True)
 
@@ -52,4 +52,9 @@ class Change(PolymorphicModel):
     post = models.ForeignKey('vycinity.AbstractOwnedObject', related_name='change', on_delete=models.CASCADE)
     action = models.CharField(max_length=8, choices=CHANGE_ACTIONS)
     dependencies = models.ManyToManyField(to='Change', related_name='dependents')
+
+    class Meta(PolymorphicModel.Meta):
+        indexes = [
+            models.Index(fields=['changeset', 'entity', 'action'])
+        ]
     
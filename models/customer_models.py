@@ -13,9 +13,14 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+import datetime
+import secrets
 import uuid
 from django.db import models
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
 from polymorphic.models import PolymorphicModel
+from typing import List, Optional, Tuple
 
 NAME_LENGTH = 64
 
@@ -51,4 +56,64 @@ class User(PolymorphicModel):
 class LocalUserAuth(PolymorphicModel):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(to=User, on_delete=models.CASCADE)
-    auth = models.CharField(max_length=256)
\ No newline at end of file
+    auth = models.CharField(max_length=256)
+
+API_TOKEN_SCOPE_READ = 'read'
+API_TOKEN_SCOPE_WRITE = 'write'
+API_TOKEN_SCOPES = [
+    (API_TOKEN_SCOPE_READ, 'read'),
+    (API_TOKEN_SCOPE_WRITE, 'write'),
+]
+API_TOKEN_PREFIX = 'vyc'
+API_TOKEN_SALT = 'vycinity.models.customer_models.APIToken'
+
+class APIToken(models.Model):
+    '''
+    A token for authenticating machines (e.g. CI pipelines) as a user. The token consists of a
+    public lookup prefix and a random secret. Only a keyed hash of the secret is stored, as the
+    secret is random a slow password hash is not required.
+    '''
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(to=User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=64)
+    lookup = models.CharField(max_length=16, unique=True, editable=False)
+    digest = models.CharField(max_length=64, editable=False)
+    scopes = models.JSONField(default=list)
+    created = models.DateTimeField(auto_now_add=True, editable=False)
+    expires = models.DateTimeField(null=True)
+
+    @staticmethod
+    def get_digest(secret: str) -> str:
+        return salted_hmac(API_TOKEN_SALT, secret, algorithm='sha256').hexdigest()
+
+    @staticmethod
+    def split_token(token: str) -> Optional[Tuple[str, str]]:
+        '''
+        Splits a token into the lookup prefix and the secret.
+
+        returns: The lookup and the secret or None, if the token is malformed.
+        '''
+        parts = token.split('_')
+        if len(parts) != 3 or parts[0] != API_TOKEN_PREFIX or len(parts[1]) == 0 or len(parts[2]) == 0:
+            return None
+        return (parts[1], parts[2])
+
+    @staticmethod
+    def mint(user: User, name: str, scopes: List[str], expires: Optional[datetime.datetime] = None) -> Tuple['APIToken', str]:
+        '''
+        Creates and saves a new token.
+
+        returns: The token instance and the token itself, which can't be recovered later.
+        '''
+        lookup = secrets.token_hex(8)
+        secret = secrets.token_urlsafe(32).replace('_', '-')
+        api_token = APIToken.objects.create(user=user, name=name, lookup=lookup, digest=APIToken.get_digest(secret), scopes=scopes, expires=expires)
+        return (api_token, '{}_{}_{}'.format(API_TOKEN_PREFIX, lookup, secret))
+
+    def verify(self, secret: str) -> bool:
+        '''
+        Checks the secret of a token in constant time and whether the token is still valid.
+        '''
+        if self.expires is not None and self.expires <= timezone.now():
+            return False
+        return constant_time_compare(self.digest, APIToken.get_digest(secret))
@@ -17,7 +17,7 @@ import uuid
 from django.core.exceptions import ValidationError
 from django.db import models
 from vycinity.models import AbstractOwnedObject, customer_models, network_models, OwnedObject, SemiOwnedObject
-from typing import Any, List
+from typing import Any, List, Union
 
 ACTION_ACCEPT = 'accept'
 ACTION_REJECT = 'reject'
@@ -84,30 +84,32 @@ class RuleSet(OwnedObject):
     def get_dependent_owned_objects(self) -> List['AbstractOwnedObject']:
         return []
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        Rule.update_owner_from(self)
+
 class Rule(SemiOwnedObject):
     related_ruleset = models.ForeignKey(RuleSet, on_delete=models.CASCADE, related_name='rules')
     priority = models.IntegerField(validators=[validate_priority_rule])
     comment = models.TextField(null=True)
     disable = models.BooleanField()
 
-    @property
-    def owner(self):
-        return self.related_ruleset.owner
-
-    @property
-    def public(self):
-        return self.related_ruleset.public
+    def get_owning_object(self) -> RuleSet:
+        return self.related_ruleset
 
     @staticmethod
-    def filter_query_by_customers_or_public(query: Any, customers: List[customer_models.Customer]):
-        return query.filter(models.Q(related_ruleset__owner__in = customers) | models.Q(related_ruleset__public = True))
+    def update_owner_from(ruleset: RuleSet) -> None:
+        '''
+        Copies the owner and visibility of a ruleset to its rules, if they differ.
+        '''
+        Rule.objects.non_polymorphic().filter(related_ruleset=ruleset).exclude(owner=ruleset.owner_id, public=ruleset.public).update(owner=ruleset.owner_id, public=ruleset.public)
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
-        if hasattr(self, 'basicrule'):
-            return self.basicrule.get_related_owned_objects()
-        elif hasattr(self, 'customrule'):
-            return self.customrule.get_related_owned_objects()
-        raise ValueError('Inconsistent Rule({})'.format(self.pk))
+        # The content type tells the concrete type, so a single query loads it.
+        real_instance = self.get_real_instance()
+        if type(real_instance) is Rule:
+            raise ValueError('Inconsistent Rule({})'.format(self.pk))
+        return real_instance.get_related_owned_objects()
 
     def get_dependent_owned_objects(self) -> List['AbstractOwnedObject']:
         return self.get_related_owned_objects()
@@ -116,15 +118,10 @@ class AddressObject(OwnedObject):
     name = models.CharField(max_length=64)
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
-        if hasattr(self, 'networkaddressobject'):
-            return self.networkaddressobject.get_related_owned_objects()
-        elif hasattr(self, 'cidraddressobject'):
-            return self.cidraddressobject.get_related_owned_objects()
-        elif hasattr(self, 'hostaddressobject'):
-            return self.hostaddressobject.get_related_owned_objects()
-        elif hasattr(self, 'listaddressobject'):
-            return self.listaddressobject.get_related_owned_objects()
-        raise ValueError('Inconsistent AddressObject({})'.format(self.pk))
+        real_instance = self.get_real_instance()
+        if type(real_instance) is AddressObject:
+            raise ValueError('Inconsistent AddressObject({})'.format(self.pk))
+        return real_instance.get_related_owned_objects()
 
     def get_dependent_owned_objects(self) -> List['AbstractOwnedObject']:
         return self.get_related_owned_objects()
@@ -133,13 +130,10 @@ class ServiceObject(OwnedObject):
     name = models.CharField(max_length=64)
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
-        if hasattr(self, 'simpleserviceobject'):
-            return self.simpleserviceobject.get_related_owned_objects()
-        elif hasattr(self, 'listserviceobject'):
-            return self.listserviceobject.get_related_owned_objects()
-        elif hasattr(self, 'rangeserviceobject'):
-            return self.rangeserviceobject.get_related_owned_objects()
-        raise ValueError('Inconsistent ServiceObject({})'.format(self.pk))
+        real_instance = self.get_real_instance()
+        if type(real_instance) is ServiceObject:
+            raise ValueError('Inconsistent ServiceObject({})'.format(self.pk))
+        return real_instance.get_related_owned_objects()
 
 class BasicRule(Rule):
     source_address = models.ForeignKey(AddressObject, null=True, on_delete=models.RESTRICT, related_name='+')
@@ -189,14 +183,29 @@ class HostAddressObject(AddressObject):
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
         return []
 
+def get_related_owned_objects_of_elements(list_object: Union['ListAddressObject', 'ListServiceObject']) -> List[AbstractOwnedObject]:
+    '''
+    Collects the related objects of the elements of a list. Nested lists are visited once, so
+    cyclic lists don't recurse endlessly.
+    '''
+    rtn = []
+    visited = {list_object.pk}
+    pending = [list_object]
+    while len(pending) > 0:
+        for element in pending.pop(0).elements.all():
+            if isinstance(element, (ListAddressObject, ListServiceObject)):
+                if element.pk not in visited:
+                    visited.add(element.pk)
+                    pending.append(element)
+            else:
+                rtn += element.get_related_owned_objects()
+    return rtn
+
 class ListAddressObject(AddressObject):
     elements = models.ManyToManyField(AddressObject, related_name='+')
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
-        rtn = []
-        for element in self.elements:
-            rtn += element.get_related_owned_objects()
-        return rtn
+        return get_related_owned_objects_of_elements(self)
 
 class SimpleServiceObject(ServiceObject):
     protocol = models.CharField(max_length=16)
@@ -209,10 +218,7 @@ class ListServiceObject(ServiceObject):
     elements = models.ManyToManyField(ServiceObject, related_name='+')
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
-        rtn = []
-        for element in self.elements:
-            rtn += element.get_related_owned_objects()
-        return rtn
+        return get_related_owned_objects_of_elements(self)
 
 class RangeServiceObject(ServiceObject):
     protocol = models.CharField(max_length=16)
@@ -221,3 +227,51 @@ class RangeServiceObject(ServiceObject):
 
     def get_related_owned_objects(self) -> List[AbstractOwnedObject]:
         return []
+
+class ListMembership(models.Model):
+    '''
+    Materialized, flattened content of live address and service lists. Maps every live list to the
+    live objects it contains directly or through nested lists, except the nested lists themselves.
+    The position keeps the order of resolving the list recursively.
+
+    The table is maintained by `vycinity.meta.list_membership`.
+    '''
+    list = models.ForeignKey(AbstractOwnedObject, on_delete=models.CASCADE, related_name='+')
+    member = models.ForeignKey(AbstractOwnedObject, on_delete=models.CASCADE, related_name='+')
+    position = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['list', 'member'], name='%(app_label)s_unique_list_member')
+        ]
+        indexes = [
+            models.Index(fields=['list', 'position'])
+        ]
+
+class FirewallRuleNumber(models.Model):
+    '''
+    Number of a generated VyOS rule within a firewall chain. Numbers are kept across generations,
+    so changing a rule doesn't renumber the following rules of the chain. Firewalls and rules are
+    referenced by their uuid, as it is kept by new versions of them.
+
+    The key identifies a generated rule by the uuid of its rule and its index within the VyOS
+    rules generated from it. The table is maintained by `vycinity.s42.adapter.vyos13`.
+    '''
+    firewall_uuid = models.UUIDField()
+    direction = models.CharField(max_length=4, choices=DIRECTIONS)
+    ip_version = models.IntegerField(choices=IP_VERSIONS)
+    key = models.CharField(max_length=64)
+    number = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['firewall_uuid', 'direction', 'ip_version', 'key'], name='%(app_label)s_unique_firewall_rule_number')
+        ]
+
+class CompiledRuleSetVersion(models.Model):
+    '''
+    Version of the compiled rulesets cached by `vycinity.s42.adapter.vyos13`, as part of their cache
+    keys. The single row is updated whenever the sources of compiled rulesets change, in the same
+    transaction as the change, so every process stops using outdated compiled rulesets at once.
+    '''
+    version = models.PositiveBigIntegerField(default=0)
@@ -13,55 +13,216 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+import bisect
 import copy
-from vycinity.models import OWNED_OBJECT_STATE_LIVE, basic_models, network_models, firewall_models
+import hashlib
+from dataclasses import dataclass, field
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from vycinity.models import CONCRETE_LOAD_CHUNK_SIZE, OWNED_OBJECT_STATE_LIVE, AbstractOwnedObject, basic_models, load_concrete_instances, network_models, firewall_models
 from vycinity.models.firewall_models import DIRECTION_FROM, DIRECTION_INTO, BasicRule, CIDRAddressObject, CustomRule, HostAddressObject, ListAddressObject, ListServiceObject, NetworkAddressObject, RangeServiceObject, SimpleServiceObject
 from ..routerconfig import vyos13 as configurator
 
 import ipaddress
 import logging
 import re
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
+from uuid import UUID
 
 logger = logging.getLogger(__name__)
 DESCR_INVALID_RE = re.compile(r'[^A-Za-z0-9\-_.]')
 
-def getDirection(src: List[Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]], dst: List[Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]], v4_network: Optional[ipaddress.IPv4Network], v6_network: Optional[ipaddress.IPv6Network]) -> Tuple[Optional[str], Optional[str]]:
-    v4_direction = None
-    v6_direction = None
-    for addr in src:
-        if not v4_network is None:
-            if isinstance(addr, ipaddress.IPv4Address):
-                if addr in v4_network:
-                    v4_direction = firewall_models.DIRECTION_FROM
-            elif isinstance(addr, ipaddress.IPv4Network):
-                if addr.subnet_of(v4_network) or addr == v4_network:
-                    v4_direction = firewall_models.DIRECTION_FROM
-        if not v6_network is None:
-            if isinstance(addr, ipaddress.IPv6Address):
-                if addr in v6_network:
-                    v6_direction = firewall_models.DIRECTION_FROM
-            elif isinstance(addr, ipaddress.IPv6Network):
-                if addr.subnet_of(v6_network) or addr == v6_network:
-                    v6_direction = firewall_models.DIRECTION_FROM
-    for addr in dst:
-        if not v4_network is None:
-            if isinstance(addr, ipaddress.IPv4Address):
-                if addr in v4_network:
-                    v4_direction = firewall_models.DIRECTION_INTO
-            elif isinstance(addr, ipaddress.IPv4Network):
-                if addr.subnet_of(v4_network) or addr == v4_network:
-                    v4_direction = firewall_models.DIRECTION_INTO
-        if not v6_network is None:
-            if isinstance(addr, ipaddress.IPv6Address):
-                if addr in v6_network:
-                    v6_direction = firewall_models.DIRECTION_INTO
-            elif isinstance(addr, ipaddress.IPv6Network):
-                if addr.subnet_of(v6_network) or addr == v6_network:
-                    v6_direction = firewall_models.DIRECTION_INTO
-    return (v4_direction, v6_direction)
-
-def resolveAddress(address: firewall_models.AddressObject, _accumulator:List[firewall_models.AddressObject]=[]) -> List[Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]]:
+FIREWALL_MODE_EXPAND = 'expand'
+FIREWALL_MODE_GROUPS = 'groups'
+FIREWALL_MODE = FIREWALL_MODE_EXPAND
+'''
+How basic rules are compiled. With `FIREWALL_MODE_EXPAND`, a rule is expanded to one VyOS rule per
+source and destination address. With `FIREWALL_MODE_GROUPS`, addresses and ports of a rule are put
+into firewall groups, so a rule results in a single VyOS rule per IP version. Can be overridden by
+the setting `VYCINITY_FIREWALL_MODE`.
+'''
+
+FIREWALL_REMOVE_SHADOWED_RULES = True
+'''
+Whether generated rules matching only packets already matched by an earlier rule of the same
+firewall are removed, see `removeShadowedRules`. Can be overridden by the setting
+`VYCINITY_FIREWALL_REMOVE_SHADOWED_RULES`.
+'''
+
+COMPILED_RULESET_CACHE_TTL = 3600
+'''
+Seconds a compiled ruleset is kept in the Django cache, so a ruleset shared by the firewalls of
+several routers is compiled once. Compiled rulesets are invalidated whenever rules or the objects
+they reference change, see `CompiledRuleSetVersion`. Without a shared cache backend (`CACHES`),
+every process compiles and caches rulesets on its own. Can be overridden by the setting `VYCINITY_COMPILED_RULESET_CACHE_TTL`, 0
+disables the cache.
+'''
+
+IPAddressOrNetwork = Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]
+
+class AddressInterval:
+    '''
+    A resolved address or network as interval of integers, both bounds included. Comparing
+    intervals is much cheaper than comparing `ipaddress` objects, which matters for big policies.
+    '''
+    __slots__ = ('version', 'start', 'end')
+
+    def __init__(self, version: int, start: int, end: int):
+        self.version = version
+        self.start = start
+        self.end = end
+
+    @staticmethod
+    def fromAddress(address: IPAddressOrNetwork) -> 'AddressInterval':
+        if isinstance(address, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            return AddressInterval(address.version, int(address), int(address))
+        return AddressInterval(address.version, int(address.network_address), int(address.broadcast_address))
+
+    def within(self, bounds: Optional[Tuple[int, int]]) -> bool:
+        return not bounds is None and bounds[0] <= self.start and self.end <= bounds[1]
+
+    def isHost(self) -> bool:
+        return self.start == self.end
+
+    def toAddress(self) -> IPAddressOrNetwork:
+        '''
+        Converts the interval back, which has to be a single address or an aligned network.
+        '''
+        address = ipaddress.ip_address(self.start) if self.version == 4 else ipaddress.IPv6Address(self.start)
+        if self.isHost():
+            return address
+        return ipaddress.ip_network('%s/%d' % (address, address.max_prefixlen - (self.end - self.start).bit_length()))
+
+    def toNetworkString(self) -> str:
+        '''
+        Returns the interval as network, also for single addresses, e.g. `192.0.2.1/32`.
+        '''
+        address = ipaddress.ip_address(self.start) if self.version == 4 else ipaddress.IPv6Address(self.start)
+        return '%s/%d' % (address, address.max_prefixlen - (self.end - self.start).bit_length())
+
+    def __str__(self):
+        return str(self.toAddress())
+
+    def __repr__(self):
+        return 'AddressInterval(%d, %d, %d)' % (self.version, self.start, self.end)
+
+    def __eq__(self, other):
+        return isinstance(other, AddressInterval) and (self.version, self.start, self.end) == (other.version, other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.version, self.start, self.end))
+
+def getNetworkBounds(network: Optional[Union[ipaddress.IPv4Network,ipaddress.IPv6Network]]) -> Optional[Tuple[int, int]]:
+    if network is None:
+        return None
+    return (int(network.network_address), int(network.broadcast_address))
+
+def getIntervalDirection(src: List[AddressInterval], dst: List[AddressInterval], v4_bounds: Optional[Tuple[int, int]], v6_bounds: Optional[Tuple[int, int]]) -> Tuple[Optional[str], Optional[str]]:
+    '''
+    Derives the direction of a rule per IP version. Sources inside of the network result in
+    `DIRECTION_FROM`, destinations inside of the network in `DIRECTION_INTO`, which takes
+    precedence.
+
+    params:
+        v4_bounds: The first and last IPv4 address of the network as integers, see `getNetworkBounds`.
+        v6_bounds: The same for IPv6.
+
+    returns: The direction for IPv4 and IPv6, None if the rule doesn't concern the network.
+    '''
+    bounds = {4: v4_bounds, 6: v6_bounds}
+    directions: Dict[int, Optional[str]] = {4: None, 6: None}
+    for (intervals, direction) in [(src, firewall_models.DIRECTION_FROM), (dst, firewall_models.DIRECTION_INTO)]:
+        for interval in intervals:
+            if interval.within(bounds[interval.version]):
+                directions[interval.version] = direction
+    return (directions[4], directions[6])
+
+def getDirection(src: List[IPAddressOrNetwork], dst: List[IPAddressOrNetwork], v4_network: Optional[ipaddress.IPv4Network], v6_network: Optional[ipaddress.IPv6Network]) -> Tuple[Optional[str], Optional[str]]:
+    return getIntervalDirection([AddressInterval.fromAddress(addr) for addr in src], [AddressInterval.fromAddress(addr) for addr in dst], getNetworkBounds(v4_network), getNetworkBounds(v6_network))
+
+class FirewallObjectCache:
+    '''
+    Loads the address and service objects used by firewall rules in bulk as their concrete types,
+    together with the materialized members of list objects. Resolving addresses and services then
+    works without a polymorphic query per object and list.
+    '''
+
+    def __init__(self):
+        self.objects: Dict[int, AbstractOwnedObject] = {}
+        self.members: Dict[int, List[int]] = {}
+        self.resolved_addresses: Dict[int, Optional[List[AddressInterval]]] = {}
+        self.aggregated: Dict[Tuple[AddressInterval, ...], List[AddressInterval]] = {}
+        self.strings: Dict[AddressInterval, str] = {}
+
+    def _load_members(self, list_pks: List[int]) -> Set[int]:
+        member_pks = set()
+        for list_pk in list_pks:
+            self.members[list_pk] = []
+        for start in range(0, len(list_pks), CONCRETE_LOAD_CHUNK_SIZE):
+            for (list_pk, member_pk) in firewall_models.ListMembership.objects.filter(list_id__in=list_pks[start:start + CONCRETE_LOAD_CHUNK_SIZE]).order_by('list_id', 'position').values_list('list_id', 'member_id'):
+                self.members[list_pk].append(member_pk)
+                member_pks.add(member_pk)
+        return member_pks
+
+    def load(self, base_model: Type[AbstractOwnedObject], pks: Iterable[Optional[int]]) -> None:
+        '''
+        Loads objects and the members of loaded lists.
+
+        params:
+            base_model: The common base model of the objects, e.g. AddressObject.
+            pks: The primary keys of the objects, None is skipped.
+        '''
+        querysets = {NetworkAddressObject: NetworkAddressObject.objects.select_related('related_network')}
+        instances = load_concrete_instances(base_model, {pk for pk in pks if pk is not None and pk not in self.objects}, querysets)
+        self.objects.update(instances)
+        list_pks = [pk for (pk, instance) in instances.items() if isinstance(instance, (ListAddressObject, ListServiceObject))]
+        member_pks = {pk for pk in self._load_members(list_pks) if pk not in self.objects}
+        self.objects.update(load_concrete_instances(base_model, member_pks, querysets))
+
+    def get(self, pk: int) -> AbstractOwnedObject:
+        return self.objects[pk]
+
+    def resolveAddressIntervals(self, pk: int) -> Optional[List[AddressInterval]]:
+        '''
+        Resolves a loaded address object to intervals, see `resolveAddress`. Results are reused, as
+        rules often share address objects.
+        '''
+        if pk not in self.resolved_addresses:
+            resolved = resolveAddress(self.objects[pk], cache=self)
+            self.resolved_addresses[pk] = None if resolved is None else [AddressInterval.fromAddress(address) for address in resolved]
+        return self.resolved_addresses[pk]
+
+    def aggregate(self, intervals: List[AddressInterval]) -> List[AddressInterval]:
+        '''
+        Aggregates intervals, see `aggregateIntervals`. Results are reused.
+        '''
+        key = tuple(intervals)
+        if key not in self.aggregated:
+            self.aggregated[key] = aggregateIntervals(intervals)
+        return self.aggregated[key]
+
+    def formatIntervals(self, intervals: List[AddressInterval]) -> List[str]:
+        '''
+        Formats aggregated intervals as addresses and networks. Results are reused.
+        '''
+        rtn = []
+        for interval in intervals:
+            if interval not in self.strings:
+                self.strings[interval] = str(interval)
+            rtn.append(self.strings[interval])
+        return rtn
+
+    def getMembers(self, list_object: Union[ListAddressObject, ListServiceObject]) -> List[AbstractOwnedObject]:
+        '''
+        Returns the live members of a list, including the members of nested lists.
+        '''
+        return [self.objects[pk] for pk in self.members.get(list_object.pk, [])]
+
+def resolveAddress(address: firewall_models.AddressObject, _accumulator:List[firewall_models.AddressObject]=[], cache: Optional[FirewallObjectCache]=None) -> List[Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]]:
     rtn = []
     if not address in _accumulator and address.state == OWNED_OBJECT_STATE_LIVE:
         if isinstance(address, NetworkAddressObject):
@@ -71,8 +232,9 @@ def resolveAddress(address: firewall_models.AddressObject, _accumulator:List[fir
             if (network.ipv6_network_address and network.ipv6_network_bits):
                 rtn.append(ipaddress.IPv6Network((network.ipv6_network_address, network.ipv6_network_bits), strict=False))
         elif isinstance(address, ListAddressObject):
-            for list_object in address.elements.filter(state=OWNED_OBJECT_STATE_LIVE):
-                resolved = resolveAddress(list_object, _accumulator + [address])
+            elements = address.elements.filter(state=OWNED_OBJECT_STATE_LIVE) if cache is None else cache.getMembers(address)
+            for list_object in elements:
+                resolved = resolveAddress(list_object, _accumulator + [address], cache)
                 if resolved is None:
                     return None
                 rtn += resolved
@@ -90,30 +252,111 @@ def resolveAddress(address: firewall_models.AddressObject, _accumulator:List[fir
             return None
     return rtn
 
-def resolveService(service: firewall_models.ServiceObject, _accumulator:List[firewall_models.ServiceObject]=[]) -> Optional[Tuple[List[str],str]]:
-    rtn_ports = []
-    rtn_proto = None
+MAX_PORTS_PER_RULE = 15
+'''
+Maximum number of ports in the port expression of a single VyOS rule, where a range counts as two
+ports (limit of the iptables multiport match). Longer expressions are split into multiple rules.
+'''
+
+def _mergeIntervals(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[List[int]] = []
+    for (first, last) in sorted(intervals):
+        if len(merged) > 0 and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last) for (first, last) in merged]
+
+def normalizePorts(intervals: List[Tuple[int, int]]) -> List[str]:
+    '''
+    Merges overlapping and adjacent port intervals.
+
+    params:
+        intervals: The port intervals as tuples of first and last port, both included.
+
+    returns: The minimal port expression as ascending list of ports and ranges, e.g. `['22', '80-81']`.
+    '''
+    return [str(first) if first == last else '%d-%d' % (first, last) for (first, last) in _mergeIntervals(intervals)]
+
+def splitPorts(ports: List[str]) -> List[List[str]]:
+    '''
+    Splits a port expression into parts not exceeding `MAX_PORTS_PER_RULE`.
+    '''
+    rtn = [[]]
+    weight = 0
+    for port in ports:
+        port_weight = 2 if '-' in port else 1
+        if weight + port_weight > MAX_PORTS_PER_RULE:
+            rtn.append([])
+            weight = 0
+        rtn[-1].append(port)
+        weight += port_weight
+    return rtn
+
+def _collectPortIntervals(service: firewall_models.ServiceObject, _accumulator: List[firewall_models.ServiceObject], cache: Optional[FirewallObjectCache]) -> Optional[Tuple[List[Tuple[int, int]], Optional[str]]]:
     if service in _accumulator or service.state != OWNED_OBJECT_STATE_LIVE:
-        return []
+        return ([], None)
     if isinstance(service, ListServiceObject):
-        for element in service.elements.filter(state=OWNED_OBJECT_STATE_LIVE):
-            (resolved_ports, resolved_proto) = resolveService(element, _accumulator + [service])
-            if resolved_ports is None:
+        rtn_intervals = []
+        rtn_proto = None
+        elements = service.elements.filter(state=OWNED_OBJECT_STATE_LIVE) if cache is None else cache.getMembers(service)
+        for element in elements:
+            resolved = _collectPortIntervals(element, _accumulator + [service], cache)
+            if resolved is None:
                 return None
+            (resolved_intervals, resolved_proto) = resolved
+            if resolved_proto is None:
+                continue
             if not rtn_proto is None and rtn_proto != resolved_proto:
                 return None
-            rtn_ports += resolved_ports
+            rtn_intervals += resolved_intervals
             rtn_proto = resolved_proto
+        return (rtn_intervals, rtn_proto)
     elif isinstance(service, SimpleServiceObject):
-        rtn_ports = [service.port]
-        rtn_proto = service.protocol
+        return ([(service.port, service.port)], service.protocol)
     elif isinstance(service, RangeServiceObject):
-        if service.start_port >= service.end_port:
-            rtn_ports = ['%d-%d' % (service.start_port, service.end_port)]
-            rtn_proto = service.protocol
-    if rtn_proto is None:
+        if service.start_port > service.end_port:
+            return None
+        return ([(service.start_port, service.end_port)], service.protocol)
+    return None
+
+def resolveService(service: firewall_models.ServiceObject, _accumulator:List[firewall_models.ServiceObject]=[], cache: Optional[FirewallObjectCache]=None) -> Optional[Tuple[List[str],str]]:
+    '''
+    Resolves a service to its ports and protocol. Ports of lists are deduplicated and overlapping or
+    adjacent ranges are merged, see `normalizePorts`.
+
+    returns: The port expression and the protocol or None, if the service is invalid, empty or
+             mixes protocols.
+    '''
+    resolved = _collectPortIntervals(service, _accumulator, cache)
+    if resolved is None or resolved[1] is None:
         return None
-    return (rtn_ports, rtn_proto)
+    (intervals, proto) = resolved
+    return (normalizePorts(intervals), proto)
+
+def aggregateIntervals(intervals: List[AddressInterval]) -> List[AddressInterval]:
+    '''
+    Collapses addresses per IP version. Addresses and networks inside of other networks are
+    dropped and adjacent networks are merged into the fewest aligned networks.
+
+    returns: The aggregated IPv4 intervals followed by the IPv6 intervals, each in ascending order.
+    '''
+    rtn = []
+    for version in [4, 6]:
+        for (start, end) in _mergeIntervals([(interval.start, interval.end) for interval in intervals if interval.version == version]):
+            # split into the largest aligned blocks
+            while start <= end:
+                size = min(start & -start if start > 0 else 1 << (32 if version == 4 else 128), 1 << ((end - start + 1).bit_length() - 1))
+                rtn.append(AddressInterval(version, start, start + size - 1))
+                start += size
+    return rtn
+
+def aggregateAddresses(address_list: List[IPAddressOrNetwork]) -> List[IPAddressOrNetwork]:
+    '''
+    Like `aggregateIntervals`, but for `ipaddress` objects. Single addresses are returned as
+    addresses again.
+    '''
+    return [interval.toAddress() for interval in aggregateIntervals([AddressInterval.fromAddress(address) for address in address_list])]
 
 def classifyVersionedAddressesAsString(address_list: List[Union[ipaddress.IPv4Address,ipaddress.IPv6Address,ipaddress.IPv4Network,ipaddress.IPv6Network]]) -> Tuple[List[str],List[str]]:
     rtn_v4 = []
@@ -125,20 +368,576 @@ def classifyVersionedAddressesAsString(address_list: List[Union[ipaddress.IPv4Ad
             rtn_v6.append(str(obj))
     return (rtn_v4, rtn_v6)
 
-def generateFirewallConfig(router: basic_models.Router) -> Tuple[configurator.Vyos13RouterConfig, Dict[int, str], Dict[int, str]]:
-    networks = []
-    for managed_interface in network_models.ManagedInterface.objects.filter(router=router):
-        networks.append(managed_interface.network)
+class FirewallGroups:
+    '''
+    Collects the firewall groups of a router. Groups are named by a hash of their content, so rules
+    and firewalls with the same addresses or ports share a group.
+    '''
+
+    GROUP_VALUE_KEYS = {
+        'address-group': 'address',
+        'network-group': 'network',
+        'ipv6-address-group': 'address',
+        'ipv6-network-group': 'network',
+        'port-group': 'port',
+    }
+
+    def __init__(self):
+        self.groups: Dict[str, Dict[str, List[str]]] = {group_type: {} for group_type in self.GROUP_VALUE_KEYS}
+
+    def getGroup(self, group_type: str, entries: List[str]) -> str:
+        '''
+        Returns the name of the group with the given entries, creating it if required.
+        '''
+        content = sorted(set(entries))
+        name = 'autogen_' + hashlib.sha256((group_type + ':' + ','.join(content)).encode('utf-8')).hexdigest()[:16]
+        self.groups[group_type][name] = content
+        return name
+
+    def getAddressMatch(self, intervals: List[AddressInterval]) -> Dict[str, Any]:
+        '''
+        Returns the source or destination match for aggregated addresses of the same IP version. A
+        single address is matched directly. Only hosts result in an address group, mixed hosts and
+        networks in a network group.
+        '''
+        if len(intervals) == 1:
+            return {'address': str(intervals[0])}
+        prefix = '' if intervals[0].version == 4 else 'ipv6-'
+        if all(interval.isHost() for interval in intervals):
+            return {'group': {prefix + 'address-group': self.getGroup(prefix + 'address-group', [str(interval) for interval in intervals])}}
+        return {'group': {prefix + 'network-group': self.getGroup(prefix + 'network-group', [interval.toNetworkString() for interval in intervals])}}
+
+    def getPortMatch(self, ports: List[str]) -> Dict[str, Any]:
+        '''
+        Returns the destination match for ports. A single port or range is matched directly.
+        '''
+        if len(ports) == 1:
+            return {'port': ports[0]}
+        return {'group': {'port-group': self.getGroup('port-group', ports)}}
+
+    def merge(self, groups: Dict[str, Dict[str, List[str]]]) -> None:
+        '''
+        Adds groups collected by another instance.
+        '''
+        for (group_type, named_groups) in groups.items():
+            self.groups[group_type].update(named_groups)
+
+    def toConfig(self) -> Dict[str, Any]:
+        return {group_type: {name: {self.GROUP_VALUE_KEYS[group_type]: content} for (name, content) in groups.items()} for (group_type, groups) in self.groups.items() if len(groups) > 0}
+
+@dataclass
+class RuleMatch:
+    '''
+    The packets matched by a generated rule. Addresses and ports are lists of integer intervals,
+    None matches everything.
+    '''
+    protocol: Optional[str]
+    sources: Optional[List[Tuple[int, int]]]
+    destinations: Optional[List[Tuple[int, int]]]
+    ports: Optional[List[Tuple[int, int]]]
+
+@dataclass
+class ShadowedRule:
+    '''
+    A generated rule, which has been removed as an earlier rule matches all of its packets.
+    '''
+    firewall_id: int
+    direction: str
+    ip_version: int
+    rule_number: str
+    rule_id: Optional[int]
+    shadowed_by_number: str
+    shadowed_by_rule_id: Optional[int]
+
+def _intervalsCover(outer: Optional[List[Tuple[int, int]]], inner: Optional[List[Tuple[int, int]]]) -> bool:
+    if outer is None:
+        return True
+    if inner is None:
+        return False
+    # merged intervals are disjoint and not adjacent, so a covered interval lies inside one of them
+    return all(any(first <= inner_first and inner_last <= last for (first, last) in outer) for (inner_first, inner_last) in inner)
+
+def parseRuleMatch(raw_rule: Dict[str, Any], groups: Optional[FirewallGroups]) -> Optional[RuleMatch]:
+    '''
+    Parses the match of a generated rule. Rules with other criteria than addresses, destination
+    ports and protocol (e.g. custom rules or the state rule) are not understood.
+
+    returns: The match or None, if the rule isn't understood.
+    '''
+    if not set(raw_rule.keys()) <= {'source', 'destination', 'protocol', 'action'}:
+        return None
+    group_contents = {} if groups is None else groups.groups
+    try:
+        addresses = {}
+        for side in ['source', 'destination']:
+            side_config = raw_rule.get(side, {})
+            side_group = side_config.get('group', {})
+            if not set(side_config.keys()) <= {'address', 'group', 'port'} or not set(side_group.keys()) <= set(FirewallGroups.GROUP_VALUE_KEYS.keys()):
+                return None
+            entries = [[side_config['address']]] if 'address' in side_config else []
+            entries += [group_contents[group_type][name] for (group_type, name) in side_group.items() if group_type != 'port-group']
+            if len(entries) > 1:
+                return None
+            addresses[side] = None if len(entries) == 0 else _mergeIntervals([(int(network.network_address), int(network.broadcast_address)) for network in [ipaddress.ip_network(entry, strict=False) for entry in entries[0]]])
+        if 'port' in raw_rule.get('source', {}) or 'port-group' in raw_rule.get('source', {}).get('group', {}):
+            return None
+        destination = raw_rule.get('destination', {})
+        port_entries = []
+        if 'port' in destination:
+            port_entries.append(str(destination['port']).split(','))
+        if 'port-group' in destination.get('group', {}):
+            port_entries.append(group_contents['port-group'][destination['group']['port-group']])
+        if len(port_entries) > 1:
+            return None
+        ports = None
+        if len(port_entries) == 1:
+            ports = _mergeIntervals([(int(port.split('-')[0]), int(port.split('-')[-1])) for port in port_entries[0]])
+    except (KeyError, ValueError):
+        return None
+    return RuleMatch(raw_rule.get('protocol'), addresses['source'], addresses['destination'], ports)
+
+def matchCovers(outer: RuleMatch, inner: RuleMatch) -> bool:
+    '''
+    Checks whether all packets matched by `inner` are matched by `outer` as well.
+    '''
+    if not outer.protocol is None and outer.protocol != inner.protocol:
+        return False
+    return _intervalsCover(outer.sources, inner.sources) and _intervalsCover(outer.destinations, inner.destinations) and _intervalsCover(outer.ports, inner.ports)
+
+def removeShadowedRules(rules: Dict[str, Dict[str, Any]], groups: Optional[FirewallGroups]) -> List[Tuple[str, str]]:
+    '''
+    Removes rules of a chain, which can't match any packet as an earlier rule matches all of their
+    packets. All actions of generated rules are terminal, so the action of the earlier rule doesn't
+    matter. Rules not understood by `parseRuleMatch` are kept and don't shadow other rules.
+
+    params:
+        rules: The rules of the chain by rule number, modified in place.
+        groups: The firewall groups referenced by the rules.
+
+    returns: The removed rule numbers together with the number of the shadowing rule.
+    '''
+    removed = []
+    kept: List[Tuple[str, RuleMatch]] = []
+    for number in sorted(rules.keys(), key=int):
+        match = parseRuleMatch(rules[number], groups)
+        if match is None:
+            continue
+        shadowing_number = next((kept_number for (kept_number, kept_match) in kept if matchCovers(kept_match, match)), None)
+        if shadowing_number is None:
+            kept.append((number, match))
+        else:
+            del rules[number]
+            removed.append((number, shadowing_number))
+    return removed
+
+RULE_NUMBER_STEP = 10
+'''
+Distance between the numbers of rules appended to a chain, leaving room for rules inserted later.
+'''
+
+MAX_RULE_NUMBER = 9998
+'''
+Highest number of a generated rule, 9999 is used by the rule accepting established connections of
+stateful firewalls.
+'''
+
+def _longestIncreasingSubsequence(numbers: List[int]) -> Set[int]:
+    '''
+    Returns the indices of a longest strictly increasing subsequence of the given numbers.
+    '''
+    tail_numbers: List[int] = []
+    tail_indices: List[int] = []
+    predecessors: List[Optional[int]] = []
+    for (index, number) in enumerate(numbers):
+        length = bisect.bisect_left(tail_numbers, number)
+        predecessors.append(tail_indices[length - 1] if length > 0 else None)
+        if length == len(tail_numbers):
+            tail_numbers.append(number)
+            tail_indices.append(index)
+        else:
+            tail_numbers[length] = number
+            tail_indices[length] = index
+    rtn = set()
+    current = tail_indices[-1] if len(tail_indices) > 0 else None
+    while not current is None:
+        rtn.add(current)
+        current = predecessors[current]
+    return rtn
+
+def allocateRuleNumbers(keys: List[str], previous: Dict[str, int]) -> Dict[str, int]:
+    '''
+    Numbers the rules of a chain. Rules keep their previous number as long as the order of the chain
+    allows it, new or moved rules get numbers within the gaps between them. The chain is numbered
+    from scratch only if a gap is too small.
+
+    params:
+        keys: The keys of the rules in the order of the chain.
+        previous: The previous numbers by key, may contain keys of removed rules.
+
+    returns: The numbers by key.
+    '''
+    numbered = [index for (index, key) in enumerate(keys) if 0 < previous.get(key, 0) <= MAX_RULE_NUMBER]
+    kept = {numbered[position] for position in _longestIncreasingSubsequence([previous[keys[index]] for index in numbered])}
+    rtn: Dict[str, int] = {}
+    lower = 0
+    pending: List[str] = []
+    for index in range(len(keys) + 1):
+        if index < len(keys) and not index in kept:
+            pending.append(keys[index])
+            continue
+        upper = previous[keys[index]] if index < len(keys) else None
+        if len(pending) > 0:
+            if upper is None and lower + len(pending) * RULE_NUMBER_STEP <= MAX_RULE_NUMBER:
+                numbers = [lower + RULE_NUMBER_STEP * (position + 1) for position in range(len(pending))]
+            else:
+                bound = MAX_RULE_NUMBER + 1 if upper is None else upper
+                if bound - lower - 1 < len(pending):
+                    step = max(1, min(RULE_NUMBER_STEP, MAX_RULE_NUMBER // max(1, len(keys))))
+                    if len(keys) * step > MAX_RULE_NUMBER:
+                        logger.warning('Chain with %d rules exceeds the highest rule number %d.', len(keys), MAX_RULE_NUMBER)
+                    return {key: step * (position + 1) for (position, key) in enumerate(keys)}
+                numbers = [lower + (bound - lower) * (position + 1) // (len(pending) + 1) for position in range(len(pending))]
+            rtn.update(zip(pending, numbers))
+            pending = []
+        if not upper is None:
+            rtn[keys[index]] = upper
+            lower = upper
+    return rtn
+
+ChainId = Tuple[UUID, str, int]
+
+def _loadRuleNumbers(chains: Iterable[ChainId]) -> Tuple[Dict[ChainId, Dict[str, int]], Dict[Tuple[ChainId, str], int]]:
+    previous: Dict[ChainId, Dict[str, int]] = {chain: {} for chain in chains}
+    row_ids: Dict[Tuple[ChainId, str], int] = {}
+    firewall_uuids = list({firewall_uuid for (firewall_uuid, _, _) in previous})
+    for start in range(0, len(firewall_uuids), CONCRETE_LOAD_CHUNK_SIZE):
+        for (pk, firewall_uuid, direction, ip_version, key, number) in firewall_models.FirewallRuleNumber.objects.filter(firewall_uuid__in=firewall_uuids[start:start + CONCRETE_LOAD_CHUNK_SIZE]).values_list('pk', 'firewall_uuid', 'direction', 'ip_version', 'key', 'number'):
+            chain = (firewall_uuid, direction, ip_version)
+            if chain in previous:
+                previous[chain][key] = number
+                row_ids[(chain, key)] = pk
+    return (previous, row_ids)
+
+def assignRuleNumbers(chains: Dict[ChainId, List[str]], persist: bool = False) -> Dict[ChainId, Dict[str, int]]:
+    '''
+    Allocates the rule numbers of chains by `allocateRuleNumbers`, based on the numbers persisted as
+    `FirewallRuleNumber`. Only persisting the numbers changes them, so previews of a configuration
+    don't affect the numbers of the next deployment. Numbers of rules no longer part of a chain are
+    released when persisting.
+
+    params:
+        chains: The keys of the rules in the order of the chain by firewall uuid, direction and IP
+                version.
+        persist: Whether the allocated numbers are stored. The firewalls are locked meanwhile, so
+                 concurrent generations of the same firewall wait for each other.
+
+    returns: The numbers by key for every chain.
+    '''
+    if not persist:
+        (previous, _) = _loadRuleNumbers(chains.keys())
+        return {chain: allocateRuleNumbers(keys, previous[chain]) for (chain, keys) in chains.items()}
+
+    firewall_uuids = list({firewall_uuid for (firewall_uuid, _, _) in chains})
+    with transaction.atomic():
+        for start in range(0, len(firewall_uuids), CONCRETE_LOAD_CHUNK_SIZE):
+            list(firewall_models.Firewall.objects.non_polymorphic().select_for_update().filter(uuid__in=firewall_uuids[start:start + CONCRETE_LOAD_CHUNK_SIZE]).order_by('pk').values_list('pk', flat=True))
+        (previous, row_ids) = _loadRuleNumbers(chains.keys())
+
+        rtn: Dict[ChainId, Dict[str, int]] = {}
+        obsolete: List[int] = []
+        created: List[firewall_models.FirewallRuleNumber] = []
+        for (chain, keys) in chains.items():
+            numbers = allocateRuleNumbers(keys, previous[chain])
+            rtn[chain] = numbers
+            obsolete += [row_ids[(chain, key)] for (key, number) in previous[chain].items() if numbers.get(key) != number]
+            created += [firewall_models.FirewallRuleNumber(firewall_uuid=chain[0], direction=chain[1], ip_version=chain[2], key=key, number=number) for (key, number) in numbers.items() if previous[chain].get(key) != number]
+        for start in range(0, len(obsolete), CONCRETE_LOAD_CHUNK_SIZE):
+            firewall_models.FirewallRuleNumber.objects.filter(pk__in=obsolete[start:start + CONCRETE_LOAD_CHUNK_SIZE]).delete()
+        firewall_models.FirewallRuleNumber.objects.bulk_create(created, batch_size=CONCRETE_LOAD_CHUNK_SIZE)
+    return rtn
+
+@dataclass
+class FirewallGenerationContext:
+    '''
+    The state of a single firewall while generating its rules. Generated rules are collected per
+    chain and numbered by `numberRules` once the numbers are allocated.
+    '''
+    raw_config: Dict[str, Dict[int, Dict[str, Any]]]
+    v4_network: Optional[ipaddress.IPv4Network]
+    v6_network: Optional[ipaddress.IPv6Network]
+    cache: Optional[FirewallObjectCache]
+    groups: Optional[FirewallGroups] = None
+    current_rule: Optional[firewall_models.Rule] = None
+    origins: Dict[Tuple[str, int, str], int] = field(default_factory=dict)
+    generated: Dict[Tuple[str, int], List[Tuple[str, int, Dict[str, Any]]]] = field(default_factory=dict)
+    emitted: Dict[Tuple[str, int, UUID], int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.v4_bounds = getNetworkBounds(self.v4_network)
+        self.v6_bounds = getNetworkBounds(self.v6_network)
+
+    def addRule(self, direction: str, ip_version: int, raw_rule: Dict[str, Any]) -> None:
+        if self.current_rule is None:
+            raise AssertionError('Rules are generated without their origin.')
+        emitted_key = (direction, ip_version, self.current_rule.uuid)
+        index = self.emitted.get(emitted_key, 0)
+        self.emitted[emitted_key] = index + 1
+        self.generated.setdefault((direction, ip_version), []).append(('%s:%d' % (self.current_rule.uuid, index), self.current_rule.id, raw_rule))
+
+    def addCompiled(self, compiled: 'CompiledRuleSet') -> None:
+        for (chain, rules) in compiled.rules.items():
+            self.generated.setdefault(chain, []).extend(rules)
+        if not self.groups is None:
+            self.groups.merge(compiled.groups)
+
+    def getChainKeys(self, direction: str, ip_version: int) -> List[str]:
+        return [key for (key, _, _) in self.generated.get((direction, ip_version), [])]
+
+    def numberRules(self, direction: str, ip_version: int, numbers: Dict[str, int]) -> None:
+        for (key, rule_id, raw_rule) in self.generated.get((direction, ip_version), []):
+            number = str(numbers[key])
+            # compiled rulesets are shared by firewalls
+            self.raw_config[direction][ip_version]['rule'][number] = copy.deepcopy(raw_rule)
+            self.origins[(direction, ip_version, number)] = rule_id
+
+def generateBasicRule(rule: BasicRule, context: FirewallGenerationContext) -> None:
+    source_addresses = []
+    if rule.source_address_id:
+        source_addresses = context.cache.resolveAddressIntervals(rule.source_address_id)
+    destination_addresses = []
+    if rule.destination_address_id:
+        destination_addresses = context.cache.resolveAddressIntervals(rule.destination_address_id)
+    if source_addresses is None or destination_addresses is None:
+        logger.warning('Source or destination address of basic rule %s could not be resolved. Ignoring rule.', rule.id)
+        return
+    (v4_direction, v6_direction) = getIntervalDirection(source_addresses, destination_addresses, context.v4_bounds, context.v6_bounds)
+    if v4_direction is None and v6_direction is None:
+        logger.warning('basic rule %s has no clear direction. Ignoring rule.', rule.id)
+        return
+    # the direction depends on the addresses as configured, aggregating may leave the network
+    source_addresses = context.cache.aggregate(source_addresses)
+    destination_addresses = context.cache.aggregate(destination_addresses)
+
+    (v4_sources, v6_sources) = ([], [])
+    for interval in source_addresses:
+        (v4_sources if interval.version == 4 else v6_sources).append(interval)
+    (v4_destinations, v6_destinations) = ([], [])
+    for interval in destination_addresses:
+        (v4_destinations if interval.version == 4 else v6_destinations).append(interval)
+    if rule.destination_service_id:
+        resolvedService = resolveService(context.cache.get(rule.destination_service_id), cache=context.cache)
+        if resolvedService is None:
+            logger.warning('Service %s in basic rule %s could not be resolved. Ignoring rule.', rule.destination_service_id, rule.id)
+            return
+        (ports, proto) = resolvedService
+    else:
+        ports = None
+        proto = None
+    for (ip_version, direction, sources, destinations) in [(4, v4_direction, v4_sources, v4_destinations), (6, v6_direction, v6_sources, v6_destinations)]:
+        if direction is None:
+            continue
+        if not context.groups is None:
+            if len(sources) == 0 or len(destinations) == 0:
+                continue
+            raw_rule = {
+                'source': context.groups.getAddressMatch(sources),
+                'destination': context.groups.getAddressMatch(destinations),
+                'action': rule.action
+            }
+            if not proto is None:
+                port_match = context.groups.getPortMatch(ports)
+                if 'group' in port_match and 'group' in raw_rule['destination']:
+                    raw_rule['destination']['group'].update(port_match['group'])
+                else:
+                    raw_rule['destination'].update(port_match)
+                raw_rule['protocol'] = proto
+            context.addRule(direction, ip_version, raw_rule)
+            continue
+        for src in context.cache.formatIntervals(sources):
+            for dst in context.cache.formatIntervals(destinations):
+                if proto is None:
+                    context.addRule(direction, ip_version, {'source':{'address':src}, 'destination':{'address':dst}, 'action':rule.action})
+                    continue
+                for ports_part in splitPorts(ports):
+                    raw_rule = {'source':{'address':src}, 'destination':{'address':dst, 'port':','.join(ports_part)}, 'protocol':proto, 'action':rule.action}
+                    context.addRule(direction, ip_version, raw_rule)
+
+def generateCustomRule(rule: CustomRule, context: FirewallGenerationContext) -> None:
+    if (rule.ip_version in [firewall_models.IP_VERSION_4, firewall_models.IP_VERSION_6] and 
+            rule.direction in [DIRECTION_INTO, DIRECTION_FROM]):
+        context.addRule(rule.direction, rule.ip_version, rule.rule_definition)
+    else:
+        logger.warning('CustomRule %s has invalid ip version or direction. Ignoring rule.', rule.id)
+
+RULE_GENERATORS: Dict[Type[firewall_models.Rule], Callable[[Any, FirewallGenerationContext], None]] = {
+    BasicRule: generateBasicRule,
+    CustomRule: generateCustomRule,
+}
+'''
+Generators by concrete rule type. Rules are loaded by one non-polymorphic query per type listed here.
+'''
+
+def loadLiveRules(ruleset_ids: List[int]) -> Dict[int, List[firewall_models.Rule]]:
+    '''
+    Loads the live rules of rulesets with one query per rule type, ordered by priority.
+
+    returns: The rules by ruleset id.
+    '''
+    rtn: Dict[int, List[firewall_models.Rule]] = {ruleset_id: [] for ruleset_id in ruleset_ids}
+    for rule_type in RULE_GENERATORS:
+        for rule in rule_type.objects.non_polymorphic().filter(related_ruleset_id__in=ruleset_ids, state=OWNED_OBJECT_STATE_LIVE):
+            rtn[rule.related_ruleset_id].append(rule)
+    for rules in rtn.values():
+        rules.sort(key=lambda rule: (rule.priority, rule.pk))
+    return rtn
+
+@dataclass
+class CompiledRuleSet:
+    '''
+    The VyOS rules generated from the rules of a ruleset for the network of a firewall, by chain,
+    together with the firewall groups they reference.
+    '''
+    rules: Dict[Tuple[str, int], List[Tuple[str, int, Dict[str, Any]]]]
+    groups: Dict[str, Dict[str, List[str]]]
+
+def compileRuleSet(rules: List[firewall_models.Rule], v4_network: Optional[ipaddress.IPv4Network], v6_network: Optional[ipaddress.IPv6Network], cache: FirewallObjectCache, mode: str) -> CompiledRuleSet:
+    '''
+    Generates the VyOS rules of a ruleset for the network of a firewall.
+
+    params:
+        rules: The live rules of the ruleset ordered by priority.
+        v4_network: The IPv4 network of the firewall.
+        v6_network: The IPv6 network of the firewall.
+        cache: The cache holding the objects referenced by the rules.
+        mode: How basic rules are compiled, see `FIREWALL_MODE`.
+    '''
+    groups = FirewallGroups() if mode == FIREWALL_MODE_GROUPS else None
+    context = FirewallGenerationContext({}, v4_network, v6_network, cache, groups)
+    for rule in rules:
+        if rule.disable:
+            continue
+        generator = RULE_GENERATORS.get(type(rule))
+        if generator is None:
+            logger.warning('Rule %s of unknown type. Ignoring rule.', rule.id)
+            continue
+        context.current_rule = rule
+        generator(rule, context)
+    return CompiledRuleSet(context.generated, {} if groups is None else groups.groups)
+
+def getCompiledRuleSetKey(ruleset_id: int, v4_network: Optional[ipaddress.IPv4Network], v6_network: Optional[ipaddress.IPv6Network], mode: str, version: str) -> str:
+    return 'vycinity.firewall.compiled.%s.%d.%s.%s.%s' % (version, ruleset_id, v4_network, v6_network, mode)
+
+def getCompiledRuleSetVersion() -> str:
+    '''
+    Returns the current version of compiled rulesets, which is part of their cache keys. The version
+    is read from the database, so a change in one process invalidates the compiled rulesets cached
+    by all processes, regardless of the cache backend.
+    '''
+    return str(firewall_models.CompiledRuleSetVersion.objects.filter(pk=1).values_list('version', flat=True).first() or 0)
+
+def invalidateCompiledRuleSets() -> None:
+    '''
+    Invalidates all cached compiled rulesets by incrementing their version. Outdated entries expire
+    by their timeout. Inside of a transaction, the new version is visible with the commit.
+    '''
+    if firewall_models.CompiledRuleSetVersion.objects.filter(pk=1).update(version=F('version') + 1) == 0:
+        firewall_models.CompiledRuleSetVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+def invalidateAfterChangeset(changes: List[Any]) -> None:
+    '''
+    Hook for applied changesets. The version is updated in the transaction applying the changeset.
+    '''
+    invalidateCompiledRuleSets()
+
+COMPILED_RULESET_SOURCES = (firewall_models.Rule, firewall_models.RuleSet, firewall_models.AddressObject, firewall_models.ServiceObject, network_models.Network)
+'''
+Models compiled rulesets depend on. Live objects changed outside of a changeset invalidate the
+cache, objects prepared in a changeset don't.
+'''
+
+def invalidateAfterObjectChange(sender, instance, **kwargs) -> None:
+    if kwargs.get('action', 'post_').startswith('post_') and getattr(instance, 'state', None) == OWNED_OBJECT_STATE_LIVE:
+        invalidateCompiledRuleSets()
+
+def connectSignals() -> None:
+    for model in django_apps.get_app_config('vycinity').get_models():
+        if issubclass(model, COMPILED_RULESET_SOURCES):
+            post_save.connect(invalidateAfterObjectChange, sender=model, dispatch_uid='vycinity_compiled_ruleset_save_{}'.format(model.__name__))
+            post_delete.connect(invalidateAfterObjectChange, sender=model, dispatch_uid='vycinity_compiled_ruleset_delete_{}'.format(model.__name__))
+    for list_model in [ListAddressObject, ListServiceObject]:
+        m2m_changed.connect(invalidateAfterObjectChange, sender=list_model.elements.through, dispatch_uid='vycinity_compiled_ruleset_{}'.format(list_model.__name__))
+
+def generateFirewallConfig(router: basic_models.Router, mode: Optional[str] = None, shadowed_rules: Optional[List[ShadowedRule]] = None, persist_rule_numbers: bool = False) -> Tuple[configurator.Vyos13RouterConfig, Dict[int, str], Dict[int, str]]:
+    '''
+    Generates the firewalls of all networks managed by a router. Rulesets are compiled by
+    `compileRuleSet` once per network and cached, see `COMPILED_RULESET_CACHE_TTL`. Rule numbers are
+    allocated by `assignRuleNumbers`, so a changed rule doesn't renumber the rest of its chain.
+
+    params:
+        router: The router to generate the firewalls for.
+        mode: How basic rules are compiled, see `FIREWALL_MODE`. Defaults to the setting.
+        shadowed_rules: An optional list, the removed shadowed rules are appended to.
+        persist_rule_numbers: Whether the allocated rule numbers are stored, only for configurations
+                              which are deployed.
+
+    returns: The firewall configuration and the firewall names by network id and IP version, into
+             and from the network.
+    '''
+    if mode is None:
+        mode = getattr(settings, 'VYCINITY_FIREWALL_MODE', FIREWALL_MODE)
+    groups = FirewallGroups() if mode == FIREWALL_MODE_GROUPS else None
+    remove_shadowed_rules = getattr(settings, 'VYCINITY_FIREWALL_REMOVE_SHADOWED_RULES', FIREWALL_REMOVE_SHADOWED_RULES)
+    network_ids = network_models.ManagedInterface.objects.non_polymorphic().filter(router=router).values_list('network_id', flat=True)
     networks_to_firewall_into = {}
     networks_to_firewall_from = {}
     fw_cfg = configurator.Vyos13RouterConfig(['firewall'], {})
-    for firewall in firewall_models.Firewall.objects.filter(related_network__in=networks, state=OWNED_OBJECT_STATE_LIVE):
+    firewalls = list(firewall_models.Firewall.objects.non_polymorphic().filter(related_network__in=network_ids, state=OWNED_OBJECT_STATE_LIVE).select_related('related_network'))
+
+    rulesets_by_firewall: Dict[int, List[firewall_models.RuleSet]] = {firewall.pk: [] for firewall in firewalls}
+    firewall_relation = firewall_models.RuleSet.firewalls.through.objects.filter(firewall_id__in=rulesets_by_firewall.keys(), ruleset__state=OWNED_OBJECT_STATE_LIVE)
+    rulesets = firewall_models.RuleSet.objects.non_polymorphic().in_bulk(set(firewall_relation.values_list('ruleset_id', flat=True)))
+    for (firewall_id, ruleset_id) in firewall_relation.values_list('firewall_id', 'ruleset_id'):
+        rulesets_by_firewall[firewall_id].append(rulesets[ruleset_id])
+
+    prepared = []
+    for firewall in firewalls:
         suffix = '%s_%s' % (firewall.id, DESCR_INVALID_RE.sub('_', firewall.name))
         current_firewall_into_name = 'autogen_into_'+suffix
         current_firewall_from_name = 'autogen_from_'+suffix
         if len(current_firewall_into_name) > 28:
             current_firewall_into_name = current_firewall_into_name[:27]
             current_firewall_from_name = current_firewall_from_name[:27]
+
+        v4_network_address = None
+        v6_network_address = None
+        if not firewall.related_network.ipv4_network_address is None and not firewall.related_network.ipv4_network_bits is None:
+            v4_network_address = ipaddress.IPv4Network((firewall.related_network.ipv4_network_address, firewall.related_network.ipv4_network_bits), strict=False)
+        if not firewall.related_network.ipv6_network_address is None and not firewall.related_network.ipv6_network_bits is None:
+            v6_network_address = ipaddress.IPv6Network((firewall.related_network.ipv6_network_address, firewall.related_network.ipv6_network_bits), strict=False)
+        if v4_network_address is None and v6_network_address is None:
+            logger.warning('Network of firewall %s has neither IPv4 nor IPv6 address. Ignoring firewall.', firewall.id)
+            continue
+        prepared.append((firewall, current_firewall_into_name, current_firewall_from_name, v4_network_address, v6_network_address))
+
+    # rulesets are compiled once per network, unless a compiled version is cached
+    compiled_ttl = getattr(settings, 'VYCINITY_COMPILED_RULESET_CACHE_TTL', COMPILED_RULESET_CACHE_TTL)
+    version = getCompiledRuleSetVersion() if compiled_ttl > 0 else ''
+    compiled_keys = {(ruleset.pk, v4_network_address, v6_network_address): getCompiledRuleSetKey(ruleset.pk, v4_network_address, v6_network_address, mode, version) for (firewall, _, _, v4_network_address, v6_network_address) in prepared for ruleset in rulesets_by_firewall[firewall.pk]}
+    compiled_by_key: Dict[str, CompiledRuleSet] = django_cache.get_many(list(compiled_keys.values())) if compiled_ttl > 0 else {}
+    missing = {compile_key: cache_key for (compile_key, cache_key) in compiled_keys.items() if not cache_key in compiled_by_key}
+    if len(missing) > 0:
+        rules_by_ruleset = loadLiveRules(list({ruleset_id for (ruleset_id, _, _) in missing}))
+        cache = FirewallObjectCache()
+        basic_rules = [rule for rules in rules_by_ruleset.values() for rule in rules if isinstance(rule, BasicRule)]
+        cache.load(firewall_models.AddressObject, [pk for rule in basic_rules for pk in [rule.source_address_id, rule.destination_address_id]])
+        cache.load(firewall_models.ServiceObject, [rule.destination_service_id for rule in basic_rules])
+        compiled = {cache_key: compileRuleSet(rules_by_ruleset[ruleset_id], v4_network_address, v6_network_address, cache, mode) for ((ruleset_id, v4_network_address, v6_network_address), cache_key) in missing.items()}
+        if compiled_ttl > 0:
+            django_cache.set_many(compiled, compiled_ttl)
+        compiled_by_key.update(compiled)
+
+    generated: List[Tuple[firewall_models.Firewall, str, str, FirewallGenerationContext]] = []
+    for (firewall, current_firewall_into_name, current_firewall_from_name, v4_network_address, v6_network_address) in prepared:
         current_fw_raw_cfg = {
             DIRECTION_INTO: {
                 4: { 'default-action': firewall.default_action_into, 'rule': {}}, 
@@ -156,103 +955,155 @@ def generateFirewallConfig(router: basic_models.Router) -> Tuple[configurator.Vy
             current_fw_raw_cfg[DIRECTION_INTO][6]['rule'] = copy.deepcopy(stateful_rule)
             current_fw_raw_cfg[DIRECTION_FROM][4]['rule'] = copy.deepcopy(stateful_rule)
             current_fw_raw_cfg[DIRECTION_FROM][6]['rule'] = copy.deepcopy(stateful_rule)
-        
-        rule_counter = {
-            DIRECTION_INTO: { 4:0, 6:0 },
-            DIRECTION_FROM: { 4:0, 6:0 }
-        }
 
-        v4_network_address = None
-        v6_network_address = None
-        if not firewall.related_network.ipv4_network_address is None and not firewall.related_network.ipv4_network_bits is None:
-            v4_network_address = ipaddress.IPv4Network((firewall.related_network.ipv4_network_address, firewall.related_network.ipv4_network_bits), strict=False)
-        if not firewall.related_network.ipv6_network_address is None and not firewall.related_network.ipv6_network_bits is None:
-            v6_network_address = ipaddress.IPv6Network((firewall.related_network.ipv6_network_address, firewall.related_network.ipv6_network_bits), strict=False)
-        if v4_network_address is None and v6_network_address is None:
-            logger.warning('Network of firewall %s has neither IPv4 nor IPv6 address. Ignoring firewall.', firewall.id)
-            continue
+        context = FirewallGenerationContext(current_fw_raw_cfg, v4_network_address, v6_network_address, None, groups)
+        for ruleset in sorted(rulesets_by_firewall[firewall.pk], key=lambda ruleset: (ruleset.priority, ruleset.pk)):
+            context.addCompiled(compiled_by_key[compiled_keys[(ruleset.pk, v4_network_address, v6_network_address)]])
+        generated.append((firewall, current_firewall_into_name, current_firewall_from_name, context))
 
-        for ruleset in firewall_models.RuleSet.objects.filter(firewalls__in=[firewall.id], state=OWNED_OBJECT_STATE_LIVE).order_by('priority'):
-            for rule in firewall_models.Rule.objects.filter(related_ruleset=ruleset, state=OWNED_OBJECT_STATE_LIVE).order_by('priority'):
-                if rule.disable:
-                    continue
-                if isinstance(rule, BasicRule):
-                    source_addresses = []
-                    if rule.source_address:
-                        source_addresses = resolveAddress(rule.source_address)
-                    destination_addresses = []
-                    if rule.destination_address:
-                        destination_addresses = resolveAddress(rule.destination_address)
-                    if source_addresses is None or destination_addresses is None:
-                        logger.warning('Source or destination address of basic rule %s could not be resolved. Ignoring rule.', rule.id)
-                        continue
-                    (v4_direction, v6_direction) = getDirection(source_addresses, destination_addresses, v4_network_address, v6_network_address)
-                    if v4_direction is None and v6_direction is None:
-                        logger.warning('basic rule %s has no clear direction. Ignoring rule.', rule.id)
-                        continue
-                    
-                    (v4_sources, v6_sources) = classifyVersionedAddressesAsString(source_addresses)
-                    (v4_destinations, v6_destinations) = classifyVersionedAddressesAsString(destination_addresses)
-                    if rule.destination_service:
-                        resolvedService = resolveService(rule.destination_service)
-                        if resolvedService is None:
-                            logger.warning('Service %s in basic rule %s could not be resolved. Ignoring rule.', rule.destination_service.id, rule.id)
-                            continue
-                        (ports, proto) = resolvedService
-                    else:
-                        ports = None
-                        proto = None
-                    if not v4_direction is None:
-                        gen_raw_rules = []
-                        for src in v4_sources:
-                            for dst in v4_destinations:
-                                raw_rule = {'source':{'address':src}, 'destination':{'address':dst}, 'action':rule.action}
-                                if not proto is None:
-                                    raw_rule['destination']['port'] = ','.join(ports)
-                                    raw_rule['protocol'] = proto
-                                gen_raw_rules.append(raw_rule)
-                        for raw_rule in gen_raw_rules:
-                            rule_counter[v4_direction][4] += 10
-                            current_fw_raw_cfg[v4_direction][4]['rule'][str(rule_counter[v4_direction][4])] = raw_rule
-                    if not v6_direction is None:
-                        gen_raw_rules = []
-                        for src in v6_sources:
-                            for dst in v6_destinations:
-                                raw_rule = {'source':{'address':src}, 'destination':{'address':dst}, 'action':rule.action}
-                                if not proto is None:
-                                    raw_rule['destination']['port'] = ','.join(ports)
-                                    raw_rule['protocol'] = proto
-                                gen_raw_rules.append(raw_rule)
-                        for raw_rule in gen_raw_rules:
-                            rule_counter[v6_direction][6] += 10
-                            current_fw_raw_cfg[v6_direction][6]['rule'][str(rule_counter[v6_direction][6])] = raw_rule
-                elif isinstance(rule, CustomRule):
-                    if (rule.ip_version in [firewall_models.IP_VERSION_4, firewall_models.IP_VERSION_6] and 
-                            rule.direction in [DIRECTION_INTO, DIRECTION_FROM]):
-                        rule_counter[rule.direction][rule.ip_version] += 10
-                        current_fw_raw_cfg[rule.direction][rule.ip_version]['rule'][str(rule_counter[rule.direction][rule.ip_version])] = rule.rule_definition
-                    else:
-                        logger.warning('CustomRule %s has invalid ip version or direction. Ignoring rule.', rule.id)
-                else:
-                    logger.warning('Rule %s of unknown type. Ignoring rule.', rule.id)
+    chains = {(firewall.uuid, direction, ip_version): context.getChainKeys(direction, ip_version) for (firewall, _, _, context) in generated for direction in [DIRECTION_INTO, DIRECTION_FROM] for ip_version in [4, 6]}
+    rule_numbers = assignRuleNumbers(chains, persist_rule_numbers)
+
+    for (firewall, current_firewall_into_name, current_firewall_from_name, context) in generated:
+        current_fw_raw_cfg = context.raw_config
+        for direction in [DIRECTION_INTO, DIRECTION_FROM]:
+            for ip_version in [4, 6]:
+                context.numberRules(direction, ip_version, rule_numbers[(firewall.uuid, direction, ip_version)])
+
+        if remove_shadowed_rules:
+            for direction in [DIRECTION_INTO, DIRECTION_FROM]:
+                for ip_version in [4, 6]:
+                    for (number, shadowing_number) in removeShadowedRules(current_fw_raw_cfg[direction][ip_version]['rule'], groups):
+                        shadowed_rule = ShadowedRule(firewall.id, direction, ip_version, number, context.origins.get((direction, ip_version, number)), shadowing_number, context.origins.get((direction, ip_version, shadowing_number)))
+                        logger.info('Removed shadowed rule %s (rule %s) of firewall %s, direction %s, IPv%d. Shadowed by %s (rule %s).', number, shadowed_rule.rule_id, firewall.id, direction, ip_version, shadowing_number, shadowed_rule.shadowed_by_rule_id)
+                        if not shadowed_rules is None:
+                            shadowed_rules.append(shadowed_rule)
 
         networks_to_firewall_into[firewall.related_network.id] = {}
         networks_to_firewall_from[firewall.related_network.id] = {}
 
-        if v4_network_address:
+        if context.v4_network:
             fw_cfg = fw_cfg.merge(configurator.Vyos13RouterConfig(['firewall', 'name', current_firewall_into_name], current_fw_raw_cfg[DIRECTION_INTO][4]), False)
             fw_cfg = fw_cfg.merge(configurator.Vyos13RouterConfig(['firewall', 'name', current_firewall_from_name], current_fw_raw_cfg[DIRECTION_FROM][4]), False)
             networks_to_firewall_into[firewall.related_network.id][4] = current_firewall_into_name
             networks_to_firewall_from[firewall.related_network.id][4] = current_firewall_from_name
-        if v6_network_address:
+        if context.v6_network:
             fw_cfg = fw_cfg.merge(configurator.Vyos13RouterConfig(['firewall', 'ipv6-name', current_firewall_into_name], current_fw_raw_cfg[DIRECTION_INTO][6]), False)
             fw_cfg = fw_cfg.merge(configurator.Vyos13RouterConfig(['firewall', 'ipv6-name', current_firewall_from_name], current_fw_raw_cfg[DIRECTION_FROM][6]), False)
             networks_to_firewall_into[firewall.related_network.id][6] = current_firewall_into_name
             networks_to_firewall_from[firewall.related_network.id][6] = current_firewall_from_name
 
+    if not groups is None and len(groups.toConfig()) > 0:
+        fw_cfg = fw_cfg.merge(configurator.Vyos13RouterConfig(['firewall', 'group'], groups.toConfig()), False)
+
     return (fw_cfg, networks_to_firewall_into, networks_to_firewall_from)
 
-def generateConfig(router: basic_models.Router) -> configurator.Vyos13RouterConfig:
+def _mergeRawConfig(context: List[str], raw_configs: Dict[str, Any], key: str, raw_config: Dict[str, Any]) -> None:
+    if key in raw_configs:
+        raw_config = configurator.Vyos13RouterConfig(context + [key], raw_configs[key]).merge(configurator.Vyos13RouterConfig(context + [key], raw_config), False).config
+    raw_configs[key] = raw_config
+
+def generateManagedInterfaceConfig(router: basic_models.Router, networks_to_firewall_into: Dict[int, Dict[int, str]], networks_to_firewall_from: Dict[int, Dict[int, str]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    '''
+    Generates the subinterfaces and VRRP groups of the managed interfaces of a router. Interfaces
+    are loaded together with their network and VRRP settings by a single query, the prefixes of a
+    network are parsed once.
+
+    params:
+        router: The router to generate the interfaces for.
+        networks_to_firewall_into: The firewall names by network id and IP version, see
+                                   `generateFirewallConfig`.
+        networks_to_firewall_from: See `networks_to_firewall_into`.
+
+    returns: The subinterfaces by VLAN id below `managed_interface_context` + ['vif'] and the VRRP
+             groups by name below ['high-availability', 'vrrp', 'group'].
+    '''
+    vif_config: Dict[str, Any] = {}
+    vrrp_config: Dict[str, Any] = {}
+    networks: Dict[int, Tuple[Optional[ipaddress.IPv4Network], Optional[ipaddress.IPv6Network]]] = {}
+    vif_context = router.managed_interface_context + ['vif']
+    interface_name = router.managed_interface_context[-1]
+    query = network_models.ManagedInterface.objects.non_polymorphic().filter(router=router, network__state=OWNED_OBJECT_STATE_LIVE).select_related('network')
+    # the polymorphic accessor of the VRRP subtype queries per interface, so its fields are joined
+    query = query.annotate(vrrp_vrid=F('managedvrrpinterface__vrid'), vrrp_priority=F('managedvrrpinterface__priority'), vrrp_ipv4_service_address=F('managedvrrpinterface__ipv4_service_address'), vrrp_ipv6_service_address=F('managedvrrpinterface__ipv6_service_address'))
+    for managed_interface in query:
+        network = managed_interface.network
+        if not network.id in networks:
+            networks[network.id] = (
+                None if network.ipv4_network_address is None else ipaddress.IPv4Network(network.ipv4_network_address + '/' + str(network.ipv4_network_bits)),
+                None if network.ipv6_network_address is None else ipaddress.IPv6Network(network.ipv6_network_address + '/' + str(network.ipv6_network_bits)))
+        addresses = []
+        ipv4_net = None
+        if not managed_interface.ipv4_address is None:
+            ipv4_net = networks[network.id][0]
+            ipv4_addr = ipaddress.IPv4Address(managed_interface.ipv4_address)
+            if not ipv4_net is None and ipv4_addr in ipv4_net:
+                addresses.append(ipv4_addr.compressed + '/' + str(ipv4_net.prefixlen))
+            else:
+                ipv4_net = None
+        ipv6_net = None
+        if not managed_interface.ipv6_address is None:
+            ipv6_net = networks[network.id][1]
+            ipv6_addr = ipaddress.IPv6Address(managed_interface.ipv6_address)
+            if not ipv6_net is None and ipv6_addr in ipv6_net:
+                addresses.append(ipv6_addr.compressed + '/' + str(ipv6_net.prefixlen))
+            else:
+                ipv6_net = None
+
+        subif_raw_config = {}
+        if network.name is None:
+            subif_raw_config['description'] = 'autogen_id' + str(network.id)
+        else:
+            subif_raw_config['description'] = 'autogen_id' + str(network.id) + '_' + DESCR_INVALID_RE.sub('_', network.name)
+
+        if not managed_interface.vrrp_vrid is None:
+            for (service_address, net, suffix) in [(managed_interface.vrrp_ipv4_service_address, ipv4_net, '_v4'), (managed_interface.vrrp_ipv6_service_address, ipv6_net, '_v6')]:
+                if service_address is None or net is None:
+                    continue
+                service_addr = ipaddress.ip_address(service_address)
+                if not service_addr in net:
+                    continue
+                group_config = {
+                    'interface': '%s.%d' % (interface_name, network.layer2_network_id),
+                    'vrid': '%d' % managed_interface.vrrp_vrid,
+                    'virtual-address': [service_addr.compressed + '/' + str(net.prefixlen)],
+                    'priority': '%d' % managed_interface.vrrp_priority
+                }
+                if not network.vrrp_password is None:
+                    group_config['authentication'] = {
+                        'type': 'plaintext-password',
+                        'password': network.vrrp_password
+                    }
+                _mergeRawConfig(['high-availability', 'vrrp', 'group'], vrrp_config, subif_raw_config['description'] + suffix, group_config)
+        if len(addresses) > 0:
+            subif_raw_config['address'] = addresses
+
+        if network.id in networks_to_firewall_into:
+            firewall_config: Dict[str, Dict[str, str]] = {}
+            if 4 in networks_to_firewall_into[network.id]:
+                firewall_config.setdefault('out', {})['name'] = networks_to_firewall_into[network.id][4]
+            if 4 in networks_to_firewall_from[network.id]:
+                firewall_config.setdefault('in', {})['name'] = networks_to_firewall_from[network.id][4]
+            if 6 in networks_to_firewall_into[network.id]:
+                firewall_config.setdefault('out', {})['ipv6-name'] = networks_to_firewall_into[network.id][6]
+            if 6 in networks_to_firewall_from[network.id]:
+                firewall_config.setdefault('in', {})['ipv6-name'] = networks_to_firewall_from[network.id][6]
+            if len(firewall_config) > 0:
+                subif_raw_config['firewall'] = firewall_config
+
+        _mergeRawConfig(vif_context, vif_config, str(network.layer2_network_id), subif_raw_config)
+    return (vif_config, vrrp_config)
+
+def generateConfig(router: basic_models.Router, persist_rule_numbers: bool = False) -> configurator.Vyos13RouterConfig:
+    '''
+    Generates the configuration of a router.
+
+    params:
+        router: The router to generate the configuration for.
+        persist_rule_numbers: Whether the allocated firewall rule numbers are stored, see
+                              `generateFirewallConfig`. Only set it for configurations which are
+                              stored for a deployment.
+    '''
     planned_config = configurator.Vyos13RouterConfig([], {})
     absolute_config_sections = []
     for config_section in router.vyos13router.active_static_configs.all():
@@ -263,108 +1114,22 @@ def generateConfig(router: basic_models.Router) -> configurator.Vyos13RouterConf
         else:
             absolute_config_sections.append(config_section)
 
-    (firewall_config, networks_to_firewall_into, networks_to_firewall_from) = generateFirewallConfig(router)
+    (firewall_config, networks_to_firewall_into, networks_to_firewall_from) = generateFirewallConfig(router, persist_rule_numbers=persist_rule_numbers)
     if firewall_config.config:
         planned_config = planned_config.merge(firewall_config, False)
 
     if len(router.managed_interface_context) > 0:
-        for managed_interface in network_models.ManagedInterface.objects.filter(router=router, network__state=OWNED_OBJECT_STATE_LIVE):
-            network = managed_interface.network
-            addresses = []
-            ipv4_net = None
-            if not managed_interface.ipv4_address is None:
-                ipv4_net = ipaddress.IPv4Network(network.ipv4_network_address + '/' + str(network.ipv4_network_bits))
-                ipv4_addr = ipaddress.IPv4Address(managed_interface.ipv4_address)
-                if ipv4_addr in ipv4_net:
-                    addresses.append(ipv4_addr.compressed + '/' + str(ipv4_net.prefixlen))
-                else:
-                    ipv4_net = None
-            ipv6_net = None
-            if not managed_interface.ipv6_address is None:
-                ipv6_net = ipaddress.IPv6Network(network.ipv6_network_address + '/' + str(network.ipv6_network_bits))
-                ipv6_addr = ipaddress.IPv6Address(managed_interface.ipv6_address)
-                if ipv6_addr in ipv6_net:
-                    addresses.append(ipv6_addr.compressed + '/' + str(ipv6_net.prefixlen))
-                else:
-                    ipv6_net = None
-            
-            subif_raw_config = {}
-            if network.name is None:
-                subif_raw_config['description'] = 'autogen_id' + str(network.id)
-            else:
-                subif_raw_config['description'] = 'autogen_id' + str(network.id) + '_' + DESCR_INVALID_RE.sub('_', network.name)
-
-            vrrp_config = None
-            try:
-                if managed_interface.managedvrrpinterface:
-                    vrrp_interface = managed_interface.managedvrrpinterface
-                    vrrp_config = {}
-
-                    if not vrrp_interface.ipv4_service_address is None:
-                        v4_addr = ipaddress.IPv4Address(vrrp_interface.ipv4_service_address)
-                        if not ipv4_net is None and v4_addr in ipv4_net:
-                            vrrp_config[subif_raw_config['description'] + '_v4'] = {
-                                'interface': '%s.%d' % (router.managed_interface_context[-1], network.layer2_network_id),
-                                'vrid': '%d' % vrrp_interface.vrid,
-                                'virtual-address': [v4_addr.compressed + '/' + str(network.ipv4_network_bits)],
-                                'priority': '%d' % vrrp_interface.priority
-                            }
-                            if not network.vrrp_password is None:
-                                vrrp_config[subif_raw_config['description'] + '_v4']['authentication'] = {
-                                    'type': 'plaintext-password',
-                                    'password': network.vrrp_password
-                                }
-                    if not vrrp_interface.ipv6_service_address is None:
-                        v6_addr = ipaddress.IPv6Address(vrrp_interface.ipv6_service_address)
-                        if not ipv6_net is None and v6_addr in ipv6_net:
-                            vrrp_config[subif_raw_config['description'] + '_v6'] = {
-                                'interface': '%s.%d' % (router.managed_interface_context[-1], network.layer2_network_id),
-                                'vrid': '%d' % vrrp_interface.vrid,
-                                'virtual-address': [v6_addr.compressed + '/' + str(network.ipv6_network_bits)],
-                                'priority': '%d' % vrrp_interface.priority
-                            }
-                            if not network.vrrp_password is None:
-                                vrrp_config[subif_raw_config['description'] + '_v6']['authentication'] = {
-                                    'type': 'plaintext-password',
-                                    'password': network.vrrp_password
-                                }
-            except network_models.ManagedVRRPInterface.DoesNotExist:
-                # Kein Fehler, nur kein spezielles Interface
-                pass
-            if len(addresses) > 0:
-                subif_raw_config['address'] = addresses
-
-            if not vrrp_config is None and len(vrrp_config) > 0:
-                vrrp_config = configurator.Vyos13RouterConfig(['high-availability', 'vrrp', 'group'], vrrp_config)
-                planned_config = planned_config.merge(vrrp_config, False)
-
-            if network.id in networks_to_firewall_into:
-                if 4 in networks_to_firewall_into[network.id]:
-                    subif_raw_config['firewall'] = {'out': {'name':networks_to_firewall_into[network.id][4]}}
-                if 4 in networks_to_firewall_from[network.id]:
-                    if not 'firewall' in subif_raw_config:
-                        subif_raw_config['firewall'] = {}
-                    subif_raw_config['firewall']['in'] = {'name':networks_to_firewall_from[network.id][4]}
-                if 6 in networks_to_firewall_into[network.id]:
-                    if not 'firewall' in subif_raw_config:
-                        subif_raw_config['firewall'] = {'out':{}}
-                    if not 'out' in subif_raw_config['firewall']:
-                        subif_raw_config['firewall']['out'] = {}
-                    subif_raw_config['firewall']['out']['ipv6-name'] = networks_to_firewall_into[network.id][6]
-                if 6 in networks_to_firewall_from[network.id]:
-                    if not 'firewall' in subif_raw_config:
-                        subif_raw_config['firewall'] = {'in':{}}
-                    if not 'in' in subif_raw_config['firewall']:
-                        subif_raw_config['firewall']['in'] = {}
-                    subif_raw_config['firewall']['in']['ipv6-name'] = networks_to_firewall_from[network.id][6]
-
-            subif_config = configurator.Vyos13RouterConfig(router.managed_interface_context + ['vif', str(network.layer2_network_id)], subif_raw_config)
-            planned_config = planned_config.merge(subif_config, False)
+        (vif_config, vrrp_config) = generateManagedInterfaceConfig(router, networks_to_firewall_into, networks_to_firewall_from)
+        if len(vif_config) > 0:
+            planned_config = planned_config.merge(configurator.Vyos13RouterConfig(router.managed_interface_context + ['vif'], vif_config), False)
+        if len(vrrp_config) > 0:
+            planned_config = planned_config.merge(configurator.Vyos13RouterConfig(['high-availability', 'vrrp', 'group'], vrrp_config), False)
 
     absolute_config_sections.sort()
     for config_section in absolute_config_sections:
         planned_config = planned_config.merge(
             configurator.Vyos13RouterConfig(config_section.context, config_section.content),
             True)
+    planned_config = planned_config.canonical()
     logger.debug('Configuration for id=%s will be %s', router.id, str(planned_config.config))
     return planned_config
\ No newline at end of file
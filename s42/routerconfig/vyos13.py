@@ -16,7 +16,7 @@
 import json
 import logging
 import requests
-from typing import Dict, List, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from . import Router, RouterConfig, RouterConfigDiff, RouterConfigError, RouterCommunicationError
 
 logger = logging.getLogger(__name__)
@@ -36,6 +36,51 @@ def _objectizeConf(obj: Union[list, str, dict]):
                 rtn[current_key] = _objectizeConf(current_value) 
             return rtn
 
+def canonicalizeConf(obj: Union[list, str, dict]):
+    '''
+    Returns the canonical form of a configuration tree. Configurations are stored in this form, so
+    comparing them doesn't need to normalize the same subtrees again. In the canonical form values
+    are strings, multiple values of a node are a list without duplicates and a single value is a
+    plain string like VyOS returns it. Markers of diffs (`__complete`) are removed.
+
+    Only complete configurations are canonicalized. Parts which are merged into a configuration,
+    like static config sections, keep their lists, as merging replaces plain strings instead of
+    adding their values.
+    '''
+    if isinstance(obj, dict):
+        return {str(key): canonicalizeConf(value) for (key, value) in obj.items() if key != '__complete'}
+    if isinstance(obj, (list, tuple)):
+        if any(isinstance(item, (dict, list, tuple)) for item in obj):
+            return canonicalizeConf(_objectizeConf([canonicalizeConf(item) for item in obj]))
+        values = list(dict.fromkeys(canonicalizeConf(item) for item in obj))
+        return values[0] if len(values) == 1 else values
+    if obj is None or isinstance(obj, bool):
+        return obj
+    return str(obj)
+
+def iterSetPaths(context: List[str], node: Union[list, str, dict]) -> Iterator[Tuple[List[str], Optional[str]]]:
+    '''
+    Enumerates the "set" operations creating a configuration tree in depth-first order without
+    recursion. Yields the path of every leaf together with its value, or None for nodes without
+    value.
+    '''
+    stack = [(context, node)]
+    while len(stack) > 0:
+        (path, node) = stack.pop()
+        if isinstance(node, dict):
+            children = [(path + [key], value) for (key, value) in node.items() if key != '__complete']
+            if len(children) == 0:
+                yield (path, None)
+            stack.extend(reversed(children))
+        elif isinstance(node, list):
+            for item in node:
+                yield (path, str(item))
+        else:
+            yield (path, str(node))
+
+def _leafValues(value: Union[list, str]) -> List[str]:
+    return value if isinstance(value, list) else [value]
+
 class Vyos13RouterConfigDiff(RouterConfigDiff):
     def __init__(self, context: List[str] = [], left = None, right = None):
         self.left = left
@@ -81,19 +126,11 @@ class Vyos13RouterConfigDiff(RouterConfigDiff):
                 else:
                     rtn.append({'op': 'delete', 'path': self.context + [self.left]})
         elif self.left is None:
-            if isinstance(self.right, dict):
-                sub_commands = []
-                for right_key in self.right.keys():
-                    if right_key != '__complete':
-                        sub_commands += Vyos13RouterConfigDiff(self.context + [right_key], None, self.right[right_key]).genApiCommands()
-                if len(sub_commands) == 0:
-                    sub_commands.append({'op': 'set', 'path': self.context})
-                rtn += sub_commands
-            elif isinstance(self.right, list):
-                for item in self.right:    
-                    rtn.append({'op': 'set', 'path': self.context, 'value': str(item)})
-            else:
-                rtn.append({'op': 'set', 'path': self.context, 'value': str(self.right)})
+            for (path, value) in iterSetPaths(self.context, self.right):
+                if value is None:
+                    rtn.append({'op': 'set', 'path': path})
+                else:
+                    rtn.append({'op': 'set', 'path': path, 'value': value})
         elif isinstance(self.left, dict) and isinstance(self.right, dict):
             if '__complete' in self.left and self.left['__complete']:
                 rtn.append({'op': 'delete', 'path': self.context})
@@ -185,6 +222,9 @@ class Vyos13RouterConfig(RouterConfig):
                         right_not_in_left[right_key]['__complete'] = True
             
             for key in shared_keys:
+                if left_config[key] == right_config[key]:
+                    # equal subtrees, e.g. of canonical configurations, can't differ
+                    continue
                 if isinstance(left_config[key], list) and isinstance(right_config[key], list):
                     right_things_not_in_left = right_config[key].copy()
                     for item in left_config[key]:
@@ -264,11 +304,45 @@ class Vyos13RouterConfig(RouterConfig):
         sub_context = context[len(self.context):]
         if len(sub_context) == 0:
             return self
-        else:
-            if sub_context[0] in self.config and isinstance(self.config[sub_context[0]], dict):                
-                return Vyos13RouterConfig(self.context + [sub_context[0]], self.config[sub_context[0]]).getSubConfig(context)
+        node = self.config
+        for hop in sub_context:
+            if hop in node and isinstance(node[hop], dict):
+                node = node[hop]
             else:
                 raise ValueError("Sub config not contained inside of this config")
+        return Vyos13RouterConfig(list(context), node)
+
+    def getSetPaths(self) -> List[Tuple[List[str], Optional[str]]]:
+        '''
+        Returns the paths and values of all leaves of this configuration, like the "set" commands
+        creating it, see `iterSetPaths`.
+        '''
+        return list(iterSetPaths(self.context, self.config))
+
+    @staticmethod
+    def fromSetPaths(context: List[str], paths: List[Tuple[List[str], Optional[str]]]) -> 'Vyos13RouterConfig':
+        '''
+        Creates a configuration from the paths and values of its leaves as returned by
+        `getSetPaths`. Multiple values of a path result in a list.
+        '''
+        config: Dict = {}
+        for (path, value) in paths:
+            if path[:len(context)] != context:
+                raise ValueError("Path not contained in the context of the config")
+            parent = config
+            for hop in path[len(context):-1]:
+                parent = parent.setdefault(hop, {})
+            last = path[-1] if len(path) > len(context) else None
+            if last is None:
+                if not value is None:
+                    raise ValueError("Value without path inside of the config")
+            elif value is None:
+                parent.setdefault(last, {})
+            elif last in parent:
+                parent[last] = _leafValues(parent[last]) + [value]
+            else:
+                parent[last] = value
+        return Vyos13RouterConfig(list(context), config)
 
     
     def merge(self, other, absolute: bool):
@@ -292,7 +366,12 @@ class Vyos13RouterConfig(RouterConfig):
                 for (key, value) in other.config.items():
                     if key in rtn.config:
                         rtnvalue = rtn.config[key]
-                        if type(value) == type(rtnvalue):
+                        if value == rtnvalue:
+                            continue
+                        if isinstance(value, (list, str)) and isinstance(rtnvalue, (list, str)) and (isinstance(value, list) or isinstance(rtnvalue, list)):
+                            # single values of canonical configurations are plain strings
+                            rtn.config[key] = _leafValues(rtnvalue) + [valueitem for valueitem in _leafValues(value) if not valueitem in _leafValues(rtnvalue)]
+                        elif type(value) == type(rtnvalue):
                             if isinstance(value, dict):
                                 merged_config = Vyos13RouterConfig(rtn.context + [key], rtnvalue).merge(Vyos13RouterConfig(rtn.context + [key], value), False)
                                 rtn.config[key] = merged_config.config
@@ -308,15 +387,24 @@ class Vyos13RouterConfig(RouterConfig):
                     else:
                         rtn.config[key] = value
         else:
-            next_context_hop = other.context[len(rtn.context)]
-            rtn_sub_config = Vyos13RouterConfig(rtn.context + [next_context_hop], {})
-            if next_context_hop in rtn.config:
-                rtn_sub_config.config = rtn.config[next_context_hop]
-            merged_config = rtn_sub_config.merge(other, absolute)
-            rtn.config[next_context_hop] = merged_config.config
+            # walk down to the context of the other config, copying the nodes on the way
+            hops = other.context[len(rtn.context):]
+            parent = rtn.config
+            for hop in hops[:-1]:
+                child = parent[hop].copy() if hop in parent else {}
+                parent[hop] = child
+                parent = child
+            target_config = Vyos13RouterConfig(other.context.copy(), parent[hops[-1]] if hops[-1] in parent else {})
+            parent[hops[-1]] = target_config.merge(other, absolute).config
                 
         return rtn
 
+    def canonical(self) -> 'Vyos13RouterConfig':
+        '''
+        Returns this configuration in the canonical form, see `canonicalizeConf`.
+        '''
+        return Vyos13RouterConfig(self.context.copy(), canonicalizeConf(self.config))
+
     def __str__(self):
         return 'Vyos13RouterConfig(context='+ str(self.context) +', config='+ str(self.config) +')'
 
@@ -359,7 +447,7 @@ class Vyos13Router(Router):
             if not 'data' in r:
                 raise Exception('Configuration is missing when retrieving it from router')
             
-            return Vyos13RouterConfig([], r['data'])
+            return Vyos13RouterConfig([], canonicalizeConf(r['data']))
         except Exception as e:
             raise RouterCommunicationError("Communication failed while retrieving configuration") from e
     
@@ -16,6 +16,26 @@
 from rest_framework import serializers
 from vycinity.models import basic_models
 
+class SelectableFieldsMixin:
+    '''
+    Restricts the fields of a serializer by its context. If the context contains `fields`, only
+    these fields are returned. If the context contains `expand`, fields listed in
+    `Meta.expandable_fields` are only returned when they are part of `expand`. Without `expand` in
+    the context (like on detail views), all fields are returned.
+    '''
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected_fields = self.context.get('fields')
+        if selected_fields is not None:
+            fields = {name: field for (name, field) in fields.items() if name in selected_fields}
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name in getattr(self.Meta, 'expandable_fields', []):
+                if name not in expand:
+                    fields.pop(name, None)
+        return fields
+
 class Vyos13RouterSerializer(serializers.ModelSerializer):
     class Meta:
         model = basic_models.Vyos13Router
@@ -28,24 +48,42 @@ class Vyos13StaticConfigSectionSerializer(serializers.ModelSerializer):
         fields = ['id', 'context', 'description', 'absolute', 'content']
         read_only_fields = ['id']
 
-class Vyos13LiveRouterConfigSerializer(serializers.ModelSerializer):
+class Vyos13LiveRouterConfigSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = basic_models.Vyos13LiveRouterConfig
-        fields = ['id', 'retrieved', 'config']
+        fields = ['id', 'created', 'retrieved', 'config_hash', 'config_size', 'config']
         read_only_fields = fields
+        expandable_fields = ['config']
 
 class Vyos13RouterConfigDiffSerializer(serializers.Serializer):
     left = serializers.DictField(allow_empty=True)
     right = serializers.DictField(allow_empty=True)
 
-class Vyos13RouterConfigSerializer(serializers.ModelSerializer):
+class Vyos13RouterConfigSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = basic_models.Vyos13RouterConfig
+        fields = ['id', 'created', 'router', 'config_hash', 'config_size', 'config']
+        read_only_fields = fields
+        expandable_fields = ['config']
+
+class Vyos13RouterConfigSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = basic_models.Vyos13RouterConfig
-        fields = ['id', 'created', 'router', 'config']
+        fields = ['id', 'created', 'router', 'config_hash', 'config_size']
         read_only_fields = fields
 
-class DeploymentSerializer(serializers.ModelSerializer):
+class DeploymentSerializer(SelectableFieldsMixin, serializers.ModelSerializer):
+    '''
+    Returns the ids of the configurations by default. If `configs` is expanded, a summary of each
+    configuration without the configuration itself is returned instead.
+    '''
     class Meta:
         model = basic_models.Deployment
         fields = ['id', 'triggered', 'last_update', 'configs', 'change', 'state', 'errors']
-        read_only_fields = fields
\ No newline at end of file
+        read_only_fields = fields
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'configs' in fields and 'configs' in self.context.get('expand', []):
+            fields['configs'] = Vyos13RouterConfigSummarySerializer(many=True, read_only=True)
+        return fields
\ No newline at end of file
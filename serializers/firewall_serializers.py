@@ -13,10 +13,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+from functools import lru_cache
 from rest_framework import serializers, relations
 from rest_framework.request import Request
+from typing import Dict, Tuple, Type
 from uuid import UUID
-from vycinity.models import OWNED_OBJECT_STATE_LIVE, OwnedObject, customer_models, firewall_models, network_models, change_models
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, AbstractOwnedObject, OwnedObject, customer_models, firewall_models, network_models, change_models
 from vycinity.serializers.generics import AbstractOwnedObjectSerializer, BaseOwnedObjectSerializer
 
 class ManyWithoutNoneRelatedField(serializers.ManyRelatedField):
@@ -58,7 +60,11 @@ class OwnedObjectRelatedField(serializers.RelatedField):
         if not isinstance(request.user, customer_models.User):
             raise AssertionError('Related field requires an internal user for verifiying the visibility.')
 
-        if value.public or value.owner in request.user.customer.get_visible_customers():
+        # Serializing many objects may pass the visible customers once instead of per reference.
+        visible_customers = self.parent.context.get('visible_customers')
+        if visible_customers is None:
+            visible_customers = request.user.customer.get_visible_customers()
+        if value.public or value.owner in visible_customers:
             return str(value.uuid)
         else:
             return None
@@ -74,8 +80,14 @@ class OwnedObjectRelatedField(serializers.RelatedField):
         try:
             uuid = UUID(data)
             result = None
-            visible_customers = request.user.customer.get_visible_customers()
-            if 'changeset' in request.query_params:
+            resolved_objects = self.parent.context.get('resolved_objects')
+            if resolved_objects is not None:
+                # Bulk operations resolve all references in advance, including not yet saved objects.
+                result = resolved_objects.get(uuid)
+                if result is not None and not isinstance(result, self.model):
+                    result = None
+            elif 'changeset' in request.query_params:
+                visible_customers = request.user.customer.get_visible_customers()
                 changeset_uuid = UUID(request.query_params['changeset'])
                 try:
                     changeset = change_models.ChangeSet.objects.get(pk=changeset_uuid)
@@ -83,6 +95,7 @@ class OwnedObjectRelatedField(serializers.RelatedField):
                 except change_models.ChangeSet.DoesNotExist:
                     pass
             else:
+                visible_customers = request.user.customer.get_visible_customers()
                 result = self.model.filter_query_by_customers_or_public(self.get_queryset().filter(uuid=uuid, state=OWNED_OBJECT_STATE_LIVE), visible_customers).order_by('-pk').first()
             if result is None:
                 raise serializers.ValidationError(['Referenced object not found.'])
@@ -90,6 +103,23 @@ class OwnedObjectRelatedField(serializers.RelatedField):
         except ValueError as e:
             raise serializers.ValidationError(['Reference UUID is not valid.'])
 
+@lru_cache(maxsize=None)
+def get_reference_fields(serializer_class: Type[serializers.Serializer]) -> Dict[str, Tuple[Type[AbstractOwnedObject], bool]]:
+    '''
+    Returns the fields of a serializer referencing other owned objects.
+
+    returns: The referenced model and whether the field is a list, by field name.
+    '''
+    rtn = {}
+    for (name, serializer_field) in serializer_class().fields.items():
+        if serializer_field.read_only:
+            continue
+        if isinstance(serializer_field, serializers.ManyRelatedField) and isinstance(serializer_field.child_relation, OwnedObjectRelatedField):
+            rtn[name] = (serializer_field.child_relation.model, True)
+        elif isinstance(serializer_field, OwnedObjectRelatedField):
+            rtn[name] = (serializer_field.model, False)
+    return rtn
+
 class FirewallSerializer(BaseOwnedObjectSerializer):
     class Meta:
         model = firewall_models.Firewall
@@ -157,7 +187,7 @@ class BasicRuleSerializer(RuleSerializer):
 class CustomRuleSerializer(RuleSerializer):
     class Meta:
         model = firewall_models.CustomRule
-        fields = RuleSerializer.Meta.fields + ['ip_version', 'rule']
+        fields = RuleSerializer.Meta.fields + ['ip_version', 'direction', 'rule_definition']
         read_only_fields = RuleSerializer.Meta.read_only_fields
 
 class NetworkAddressObjectSerializer(AddressObjectSerializer):
@@ -13,7 +13,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
-from typing import Type
+from typing import Any, Dict, Type
 from rest_framework import serializers
 from rest_framework.relations import ManyRelatedField
 from rest_framework.request import Request
@@ -53,6 +53,29 @@ class AbstractOwnedObjectSerializer(serializers.ModelSerializer):
                 return None
         return None
 
+    def assign_validated_data(self, instance: AbstractOwnedObject, validated_data) -> Dict[str, Any]:
+        '''
+        Sets the validated values as attributes of an instance, except of many-to-many relations,
+        which can be set only after saving the instance.
+
+        params:
+            instance: The instance to modify.
+            validated_data: The validated data of this serializer.
+        returns: The values of the many-to-many relations by field name.
+        '''
+        later_put_fields = {}
+        all_fields = self.fields
+        for key, validated_value in validated_data.items():
+            if key not in all_fields.keys():
+                raise AssertionError(f'Field {key} is not defined.')
+            if all_fields[key].read_only:
+                continue
+            if isinstance(self.fields[key], ManyRelatedField):
+                later_put_fields[key] = validated_value
+                continue
+            setattr(instance, key, validated_value)
+        return later_put_fields
+
     def update(self, instance, validated_data):
         if not isinstance(instance, AbstractOwnedObject):
             raise AssertionError('Instance is no OwnedObject. This is a programming issue.')
@@ -99,17 +122,7 @@ class AbstractOwnedObjectSerializer(serializers.ModelSerializer):
             raise AssertionError('Update called on object with state neither live or prepared', instance)
 
         modified_instance.state = OWNED_OBJECT_STATE_PREPARED
-        later_put_fields = {}
-        all_fields = self.fields
-        for key, validated_value in validated_data.items():
-            if key not in all_fields.keys():
-                raise AssertionError(f'Field {key} is not defined.')
-            if all_fields[key].read_only:
-                continue
-            if isinstance(self.fields[key], ManyRelatedField):
-                later_put_fields[key] = validated_value
-                continue
-            setattr(modified_instance, key, validated_value)
+        later_put_fields = self.assign_validated_data(modified_instance, validated_data)
         modified_instance.save()
         for key, validated_value in later_put_fields.items():
             manager = getattr(modified_instance, key)
@@ -142,17 +155,7 @@ class AbstractOwnedObjectSerializer(serializers.ModelSerializer):
 
         instance = model()
         instance.state = OWNED_OBJECT_STATE_PREPARED
-        later_put_fields = {}
-        all_fields = self.fields
-        for key, validated_value in validated_data.items():
-            if key not in all_fields.keys():
-                raise AssertionError(f'Field {key} is not defined.')
-            if all_fields[key].read_only:
-                continue
-            if isinstance(self.fields[key], ManyRelatedField):
-                later_put_fields[key] = validated_value
-                continue
-            setattr(instance, key, validated_value)
+        later_put_fields = self.assign_validated_data(instance, validated_data)
         instance.save()
         for key, validated_value in later_put_fields.items():
             manager = getattr(instance, key)
@@ -25,6 +25,7 @@ import traceback
 from time import sleep
 from uuid import UUID
 from celery import shared_task
+from django.conf import settings
 
 from vycinity.models import basic_models
 from .s42.routerconfig import vyos13 as configurator
@@ -34,8 +35,25 @@ logger = logging.getLogger(__name__)
 GRACE_PERIOD = 60
 '''
 Grace period for deploying a router. If a router is still alive after this time, consider as sane.
+Can be overridden by the setting `VYCINITY_DEPLOYMENT_GRACE_PERIOD`.
 '''
 
+VYOS13_ENDPOINT = 'https://{address}:443'
+'''
+Endpoint of the HTTP API of VyOS 1.3 routers, `{address}` is replaced by the loopback address of
+the router. Can be overridden by the setting `VYCINITY_VYOS13_ENDPOINT`, e.g. for deploying to the
+simulator in `vycinity.benchmarks.vyos13_simulator`.
+'''
+
+def get_vyos13_endpoint(address: str) -> str:
+    '''
+    Returns the API endpoint of a VyOS 1.3 router.
+
+    Parameters:
+        address {str} -- The loopback address of the router.
+    '''
+    return getattr(settings, 'VYCINITY_VYOS13_ENDPOINT', VYOS13_ENDPOINT).format(address=address)
+
 def check_router_alive(ip_address: str) -> bool:
     '''
     Checks whether the ip is alive. Returns boolean result.
@@ -85,7 +103,7 @@ def deploy(deployment_id: int):
             try:
                 if router.vyos13router:
                     configured_router = configurator.Vyos13Router(
-                        'https://%s:443' % router.vyos13router.loopback,
+                        get_vyos13_endpoint(router.vyos13router.loopback),
                         router.vyos13router.token,
                         False)
                     configured_routers[rid] = configured_router
@@ -113,7 +131,7 @@ def deploy(deployment_id: int):
             changed_routers.append(rid)
             logging.info('Deploying router "%s" (id=%d)', database_routers[rid].name, rid)
             configured_routers[rid].putConfig(config)
-            sleep(GRACE_PERIOD)
+            sleep(getattr(settings, 'VYCINITY_DEPLOYMENT_GRACE_PERIOD', GRACE_PERIOD))
             if not check_router_alive(database_routers[rid].loopback):
                 raise configurator.RouterCommunicationError('Ping after deployment failed')
     except (configurator.RouterCommunicationError, configurator.RouterConfigError):
@@ -140,13 +158,13 @@ def retrieve_vyos13_live_router_config(lrc: UUID):
     try:
         live_router_config = basic_models.Vyos13LiveRouterConfig.objects.get(pk=lrc)
         router = live_router_config.router
-    except (basic_models.Vyos13LiveRouterConfig.DoesNotExist|basic_models.Vyos13Router.DoesNotExist|basic_models.Router.DoesNotExist) as e:
+    except (basic_models.Vyos13LiveRouterConfig.DoesNotExist, basic_models.Vyos13Router.DoesNotExist, basic_models.Router.DoesNotExist) as e:
         logger.error('Router config cannot be retrieved because a resource was not found in the database', exc_info=e)
         return
     
     try:
         configured_router = configurator.Vyos13Router(
-            'https://%s:443' % router.loopback,
+            get_vyos13_endpoint(router.loopback),
             router.token,
             False)
         currentRouterConfig = configured_router.getConfig()
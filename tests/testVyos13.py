@@ -15,7 +15,7 @@
 
 import json
 import unittest
-from vycinity.s42.routerconfig.vyos13 import Vyos13RouterConfig, Vyos13RouterConfigDiff
+from vycinity.s42.routerconfig.vyos13 import Vyos13RouterConfig, Vyos13RouterConfigDiff, canonicalizeConf
 
 class TestVyos13RouterConfig(unittest.TestCase):
     def test_subConfig(self):
@@ -144,6 +144,43 @@ class TestVyos13RouterConfig(unittest.TestCase):
         self.assertEqual(config1.context, merged_config.context)
         self.assertEqual({'ntp':{'servers': {'ptbtime1.ptb.de': {}, 'time1.google.com': {}, '0.de.pool.ntp.org': {'disable':{}}}, "source-interface": "eth0"}, 'name-servers': ['9.9.9.9', '9.9.9.10']}, merged_config.config, f"got unexpected {json.dumps(merged_config.config)}")
 
+    def test_canonicalize(self):
+        self.assertEqual({'interfaces': {'ethernet': {'eth0': {'address': '10.0.0.1/24', 'mtu': '1500'}}}, 'system': {'name-server': ['9.9.9.9', '9.9.9.10']}},
+            canonicalizeConf({'interfaces': {'ethernet': {'eth0': {'address': ['10.0.0.1/24'], 'mtu': 1500}}}, 'system': {'name-server': ['9.9.9.9', '9.9.9.10', '9.9.9.9'], '__complete': True}}))
+        self.assertEqual({'servers': {'ptbtime1.ptb.de': {}, 'time1.google.com': {'prefer': {}}}}, canonicalizeConf({'servers': ['ptbtime1.ptb.de', {'time1.google.com': {'prefer': {}}}]}))
+
+    def test_diff_canonical(self):
+        config1 = Vyos13RouterConfig([], {'interfaces': {'ethernet': {'eth0': {'address': ['10.0.0.1/24']}}}})
+        config2 = Vyos13RouterConfig([], {'interfaces': {'ethernet': {'eth0': {'address': '10.0.0.1/24'}}}})
+        self.assertTrue(config1.canonical().diff(config2.canonical()).isEmpty())
+        self.assertEqual({'interfaces': {'ethernet': {'eth0': {'address': ['10.0.0.1/24']}}}}, config1.config)
+
+    def test_merge_canonical(self):
+        config1 = Vyos13RouterConfig(['system'], {'name-server': '9.9.9.9'})
+        config2 = Vyos13RouterConfig(['system'], {'name-server': ['9.9.9.10', '9.9.9.9']})
+        self.assertEqual({'name-server': ['9.9.9.9', '9.9.9.10']}, config1.merge(config2, False).config)
+        self.assertEqual({'name-server': ['9.9.9.10', '9.9.9.9']}, config2.merge(config1, False).config)
+
+    def test_merge_deep_context(self):
+        config1 = Vyos13RouterConfig([], {'interfaces': {'ethernet': {'eth0': {'mtu': '1500'}}}, 'system': {'host-name': 'r1'}})
+        config2 = Vyos13RouterConfig(['interfaces', 'ethernet', 'eth0', 'vif', '38'], {'address': '10.0.0.1/24'})
+        merged_config = config1.merge(config2, False)
+        self.assertEqual({'interfaces': {'ethernet': {'eth0': {'mtu': '1500', 'vif': {'38': {'address': '10.0.0.1/24'}}}}}, 'system': {'host-name': 'r1'}}, merged_config.config)
+        self.assertEqual({'interfaces': {'ethernet': {'eth0': {'mtu': '1500'}}}, 'system': {'host-name': 'r1'}}, config1.config)
+
+    def test_setPaths(self):
+        config = Vyos13RouterConfig(['system'], {'ntp': {'server': {'time1.example.com': {}}}, 'name-server': ['9.9.9.9', '9.9.9.10'], 'host-name': 'r1'})
+        paths = config.getSetPaths()
+        self.assertListEqual([
+            (['system', 'ntp', 'server', 'time1.example.com'], None),
+            (['system', 'name-server'], '9.9.9.9'),
+            (['system', 'name-server'], '9.9.9.10'),
+            (['system', 'host-name'], 'r1'),
+        ], paths)
+        self.assertEqual(config.config, Vyos13RouterConfig.fromSetPaths(['system'], paths).config)
+        with self.assertRaises(ValueError):
+            Vyos13RouterConfig.fromSetPaths(['firewall'], paths)
+
 class TestVyos13RouterConfigDiff(unittest.TestCase):
     def test_getApiCommands1(self):
         config1 = Vyos13RouterConfig([], {'firewall':{'name':{'bla':{'default-action': 'accept'}}}, 'system':{'ntp':{'servers': ['ptbtime1.ptb.de', 'time1.google.com']}}})
@@ -0,0 +1,103 @@
+# This file is part of VyCinity.
+# 
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+# 
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+# 
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+from base64 import b64encode
+import datetime
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.test import APIRequestFactory
+from vycinity import authentication
+from vycinity.models import customer_models
+
+class LocalUserAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer: customer_models.Customer = customer_models.Customer.objects.create(name = 'auth customer')
+        cls.user: customer_models.User = customer_models.User.objects.create(name = 'authuser', customer = cls.customer)
+        cls.localauth: customer_models.LocalUserAuth = customer_models.LocalUserAuth.objects.create(user = cls.user, auth = make_password('secret'))
+
+    def setUp(self):
+        cache.clear()
+
+    def get_customers(self, password):
+        authorization = 'Basic ' + b64encode('authuser:{}'.format(password).encode('utf-8')).decode('ascii')
+        return Client().get('/api/v1/customers', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=authorization)
+
+    def test_cached_verification(self):
+        with mock.patch.object(authentication, 'check_password', wraps=authentication.check_password) as check_password:
+            self.assertEqual(200, self.get_customers('secret').status_code)
+            self.assertEqual(200, self.get_customers('secret').status_code)
+            self.assertEqual(1, check_password.call_count)
+            self.assertEqual(401, self.get_customers('wrong').status_code)
+            self.assertEqual(401, self.get_customers('wrong').status_code)
+            self.assertEqual(3, check_password.call_count)
+
+    def test_password_change_invalidates(self):
+        self.assertEqual(200, self.get_customers('secret').status_code)
+        self.localauth.auth = make_password('changed')
+        self.localauth.save()
+        self.assertEqual(401, self.get_customers('secret').status_code)
+        self.assertEqual(200, self.get_customers('changed').status_code)
+
+    @override_settings(VYCINITY_CREDENTIAL_CACHE_TTL=0)
+    def test_disabled_cache(self):
+        with mock.patch.object(authentication, 'check_password', wraps=authentication.check_password) as check_password:
+            self.assertEqual(200, self.get_customers('secret').status_code)
+            self.assertEqual(200, self.get_customers('secret').status_code)
+            self.assertEqual(2, check_password.call_count)
+
+
+class APITokenAuthenticationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer: customer_models.Customer = customer_models.Customer.objects.create(name = 'token customer')
+        cls.user: customer_models.User = customer_models.User.objects.create(name = 'tokenuser', customer = cls.customer)
+
+    def authenticate(self, method, token):
+        request = getattr(APIRequestFactory(), method)('/api/v1/customers', HTTP_AUTHORIZATION='Bearer ' + token)
+        return authentication.APITokenAuthentication().authenticate(request)
+
+    def test_create_api_token(self):
+        out = StringIO()
+        call_command('create_api_token', '--user', 'tokenuser', '--name', 'ci', '--scope', 'write', '--expires-in', '7', stdout=out)
+        token = out.getvalue().splitlines()[-1].split(' ')[-1]
+        api_token = customer_models.APIToken.objects.get(user=self.user)
+        self.assertEqual([customer_models.API_TOKEN_SCOPE_WRITE], api_token.scopes)
+        self.assertNotIn(api_token.digest, token)
+        with self.assertNumQueries(1):
+            (user, auth) = self.authenticate('post', token)
+            self.assertEqual(self.user.customer, user.customer)
+        self.assertEqual(api_token, auth)
+
+    def test_verification(self):
+        (_, token) = customer_models.APIToken.mint(self.user, 'reader', [customer_models.API_TOKEN_SCOPE_READ])
+        self.assertEqual(self.user, self.authenticate('get', token)[0])
+        with self.assertRaises(exceptions.PermissionDenied):
+            self.authenticate('put', token)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('get', token[:-1])
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('get', 'malformed')
+        self.assertIsNone(authentication.APITokenAuthentication().authenticate(APIRequestFactory().get('/api/v1/customers', HTTP_AUTHORIZATION='Basic abc')))
+
+        (_, expired_token) = customer_models.APIToken.mint(self.user, 'expired', [customer_models.API_TOKEN_SCOPE_READ], timezone.now() - datetime.timedelta(seconds=1))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate('get', expired_token)
@@ -0,0 +1,57 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+from django.test import TestCase
+from unittest import skipUnless
+from vycinity.benchmarks import find_query_regressions, read_measurements, write_measurements
+from vycinity.benchmarks.configuration import benchmark_config_operations
+from vycinity.benchmarks.generators import FleetParameters, create_tenant, generate_fleet
+
+BENCHMARK_ENABLED = 'VYCINITY_BENCHMARK' in os.environ
+BENCHMARK_OUTPUT = os.environ.get('VYCINITY_BENCHMARK_CONFIG_OUTPUT')
+BENCHMARK_BASELINE = os.environ.get('VYCINITY_BENCHMARK_CONFIG_BASELINE')
+BENCHMARK_FLEETS = [
+    FleetParameters(routers=1, networks_per_router=2, rules_per_ruleset=5),
+    FleetParameters(routers=5, networks_per_router=5, rules_per_ruleset=10, list_depth=2),
+    FleetParameters(routers=10, networks_per_router=5, rules_per_ruleset=10, list_depth=2),
+]
+
+@skipUnless(BENCHMARK_ENABLED, 'Benchmarks run only when VYCINITY_BENCHMARK is set.')
+class ConfigGenerationBenchmark(TestCase):
+    '''
+    Measures generateConfig, merge, diff and genApiCommands on synthetic fleets of growing size.
+
+    Environment:
+        VYCINITY_BENCHMARK: enables the benchmark.
+        VYCINITY_BENCHMARK_CONFIG_OUTPUT: file to write the measurements to as JSON.
+        VYCINITY_BENCHMARK_CONFIG_BASELINE: measurements of an earlier run. The benchmark fails if
+                                            any phase needs more queries than before.
+    '''
+
+    def test_config_generation(self):
+        measurements = []
+        for (index, parameters) in enumerate(BENCHMARK_FLEETS):
+            tenant = create_tenant('benchmark%d' % index)
+            routers = generate_fleet(tenant, parameters)
+            measurements += benchmark_config_operations(routers, parameters, parameters.routers)
+        if BENCHMARK_OUTPUT:
+            write_measurements(measurements, BENCHMARK_OUTPUT, meta={'benchmark': 'config_generation'})
+        for measurement in measurements:
+            if measurement.name != 'generateConfig':
+                self.assertEqual(0, measurement.queries, '{} should not access the database'.format(measurement.name))
+        if BENCHMARK_BASELINE:
+            regressions = find_query_regressions(read_measurements(BENCHMARK_BASELINE), measurements)
+            self.assertListEqual([], ['{} (size {}): {} -> {} queries'.format(current.name, current.size, previous.queries, current.queries) for (previous, current) in regressions])
@@ -0,0 +1,79 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import os
+from base64 import b64encode
+from django.test import Client, TestCase
+from unittest import skipUnless
+from vycinity.benchmarks import Measurement, find_query_growth, find_query_regressions, measure, read_measurements, write_measurements
+from vycinity.benchmarks.generators import create_tenant, generate_changeset, generate_tenant_tree
+from vycinity.meta.registries import ChangeableObjectRegistry
+from vycinity.models import AbstractOwnedObject
+
+BENCHMARK_ENABLED = 'VYCINITY_BENCHMARK' in os.environ
+BENCHMARK_OUTPUT = os.environ.get('VYCINITY_BENCHMARK_OUTPUT')
+BENCHMARK_BASELINE = os.environ.get('VYCINITY_BENCHMARK_BASELINE')
+BENCHMARK_SCALES = [int(scale) for scale in os.environ.get('VYCINITY_BENCHMARK_SCALES', '1,5,20').split(',')]
+
+@skipUnless(BENCHMARK_ENABLED, 'Benchmarks run only when VYCINITY_BENCHMARK is set.')
+class EndpointBenchmark(TestCase):
+    '''
+    Measures query counts, wall time and peak memory of the list and detail endpoints of all
+    registered owned objects with growing data sizes.
+
+    Environment:
+        VYCINITY_BENCHMARK: enables the benchmark.
+        VYCINITY_BENCHMARK_SCALES: comma separated numbers of networks per tenant.
+        VYCINITY_BENCHMARK_OUTPUT: file to write the measurements to as JSON.
+        VYCINITY_BENCHMARK_BASELINE: measurements of an earlier run. The benchmark fails if any
+                                     endpoint needs more queries than before.
+    '''
+
+    def request_all_endpoints(self, client: Client, authorization: str, tenant, changeset, size: int):
+        rtn = []
+        for entry in ChangeableObjectRegistry.instance().all():
+            if not entry.path or not issubclass(entry.model, AbstractOwnedObject):
+                continue
+            detail_object = tenant.first(entry.model)
+            for (suffix, query) in [('', ''), (' changeset', 'changeset=%s' % changeset.id)]:
+                if entry.list_view:
+                    url = '/api/v1/%s?page_size=1000&%s' % (entry.path, query)
+                    (measurement, response) = measure('GET %s%s' % (entry.path, suffix), size, lambda: client.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=authorization))
+                    measurement.extra['status'] = response.status_code
+                    rtn.append(measurement)
+                if entry.single_view and detail_object is not None:
+                    url = '/api/v1/%s/%s?%s' % (entry.path, detail_object.uuid, query)
+                    (measurement, response) = measure('GET %s/<uuid>%s' % (entry.path, suffix), size, lambda: client.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=authorization))
+                    measurement.extra['status'] = response.status_code
+                    rtn.append(measurement)
+        return rtn
+
+    def test_endpoints(self):
+        measurements: list[Measurement] = []
+        client = Client()
+        for size in BENCHMARK_SCALES:
+            tenant = create_tenant('benchmark%d' % size)
+            generate_tenant_tree(tenant, networks=size)
+            changeset = generate_changeset(tenant)
+            authorization = 'Basic ' + b64encode((tenant.user.name + ':' + tenant.password).encode('utf-8')).decode('ascii')
+            measurements += self.request_all_endpoints(client, authorization, tenant, changeset, size)
+
+        if BENCHMARK_OUTPUT:
+            write_measurements(measurements, BENCHMARK_OUTPUT, meta={'scales': BENCHMARK_SCALES, 'query_growth': find_query_growth(measurements)})
+        for measurement in measurements:
+            self.assertEqual(200, measurement.extra['status'], '{} failed at size {}'.format(measurement.name, measurement.size))
+        if BENCHMARK_BASELINE:
+            regressions = find_query_regressions(read_measurements(BENCHMARK_BASELINE), measurements)
+            self.assertListEqual([], ['{} (size {}): {} -> {} queries'.format(current.name, current.size, previous.queries, current.queries) for (previous, current) in regressions])
@@ -0,0 +1,141 @@
+# This file is part of VyCinity.
+# 
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+# 
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+# 
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+from base64 import b64encode
+import json
+import uuid
+from django.contrib.auth.hashers import make_password
+from django.test import Client, TestCase
+from vycinity.meta import change_management
+from vycinity.models import OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED, change_models, customer_models
+from vycinity.models.firewall_models import ACTION_ACCEPT, ACTION_DROP, BasicRule, Firewall, HostAddressObject, ListAddressObject, RuleSet
+
+class BulkChangeAPITest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.main_customer: customer_models.Customer = customer_models.Customer.objects.create(name = 'Test-Root customer')
+        cls.main_user: customer_models.User = customer_models.User.objects.create(name='testuser', customer=cls.main_customer)
+        cls.other_customer: customer_models.Customer = customer_models.Customer.objects.create(name='Other Root customer')
+        cls.other_user: customer_models.User = customer_models.User.objects.create(name='otheruser', customer=cls.other_customer)
+        customer_models.LocalUserAuth.objects.create(user=cls.main_user, auth=make_password('testpw'))
+        cls.authorization = 'Basic ' + b64encode('testuser:testpw'.encode('utf-8')).decode('ascii')
+        cls.host: HostAddressObject = HostAddressObject.objects.create(name='host1', ipv4_address='192.0.2.1', owner=cls.main_customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        cls.other_host: HostAddressObject = HostAddressObject.objects.create(name='host2', ipv4_address='192.0.2.2', owner=cls.other_customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+
+    def setUp(self):
+        self.changeset = change_models.ChangeSet.objects.create(owner=self.main_customer, owner_name=self.main_customer.name, user=self.main_user, user_name=self.main_user.name)
+
+    def post_bulk(self, content, changeset=None):
+        c = Client()
+        return c.post('/api/v1/changesets/{}/bulk'.format((changeset or self.changeset).id), json.dumps(content), content_type='application/json', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+
+    def test_create_with_references(self):
+        firewall_uuid = str(uuid.uuid4())
+        ruleset_uuid = str(uuid.uuid4())
+        list_uuid = str(uuid.uuid4())
+        owner = str(self.main_customer.id)
+        # referencing objects come first, the order of creation is determined by the references
+        response = self.post_bulk({'create': [
+            {'type': 'BasicRule', 'data': {'related_ruleset': ruleset_uuid, 'priority': 10, 'disable': False, 'destination_address': list_uuid, 'action': ACTION_ACCEPT, 'log': False}},
+            {'type': 'RuleSet', 'uuid': ruleset_uuid, 'data': {'owner': owner, 'public': False, 'priority': 10, 'firewalls': [firewall_uuid]}},
+            {'type': 'ListAddressObject', 'uuid': list_uuid, 'data': {'owner': owner, 'public': False, 'name': 'list', 'elements': [str(self.host.uuid)]}},
+            {'type': 'Firewall', 'uuid': firewall_uuid, 'data': {'owner': owner, 'public': False, 'stateful': True, 'name': 'fw', 'default_action_into': ACTION_DROP, 'default_action_from': ACTION_ACCEPT}},
+        ]})
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertEqual(4, len(response.json()['created']))
+        self.assertEqual(4, self.changeset.changes.filter(action=change_models.ACTION_CREATED).count())
+        ruleset = RuleSet.objects.get(uuid=ruleset_uuid)
+        self.assertEqual(OWNED_OBJECT_STATE_PREPARED, ruleset.state)
+        self.assertEqual([uuid.UUID(firewall_uuid)], [firewall.uuid for firewall in ruleset.firewalls.all()])
+        self.assertEqual([self.host.pk], [element.pk for element in ListAddressObject.objects.get(uuid=list_uuid).elements.all()])
+        rule = BasicRule.objects.get(related_ruleset=ruleset)
+        self.assertEqual(self.main_customer, rule.owner)
+
+        change_management.apply_changeset(self.changeset)
+        self.assertEqual(OWNED_OBJECT_STATE_LIVE, RuleSet.objects.get(uuid=ruleset_uuid).state)
+        self.assertEqual(OWNED_OBJECT_STATE_LIVE, Firewall.objects.get(uuid=firewall_uuid).state)
+
+    def test_update_and_delete(self):
+        response = self.post_bulk({
+            'update': [{'type': 'HostAddressObject', 'uuid': str(self.host.uuid), 'data': {'owner': str(self.main_customer.id), 'public': False, 'name': 'renamed', 'ipv4_address': '192.0.2.3'}}],
+        })
+        self.assertEqual(200, response.status_code, response.content)
+        versions = HostAddressObject.objects.filter(uuid=self.host.uuid).order_by('pk')
+        self.assertEqual(2, len(versions))
+        self.assertEqual(('host1', OWNED_OBJECT_STATE_LIVE), (versions[0].name, versions[0].state))
+        self.assertEqual(('renamed', '192.0.2.3', OWNED_OBJECT_STATE_PREPARED), (versions[1].name, versions[1].ipv4_address, versions[1].state))
+        change = self.changeset.changes.get()
+        self.assertEqual((change_models.ACTION_MODIFIED, self.host.pk, versions[1].pk), (change.action, change.pre_id, change.post_id))
+
+        response = self.post_bulk({'delete': [{'type': 'HostAddressObject', 'uuid': str(self.host.uuid)}]})
+        self.assertEqual(200, response.status_code, response.content)
+        change = self.changeset.changes.get()
+        self.assertEqual(change_models.ACTION_DELETED, change.action)
+        self.assertEqual(OWNED_OBJECT_STATE_DELETED, HostAddressObject.objects.get(pk=versions[1].pk).state)
+
+    def test_create_and_delete(self):
+        host_uuid = str(uuid.uuid4())
+        response = self.post_bulk({
+            'create': [{'type': 'HostAddressObject', 'uuid': host_uuid, 'data': {'owner': str(self.main_customer.id), 'public': False, 'name': 'temporary', 'ipv4_address': '192.0.2.4'}}],
+            'delete': [{'type': 'HostAddressObject', 'uuid': host_uuid}],
+        })
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertFalse(HostAddressObject.objects.filter(uuid=host_uuid).exists())
+        self.assertEqual(0, self.changeset.changes.count())
+
+    def test_invalid_operations(self):
+        first_uuid = str(uuid.uuid4())
+        second_uuid = str(uuid.uuid4())
+        owner = str(self.main_customer.id)
+        response = self.post_bulk({'create': [
+            {'type': 'ListAddressObject', 'uuid': first_uuid, 'data': {'owner': owner, 'public': False, 'name': 'first', 'elements': [second_uuid]}},
+            {'type': 'ListAddressObject', 'uuid': second_uuid, 'data': {'owner': owner, 'public': False, 'name': 'second', 'elements': [first_uuid]}},
+            {'type': 'ListAddressObject', 'data': {'owner': owner, 'public': False, 'name': 'invisible', 'elements': [str(self.other_host.uuid)]}},
+            {'type': 'HostAddressObject', 'data': {'owner': owner, 'public': False, 'name': 'valid', 'ipv4_address': '192.0.2.5'}},
+        ]})
+        self.assertEqual(400, response.status_code)
+        self.assertSetEqual({'0', '1', '2'}, set(response.json()['create'].keys()))
+        self.assertFalse(HostAddressObject.objects.filter(name='valid').exists())
+        self.assertEqual(0, self.changeset.changes.count())
+
+        response = self.post_bulk({'create': [{'type': 'ManagedInterface', 'data': {}}], 'update': [{'type': 'HostAddressObject', 'uuid': str(self.other_host.uuid), 'data': {}}]})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('type', response.json()['create']['0'])
+
+        response = self.post_bulk({'update': [{'type': 'HostAddressObject', 'uuid': str(self.other_host.uuid), 'data': {'owner': owner, 'public': False, 'name': 'stolen'}}]})
+        self.assertEqual(400, response.status_code)
+        self.assertIn('uuid', response.json()['update']['0'])
+
+    def test_foreign_public_object(self):
+        public_host = HostAddressObject.objects.create(name='public', ipv4_address='192.0.2.6', owner=self.other_customer, public=True, state=OWNED_OBJECT_STATE_LIVE)
+        response = self.post_bulk({'delete': [{'type': 'HostAddressObject', 'uuid': str(public_host.uuid)}]})
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(['Access denied.'], response.json()['delete']['0']['uuid'])
+
+        response = self.post_bulk({'update': [{'type': 'HostAddressObject', 'uuid': str(public_host.uuid), 'data': {'owner': str(self.main_customer.id), 'public': True, 'name': 'stolen', 'ipv4_address': '192.0.2.6'}}]})
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(['Access denied.'], response.json()['update']['0']['uuid'])
+        self.assertEqual(0, self.changeset.changes.count())
+        self.assertListEqual([(self.other_customer.id, 'public', OWNED_OBJECT_STATE_LIVE)], list(HostAddressObject.objects.filter(uuid=public_host.uuid).values_list('owner_id', 'name', 'state')))
+
+        # referencing public objects of other customers stays possible
+        response = self.post_bulk({'create': [{'type': 'ListAddressObject', 'data': {'owner': str(self.main_customer.id), 'public': False, 'name': 'list', 'elements': [str(public_host.uuid)]}}]})
+        self.assertEqual(200, response.status_code, response.content)
+
+    def test_changeset_access(self):
+        other_changeset = change_models.ChangeSet.objects.create(owner=self.other_customer, owner_name=self.other_customer.name, user=self.other_user, user_name=self.other_user.name)
+        self.assertEqual(403, self.post_bulk({}, other_changeset).status_code)
+        change_management.apply_changeset(self.changeset)
+        self.assertEqual(400, self.post_bulk({}).status_code)
@@ -13,11 +13,13 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
 from django.test import TestCase
 import vycinity.views
 from vycinity.models import OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_OUTDATED, OWNED_OBJECT_STATE_PREPARED, basic_models, customer_models, firewall_models, change_models, network_models
 import vycinity.meta.change_management
 import vycinity.meta.registries
+from vycinity.meta.list_membership import ListCycleError
 
 class ChangeManagementBasicTest(TestCase):
     '''
@@ -220,4 +222,64 @@ class ChangeManagementSemanticsTest(TestCase):
         with self.assertRaises(vycinity.meta.change_management.ChangeConflictError):
             vycinity.meta.change_management.apply_changeset(self.changeset_ruleset_main_user)
         self.changeset_ruleset_main_user.refresh_from_db()
-        self.assertIsNone(self.changeset_ruleset_main_user.applied)
\ No newline at end of file
+        self.assertIsNone(self.changeset_ruleset_main_user.applied)
+class ChangeManagementListMembershipTest(TestCase):
+    '''
+    Tests the materialized members of lists, which are maintained while applying changesets.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.main_customer = customer_models.Customer.objects.create(name = 'Test-Root customer')
+        cls.main_user = customer_models.User.objects.create(name='testuser', customer=cls.main_customer)
+        cls.live_host = firewall_models.HostAddressObject.objects.create(name='live host', ipv4_address='192.0.2.1', owner=cls.main_customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        cls.changeset = change_models.ChangeSet.objects.create(owner=cls.main_customer, user=cls.main_user, owner_name=cls.main_customer.name, user_name=cls.main_user.name)
+
+    def create(self, model, **kwargs):
+        instance = model.objects.create(owner=self.main_customer, public=False, state=OWNED_OBJECT_STATE_PREPARED, **kwargs)
+        change_models.Change.objects.create(changeset=self.changeset, entity=model.__name__, post=instance, action=change_models.ACTION_CREATED)
+        return instance
+
+    def get_members(self, list_object):
+        return list(firewall_models.ListMembership.objects.filter(list=list_object).order_by('position').values_list('member_id', flat=True))
+
+    def test_nested_lists(self):
+        new_host = self.create(firewall_models.HostAddressObject, name='new host', ipv4_address='192.0.2.2')
+        inner_list = self.create(firewall_models.ListAddressObject, name='inner')
+        inner_list.elements.set([self.live_host])
+        outer_list = self.create(firewall_models.ListAddressObject, name='outer')
+        outer_list.elements.set([inner_list, new_host, self.live_host])
+        self.assertListEqual([], self.get_members(outer_list))
+
+        vycinity.meta.change_management.apply_changeset(self.changeset)
+        self.assertListEqual([self.live_host.pk], self.get_members(inner_list))
+        self.assertListEqual([self.live_host.pk, new_host.pk], self.get_members(outer_list))
+
+        outer_list.elements.remove(new_host)
+        self.assertListEqual([self.live_host.pk], self.get_members(outer_list))
+
+    def test_reverse_clear(self):
+        inner_list = self.create(firewall_models.ListAddressObject, name='inner')
+        inner_list.elements.set([self.live_host])
+        outer_list = self.create(firewall_models.ListAddressObject, name='outer')
+        outer_list.elements.set([inner_list])
+        vycinity.meta.change_management.apply_changeset(self.changeset)
+        self.assertListEqual([self.live_host.pk], self.get_members(outer_list))
+
+        containing_lists = ManyToManyDescriptor(firewall_models.ListAddressObject.elements.rel, reverse=True).__get__(self.live_host)
+        containing_lists.clear()
+        self.assertListEqual([], self.get_members(inner_list))
+        self.assertListEqual([], self.get_members(outer_list))
+
+    def test_cyclic_lists(self):
+        first_list = self.create(firewall_models.ListAddressObject, name='first')
+        second_list = self.create(firewall_models.ListAddressObject, name='second')
+        first_list.elements.set([second_list, self.live_host])
+        second_list.elements.set([first_list])
+
+        with self.assertRaises(ListCycleError):
+            vycinity.meta.change_management.apply_changeset(self.changeset)
+        self.changeset.refresh_from_db()
+        self.assertIsNone(self.changeset.applied)
+        self.assertEqual(OWNED_OBJECT_STATE_PREPARED, firewall_models.ListAddressObject.objects.get(pk=first_list.pk).state)
+        self.assertFalse(firewall_models.ListMembership.objects.exists())
@@ -97,4 +97,18 @@ class ChangeAPITest(TestCase):
         changeset = change_models.ChangeSet.objects.get(pk=resultPrep['changeset'])
         change_management.apply_changeset(changeset)
         response: Response = c.delete('/api/v1/changesets/{}'.format(resultPrep['changeset']), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
-        self.assertEqual(403, response.status_code)
\ No newline at end of file
+        self.assertEqual(403, response.status_code)
+    def testListChangesetsCursorPagination(self):
+        changesets = [change_models.ChangeSet.objects.create(owner=self.main_customer, user=self.main_user, owner_name=self.main_customer.name, user_name=self.main_user.name) for _ in range(3)]
+        change_models.ChangeSet.objects.create(owner=self.other_root_customer, user=self.other_root_user, owner_name=self.other_root_customer.name, user_name=self.other_root_user.name)
+        c = Client()
+        seen_ids = []
+        url = '/api/v1/changesets?page_size=2'
+        while url is not None:
+            response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+            self.assertEqual(200, response.status_code)
+            content = response.json()
+            self.assertLessEqual(len(content['results']), 2)
+            seen_ids += [changeset['id'] for changeset in content['results']]
+            url = content['next']
+        self.assertListEqual([str(changeset.id) for changeset in reversed(changesets)], seen_ids)
@@ -450,3 +450,36 @@ class GenericAPITest(TestCase):
         self.assertEqual(400, response.status_code)
         applied_changeset.refresh_from_db()
         self.assertEqual(0, applied_changeset.changes.count())
+
+    def test_list_rulesets_cursor_pagination(self):
+        c = Client()
+        seen_uuids = []
+        url = '/api/v1/rulesets?page_size=2'
+        while url is not None:
+            response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+            self.assertEqual(200, response.status_code)
+            content = response.json()
+            self.assertLessEqual(len(content['results']), 2)
+            seen_uuids += [content_object['uuid'] for content_object in content['results']]
+            url = content['next']
+        self.assertListEqual([str(self.private_ruleset_main_user.uuid), str(self.private_ruleset_main_user_wo_ref.uuid), str(self.public_ruleset_other_user.uuid)], seen_uuids)
+
+    def test_get_ruleset_conditional(self):
+        c = Client()
+        url = '/api/v1/rulesets/{}'.format(self.private_ruleset_main_user.uuid)
+        response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(200, response.status_code)
+        etag = response['ETag']
+        response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, response.status_code)
+
+        changeset_url = '{}?changeset={}'.format(url, self.changeset_ruleset_main_user.id)
+        response = c.get(changeset_url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        changeset_etag = response['ETag']
+        self.assertNotEqual(etag, changeset_etag)
+        response = c.put(changeset_url, json.dumps({'comment': 'changed again', 'priority': 10, 'firewalls': [str(self.firewall_main_user.uuid)], 'owner': str(self.main_customer.id), 'public': False}), content_type='application/json', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(200, response.status_code)
+        response = c.get(changeset_url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization, HTTP_IF_NONE_MATCH=changeset_etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('changed again', response.json()['comment'])
@@ -14,7 +14,7 @@
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
 from django.test import TestCase
-from vycinity.models import customer_models, firewall_models
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED, change_models, customer_models, firewall_models
 
 class ModelOwnedByTest(TestCase):
     def test_customer_inheritance(self):
@@ -48,4 +48,43 @@ class ModelOwnedByTest(TestCase):
         self.assertListEqual([customer_a, customer_b, customer_c, customer_d], customer_a.get_visible_customers())
         self.assertListEqual([customer_b, customer_c], customer_b.get_visible_customers())
         self.assertListEqual([customer_c], customer_c.get_visible_customers())
-        self.assertListEqual([customer_d], customer_d.get_visible_customers())
\ No newline at end of file
+        self.assertListEqual([customer_d], customer_d.get_visible_customers())
+
+class ModelChangesetVisibilityTest(TestCase):
+    def test_filter_by_changeset_and_visibility(self):
+        customer = customer_models.Customer.objects.create(name='A')
+        user = customer_models.User.objects.create(name='a', customer=customer)
+        live_firewall = firewall_models.Firewall.objects.create(stateful=True, name='fw_live', default_action_into=firewall_models.ACTION_ACCEPT, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, state=OWNED_OBJECT_STATE_LIVE)
+        modified_firewall = firewall_models.Firewall.objects.create(stateful=True, name='fw_modified', default_action_into=firewall_models.ACTION_ACCEPT, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, state=OWNED_OBJECT_STATE_LIVE)
+        modified_firewall_new = firewall_models.Firewall.objects.create(uuid=modified_firewall.uuid, stateful=False, name='fw_modified', default_action_into=firewall_models.ACTION_ACCEPT, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, state=OWNED_OBJECT_STATE_PREPARED)
+        created_firewall = firewall_models.Firewall.objects.create(stateful=True, name='fw_created', default_action_into=firewall_models.ACTION_ACCEPT, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, state=OWNED_OBJECT_STATE_PREPARED)
+        firewall_models.Firewall.objects.create(stateful=True, name='fw_other_changeset', default_action_into=firewall_models.ACTION_ACCEPT, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, state=OWNED_OBJECT_STATE_PREPARED)
+        changeset = change_models.ChangeSet.objects.create(owner=customer, user=user, owner_name=customer.name, user_name=user.name)
+        change_models.Change.objects.create(changeset=changeset, entity='Firewall', pre=modified_firewall, post=modified_firewall_new, action=change_models.ACTION_MODIFIED)
+        change_models.Change.objects.create(changeset=changeset, entity='Firewall', post=created_firewall, action=change_models.ACTION_CREATED)
+
+        # The changes of the changeset must not be loaded while building the query.
+        with self.assertNumQueries(0):
+            query = firewall_models.Firewall.filter_by_changeset_and_visibility(firewall_models.Firewall.objects.all(), changeset, [customer])
+        self.assertSetEqual({live_firewall.pk, modified_firewall_new.pk, created_firewall.pk}, set(query.values_list('pk', flat=True)))
+
+class ModelSemiOwnedObjectTest(TestCase):
+    def test_rule_owner_follows_ruleset(self):
+        customer_a = customer_models.Customer.objects.create(name='A')
+        customer_b = customer_models.Customer.objects.create(name='B', parent_customer=customer_a)
+        ruleset = firewall_models.RuleSet.objects.create(priority=10, owner=customer_b, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        rule = firewall_models.CustomRule.objects.create(related_ruleset=ruleset, priority=1, disable=False, ip_version=firewall_models.IP_VERSION_4, direction=firewall_models.DIRECTION_INTO, rule_definition={}, state=OWNED_OBJECT_STATE_LIVE)
+        self.assertEqual(customer_b.id, rule.owner_id)
+        self.assertFalse(rule.public)
+
+        ruleset.owner = customer_a
+        ruleset.public = True
+        ruleset.save()
+        rule.refresh_from_db()
+        self.assertEqual(customer_a.id, rule.owner_id)
+        self.assertTrue(rule.public)
+
+        self.assertListEqual([rule.pk], [r.pk for r in firewall_models.Rule.filter_query_by_customers_or_public(firewall_models.Rule.objects.all(), [customer_b])])
+        self.assertListEqual([], list(firewall_models.Rule.filter_query_by_owners(firewall_models.Rule.objects.all(), [customer_b])))
+        query = str(firewall_models.Rule.filter_query_by_customers_or_public(firewall_models.Rule.objects.all(), [customer_b]).query)
+        self.assertNotIn(firewall_models.RuleSet._meta.db_table, query)
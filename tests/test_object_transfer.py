@@ -0,0 +1,113 @@
+# This file is part of VyCinity.
+# 
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+# 
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+# 
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+from base64 import b64encode
+import json
+import uuid
+from unittest import mock
+from django.contrib.auth.hashers import make_password
+from django.test import Client, TestCase
+from vycinity.meta import change_management, object_transfer
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, change_models, customer_models, network_models
+from vycinity.models.firewall_models import ACTION_ACCEPT, BasicRule, Firewall, HostAddressObject, ListAddressObject, RuleSet
+
+class ObjectTransferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.main_customer: customer_models.Customer = customer_models.Customer.objects.create(name = 'Test-Root customer')
+        cls.sub_customer: customer_models.Customer = customer_models.Customer.objects.create(name = 'sub customer', parent_customer = cls.main_customer)
+        cls.main_user: customer_models.User = customer_models.User.objects.create(name='testuser', customer=cls.main_customer)
+        customer_models.LocalUserAuth.objects.create(user=cls.main_user, auth=make_password('testpw'))
+        cls.authorization = 'Basic ' + b64encode('testuser:testpw'.encode('utf-8')).decode('ascii')
+
+        live = {'owner': cls.main_customer, 'public': False, 'state': OWNED_OBJECT_STATE_LIVE}
+        cls.network = network_models.Network.objects.create(ipv4_network_address='10.1.1.0', ipv4_network_bits=24, name='network', layer2_network_id=2, **live)
+        cls.firewall = Firewall.objects.create(stateful=True, name='fw', related_network=cls.network, default_action_into=ACTION_ACCEPT, default_action_from=ACTION_ACCEPT, **live)
+        cls.ruleset = RuleSet.objects.create(priority=10, **live)
+        cls.ruleset.firewalls.add(cls.firewall)
+        # the outer list is older than the inner one, but references it
+        cls.outer_list = ListAddressObject.objects.create(name='outer', **live)
+        cls.inner_list = ListAddressObject.objects.create(name='inner', **live)
+        cls.host = HostAddressObject.objects.create(name='host', ipv4_address='10.1.1.1', **live)
+        cls.inner_list.elements.add(cls.host)
+        cls.outer_list.elements.add(cls.inner_list)
+        cls.rule = BasicRule.objects.create(related_ruleset=cls.ruleset, priority=10, disable=False, destination_address=cls.outer_list, action=ACTION_ACCEPT, log=False, state=OWNED_OBJECT_STATE_LIVE)
+        HostAddressObject.objects.create(name='other', ipv4_address='10.1.1.2', owner=cls.sub_customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+
+    def export(self, customer):
+        c = Client()
+        response = c.get('/api/v1/customers/{}/export'.format(customer.id), HTTP_ACCEPT='application/x-ndjson', HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def import_objects(self, content, changeset, owner):
+        c = Client()
+        return c.post('/api/v1/changesets/{}/import?owner={}'.format(changeset.id, owner.id), content, content_type='application/x-ndjson', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.authorization)
+
+    def new_changeset(self):
+        return change_models.ChangeSet.objects.create(owner=self.main_customer, owner_name=self.main_customer.name, user=self.main_user, user_name=self.main_user.name)
+
+    def test_export(self):
+        lines = [json.loads(line) for line in self.export(self.main_customer).splitlines()]
+        self.assertEqual(7, len(lines))
+        types = [line['type'] for line in lines]
+        self.assertLess(types.index('Network'), types.index('Firewall'))
+        self.assertLess(types.index('Firewall'), types.index('RuleSet'))
+        self.assertLess(types.index('HostAddressObject'), types.index('ListAddressObject'))
+        self.assertLess(types.index('ListAddressObject'), types.index('BasicRule'))
+        by_uuid = {line['uuid']: line for line in lines}
+        self.assertEqual([str(self.firewall.uuid)], by_uuid[str(self.ruleset.uuid)]['data']['firewalls'])
+        self.assertEqual(str(self.outer_list.uuid), by_uuid[str(self.rule.uuid)]['data']['destination_address'])
+        self.assertNotIn('changeset', by_uuid[str(self.rule.uuid)]['data'])
+        self.assertEqual(1, len(self.export(self.sub_customer).splitlines()))
+
+    def test_roundtrip(self):
+        content = self.export(self.main_customer)
+        # networks must not overlap
+        content = content.replace('"10.1.1.0"', '"10.2.2.0"').replace('"layer2_network_id":2', '"layer2_network_id":3')
+        changeset = self.new_changeset()
+        # small batches defer the outer list until the inner list was imported
+        with mock.patch.object(object_transfer, 'IMPORT_BATCH_SIZE', 2):
+            response = self.import_objects(content, changeset, self.sub_customer)
+        self.assertEqual(200, response.status_code, response.content)
+        self.assertEqual(7, response.json()['imported'])
+        self.assertEqual(7, changeset.changes.count())
+
+        change_management.apply_changeset(changeset)
+        self.assertEqual(8, len(self.export(self.sub_customer).splitlines()))
+        imported_rule = BasicRule.objects.get(related_ruleset__owner=self.sub_customer, state=OWNED_OBJECT_STATE_LIVE)
+        outer_list = ListAddressObject.objects.get(pk=imported_rule.destination_address.pk)
+        self.assertEqual('outer', outer_list.name)
+        self.assertEqual(['inner'], [element.name for element in outer_list.elements.all()])
+        self.assertNotEqual(self.outer_list.uuid, outer_list.uuid)
+        self.assertFalse(ListAddressObject.objects.filter(uuid=self.outer_list.uuid, owner=self.sub_customer).exists())
+
+    def test_import_errors(self):
+        changeset = self.new_changeset()
+        missing = str(uuid.uuid4())
+        content = '\n'.join([
+            json.dumps({'type': 'HostAddressObject', 'uuid': str(uuid.uuid4()), 'data': {'name': 'valid', 'ipv4_address': '10.1.1.3', 'public': False}}),
+            json.dumps({'type': 'ListAddressObject', 'uuid': str(uuid.uuid4()), 'data': {'name': 'broken', 'public': False, 'elements': [missing]}}),
+        ])
+        response = self.import_objects(content, changeset, self.main_customer)
+        self.assertEqual(400, response.status_code)
+        self.assertEqual(['2'], list(response.json()['lines'].keys()))
+        self.assertFalse(HostAddressObject.objects.filter(name='valid').exists())
+
+        response = self.import_objects('{"type": "HostAddressObject"\n', changeset, self.main_customer)
+        self.assertEqual(400, response.status_code)
+        self.assertIn('1', response.json()['lines'])
+        self.assertEqual(0, changeset.changes.count())
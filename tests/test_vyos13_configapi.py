@@ -0,0 +1,178 @@
+from base64 import b64encode
+import json
+from django.test import Client, TestCase
+from django.contrib.auth.hashers import make_password
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, basic_models, customer_models, firewall_models, network_models
+
+class Vyos13ConfigAPITest(TestCase):
+    '''
+    Tests the lists and details of generated configurations, live configurations and deployments.
+    '''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.test_router: basic_models.Vyos13Router = basic_models.Vyos13Router.objects.create(name = "testrouter", loopback = "1.2.3.4", deploy = False, managed_interface_context = ['interfaces', 'ethernet', 'eth1'], token = 'dev123', fingerprint = '1234567890abcdef0')
+        cls.root_customer: customer_models.Customer = customer_models.Customer.objects.create(name = "root customer")
+        cls.root_user: customer_models.User = customer_models.User.objects.create(name = 'root', display_name = 'root', customer = cls.root_customer)
+        cls.root_auth: customer_models.LocalUserAuth = customer_models.LocalUserAuth.objects.create(user = cls.root_user, auth=make_password('root'))
+        cls.root_authorization: str = 'Basic ' + b64encode('root:root'.encode('utf-8')).decode('ascii')
+        cls.test_configs = [basic_models.Vyos13RouterConfig.objects.create(router = cls.test_router, config = {'system': {'host-name': 'router%d' % i}}) for i in range(3)]
+        cls.test_deployments = []
+        for config in cls.test_configs:
+            deployment = basic_models.Deployment.objects.create(change = 'test', state = basic_models.DEPLOYMENT_STATE_SUCCEED)
+            deployment.configs.add(config)
+            cls.test_deployments.append(deployment)
+        cls.test_live_config: basic_models.Vyos13LiveRouterConfig = basic_models.Vyos13LiveRouterConfig.objects.create(router = cls.test_router, config = {'system': {'host-name': 'router0'}})
+
+    def test_config_digest(self):
+        self.assertEqual(self.test_configs[0].config_hash, self.test_live_config.config_hash)
+        self.assertNotEqual(self.test_configs[0].config_hash, self.test_configs[1].config_hash)
+        self.assertEqual(len('{"system":{"host-name":"router0"}}'), self.test_configs[0].config_size)
+        pending_live_config = basic_models.Vyos13LiveRouterConfig.objects.create(router = self.test_router)
+        self.assertIsNone(pending_live_config.config_hash)
+        pending_live_config.config = {'system': {}}
+        pending_live_config.save(update_fields=['config'])
+        pending_live_config.refresh_from_db()
+        self.assertEqual(len('{"system":{}}'), pending_live_config.config_size)
+
+    def test_config_canonical(self):
+        config = basic_models.Vyos13RouterConfig.objects.create(router = self.test_router, config = {'system': {'host-name': 'router0', 'name-server': ['9.9.9.9']}})
+        config.refresh_from_db()
+        self.assertDictEqual({'system': {'host-name': 'router0', 'name-server': '9.9.9.9'}}, config.config)
+        self.assertEqual(len('{"system":{"host-name":"router0","name-server":"9.9.9.9"}}'), config.config_size)
+        section = basic_models.Vyos13StaticConfigSection.objects.create(context = ['system'], absolute = False, content = {'ntp': {'server': ['time1.example.com']}})
+        section.refresh_from_db()
+        # sections are merged into configurations, so their lists are kept
+        self.assertDictEqual({'ntp': {'server': ['time1.example.com']}}, section.content)
+
+    def test_list_configs_summary(self):
+        c = Client()
+        response = c.get('/api/v1/configurations/vyos13', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = response.json()
+        self.assertEqual(3, len(content['results']))
+        for (config, result) in zip(sorted(self.test_configs, key=lambda config: str(config.id)), sorted(content['results'], key=lambda result: result['id'])):
+            self.assertEqual(str(config.id), result['id'])
+            self.assertEqual(config.config_hash, result['config_hash'])
+            self.assertEqual(config.config_size, result['config_size'])
+            self.assertNotIn('config', result)
+
+        response = c.get('/api/v1/configurations/vyos13?expand=config', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        for result in response.json()['results']:
+            self.assertDictEqual(basic_models.Vyos13RouterConfig.objects.get(pk=result['id']).config, result['config'])
+
+        response = c.get('/api/v1/configurations/vyos13?fields=id,config_hash', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        self.assertSetEqual({'id', 'config_hash'}, set(response.json()['results'][0].keys()))
+
+    def test_read_config(self):
+        c = Client()
+        response = c.get('/api/v1/configurations/vyos13/{}'.format(self.test_configs[0].id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response.streaming)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(str(self.test_configs[0].id), content['id'])
+        self.assertEqual(str(self.test_router.id), content['router'])
+        self.assertEqual(self.test_configs[0].config_hash, content['config_hash'])
+        self.assertDictEqual(self.test_configs[0].config, content['config'])
+
+    def test_read_live_config(self):
+        c = Client()
+        response = c.get('/api/v1/routers/vyos13/{}/liveconfigs/{}'.format(self.test_router.id, self.test_live_config.id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(str(self.test_live_config.id), content['id'])
+        self.assertDictEqual(self.test_live_config.config, content['config'])
+
+        other_router = basic_models.Vyos13Router.objects.create(name = "otherrouter", loopback = "1.2.3.5", deploy = False, managed_interface_context = ['interfaces', 'ethernet', 'eth1'], token = 'dev123', fingerprint = '1234567890abcdef0')
+        response = c.get('/api/v1/routers/vyos13/{}/liveconfigs/{}'.format(other_router.id, self.test_live_config.id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(404, response.status_code)
+
+    def test_read_live_config_diff(self):
+        c = Client()
+        response = c.get('/api/v1/routers/vyos13/{}/liveconfigs/{}/diff'.format(self.test_router.id, self.test_live_config.id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertSetEqual({'left', 'right'}, set(content.keys()))
+        self.assertIn('system', content['left'])
+
+    def test_read_live_config_diff_keeps_rule_numbers(self):
+        customer = customer_models.Customer.objects.create(name = 'customer')
+        network = network_models.Network.objects.create(ipv4_network_address = '10.20.30.0', ipv4_network_bits = 24, layer2_network_id = 38, owner = customer, name = 'net', state = OWNED_OBJECT_STATE_LIVE)
+        network_models.ManagedInterface.objects.create(ipv4_address = '10.20.30.1', router = self.test_router, network = network)
+        firewall = firewall_models.Firewall.objects.create(name = 'fw', stateful = True, related_network = network, default_action_into = firewall_models.ACTION_DROP, default_action_from = firewall_models.ACTION_ACCEPT, owner = customer, public = False, state = OWNED_OBJECT_STATE_LIVE)
+        ruleset = firewall_models.RuleSet.objects.create(priority = 10, owner = customer, public = False, state = OWNED_OBJECT_STATE_LIVE)
+        ruleset.firewalls.add(firewall)
+        source = firewall_models.CIDRAddressObject.objects.create(owner = customer, public = False, name = 'clients', ipv4_network_address = '10.1.0.0', ipv4_network_bits = 16, state = OWNED_OBJECT_STATE_LIVE)
+        destination = firewall_models.NetworkAddressObject.objects.create(owner = customer, public = False, name = 'net', related_network = network, state = OWNED_OBJECT_STATE_LIVE)
+        firewall_models.BasicRule.objects.create(related_ruleset = ruleset, priority = 10, disable = False, source_address = source, destination_address = destination, log = False, action = firewall_models.ACTION_ACCEPT, state = OWNED_OBJECT_STATE_LIVE)
+        firewall_models.FirewallRuleNumber.objects.create(firewall_uuid = firewall.uuid, direction = firewall_models.DIRECTION_INTO, ip_version = 4, key = 'obsolete:0', number = 10)
+
+        c = Client()
+        response = c.get('/api/v1/routers/vyos13/{}/liveconfigs/{}/diff'.format(self.test_router.id, self.test_live_config.id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = json.loads(b''.join(response.streaming_content))
+        self.assertIn('firewall', content['right'])
+        self.assertListEqual([(firewall.uuid, 'obsolete:0', 10)], list(firewall_models.FirewallRuleNumber.objects.values_list('firewall_uuid', 'key', 'number')))
+
+    def test_list_live_configs_summary(self):
+        c = Client()
+        response = c.get('/api/v1/routers/vyos13/{}/liveconfigs'.format(self.test_router.id), HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = response.json()
+        self.assertEqual(1, len(content['results']))
+        self.assertEqual(self.test_live_config.config_hash, content['results'][0]['config_hash'])
+        self.assertNotIn('config', content['results'][0])
+
+    def test_list_deployments(self):
+        c = Client()
+        response = c.get('/api/v1/deployments', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        content = response.json()
+        self.assertEqual(3, len(content['results']))
+        self.assertCountEqual([[str(config.id)] for config in self.test_configs], [deployment['configs'] for deployment in content['results']])
+
+        response = c.get('/api/v1/deployments?expand=configs', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+        for deployment in response.json()['results']:
+            self.assertEqual(1, len(deployment['configs']))
+            config = basic_models.Vyos13RouterConfig.objects.get(pk=deployment['configs'][0]['id'])
+            self.assertEqual(config.config_hash, deployment['configs'][0]['config_hash'])
+            self.assertNotIn('config', deployment['configs'][0])
+
+    def test_list_deployments_query_count(self):
+        c = Client()
+        c.get('/api/v1/deployments', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        with self.assertNumQueries(3):
+            response = c.get('/api/v1/deployments?expand=configs', HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+        self.assertEqual(200, response.status_code)
+
+    def test_conditional_get(self):
+        c = Client()
+        urls = [
+            '/api/v1/configurations/vyos13/{}'.format(self.test_configs[0].id),
+            '/api/v1/routers/vyos13/{}/liveconfigs/{}'.format(self.test_router.id, self.test_live_config.id),
+            '/api/v1/deployments/{}'.format(self.test_deployments[0].id),
+        ]
+        for url in urls:
+            response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)
+            self.assertEqual(200, response.status_code)
+            etag = response['ETag']
+            with self.assertNumQueries(2):
+                response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(etag, response['ETag'])
+            response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization, HTTP_IF_NONE_MATCH='"outdated"')
+            self.assertEqual(200, response.status_code)
+        self.assertEqual('"{}"'.format(self.test_configs[0].config_hash), c.get(urls[0], HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)['ETag'])
+
+    def test_conditional_get_changed_deployment(self):
+        c = Client()
+        url = '/api/v1/deployments/{}'.format(self.test_deployments[0].id)
+        etag = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization)['ETag']
+        self.test_deployments[0].state = basic_models.DEPLOYMENT_STATE_FAILED
+        self.test_deployments[0].save()
+        response = c.get(url, HTTP_ACCEPT='application/json', HTTP_AUTHORIZATION=self.root_authorization, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(basic_models.DEPLOYMENT_STATE_FAILED, response.json()['state'])
@@ -13,10 +13,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+import ipaddress
 import json
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
 from django.test import TestCase
-from vycinity.models import OWNED_OBJECT_STATE_LIVE, basic_models, customer_models, firewall_models, network_models
-from vycinity.s42.adapter.vyos13 import generateConfig
+from django.test.utils import CaptureQueriesContext
+from vycinity.models import OWNED_OBJECT_STATE_LIVE, OWNED_OBJECT_STATE_PREPARED, basic_models, customer_models, firewall_models, network_models
+from vycinity.s42.adapter import vyos13 as vyos13_adapter
+from vycinity.s42.adapter.vyos13 import FIREWALL_MODE_GROUPS, MAX_RULE_NUMBER, AddressInterval, ShadowedRule, aggregateAddresses, allocateRuleNumbers, aggregateIntervals, getDirection, getIntervalDirection, getNetworkBounds, generateConfig, generateFirewallConfig, generateManagedInterfaceConfig, normalizePorts, resolveService, splitPorts
 from vycinity.s42.routerconfig.vyos13 import Vyos13RouterConfigDiff, Vyos13RouterConfig
 
 class Vyos13GenerationSCSTest(TestCase):
@@ -50,6 +57,16 @@ class Vyos13GenerationSCSTest(TestCase):
         diff = Vyos13RouterConfig([], {'system':{'ntp':{'servers':{'1.1.1.1':{}, '2.2.2.2':{}, '3.3.3.3':{}}}}}).diff(config)
         self.assertTrue(diff.isEmpty(), 'Diff is not empty: ' + str(diff))
 
+    def test_generateConfigMultiSCSMultiValue(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=[])
+        scs1 = basic_models.Vyos13StaticConfigSection.objects.create(description='first name server', absolute=False, context=['system'], content={'name-server': ['10.0.0.1']})
+        scs2 = basic_models.Vyos13StaticConfigSection.objects.create(description='second name server', absolute=False, context=['system'], content={'name-server': ['10.0.0.2']})
+        router.active_static_configs.set([scs1, scs2])
+
+        config = generateConfig(router)
+        self.assertListEqual(['system'], list(config.config.keys()))
+        self.assertCountEqual(['10.0.0.1', '10.0.0.2'], config.config['system']['name-server'])
+
     def test_generateConfigMultiSCSAbsolute(self):
         router = basic_models.Vyos13Router(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=[])
         router.save()
@@ -210,6 +227,24 @@ class Vyos13GenerationNetworkTest(TestCase):
         self.assertTrue(diff.isEmpty(), 'Diff is not empty: ' + str(diff))
 
 
+    def test_generateManagedInterfaceConfigQueryCount(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+        customer = customer_models.Customer.objects.create(name='C')
+        for i in range(10):
+            network = network_models.Network.objects.create(ipv4_network_address='10.20.%d.0' % i, ipv4_network_bits=24, ipv6_network_address='fd00:%d::' % i, ipv6_network_bits=64, layer2_network_id=100 + i, owner=customer, name='net%d' % i, state=OWNED_OBJECT_STATE_LIVE)
+            if i % 2 == 0:
+                network_models.ManagedVRRPInterface.objects.create(ipv4_address='10.20.%d.2' % i, ipv6_address='fd00:%d::2' % i, router=router, network=network, vrid=i + 1, priority=100, ipv4_service_address='10.20.%d.1' % i, ipv6_service_address='fd00:%d::1' % i)
+            else:
+                network_models.ManagedInterface.objects.create(ipv4_address='10.20.%d.2' % i, router=router, network=network)
+
+        with self.assertNumQueries(1):
+            (vif_config, vrrp_config) = generateManagedInterfaceConfig(router, {}, {})
+        self.assertEqual(10, len(vif_config))
+        self.assertListEqual(['10.20.0.2/24', 'fd00::2/64'], vif_config['100']['address'])
+        self.assertListEqual(['10.20.1.2/24'], vif_config['101']['address'])
+        self.assertEqual(10, len(vrrp_config))
+        self.assertEqual({'interface': 'eth0.102', 'vrid': '3', 'virtual-address': ['fd00:2::1/64'], 'priority': '100'}, vrrp_config['autogen_id%d_net2_v6' % network_models.Network.objects.get(name='net2').id])
+
     def test_generateConfigWithWrongVRRPInterface(self):
         router1 = basic_models.Vyos13Router(name="A", loopback='127.0.1.1', deploy=False,
             token='1234', fingerprint='5678', 
@@ -428,4 +463,283 @@ class Vyos13GenerationNetworkTest(TestCase):
                     }
                 }
             }).diff(config)
-        self.assertTrue(diff.isEmpty(), 'Diff is not empty: ' + str(diff))
\ No newline at end of file
+        self.assertTrue(diff.isEmpty(), 'Diff is not empty: ' + str(diff))
+
+    def test_generateFirewallConfigQueryCount(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+        customer = customer_models.Customer.objects.create(name='B')
+        network = network_models.Network.objects.create(ipv4_network_address='10.20.30.0', ipv4_network_bits=24, layer2_network_id=38, owner=customer, name='net', state=OWNED_OBJECT_STATE_LIVE)
+        network_models.ManagedInterface.objects.create(ipv4_address='10.20.30.1', router=router, network=network)
+        firewall = firewall_models.Firewall.objects.create(name='my firewall', stateful=False, related_network=network, default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset = firewall_models.RuleSet.objects.create(priority=100, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset.firewalls.add(firewall)
+        network_address_object = firewall_models.NetworkAddressObject.objects.create(owner=customer, public=False, name='my network', related_network=network, state=OWNED_OBJECT_STATE_LIVE)
+        service = firewall_models.SimpleServiceObject.objects.create(owner=customer, public=False, name='http', protocol='tcp', port=80, state=OWNED_OBJECT_STATE_LIVE)
+
+        def add_rule(i):
+            host = firewall_models.HostAddressObject.objects.create(owner=customer, public=False, name='host %d' % i, ipv4_address='10.1.2.%d' % i, state=OWNED_OBJECT_STATE_LIVE)
+            address_list = firewall_models.ListAddressObject.objects.create(owner=customer, public=False, name='list %d' % i, state=OWNED_OBJECT_STATE_LIVE)
+            address_list.elements.add(host)
+            firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=i, disable=False, source_address=address_list, destination_address=network_address_object, destination_service=service, log=False, action=firewall_models.ACTION_ACCEPT, state=OWNED_OBJECT_STATE_LIVE)
+            firewall_models.CustomRule.objects.create(related_ruleset=ruleset, priority=i, disable=False, ip_version=firewall_models.IP_VERSION_4, direction=firewall_models.DIRECTION_INTO, rule_definition={'action': 'drop', 'state': {'invalid': 'enable'}}, state=OWNED_OBJECT_STATE_LIVE)
+
+        add_rule(1)
+        with CaptureQueriesContext(connection) as single_rule_queries:
+            generateFirewallConfig(router)
+        for i in range(2, 10):
+            add_rule(i)
+        with self.assertNumQueries(len(single_rule_queries)):
+            (fw_cfg, _, _) = generateFirewallConfig(router)
+        fw_into_name = ('autogen_into_'+str(firewall.id)+'_my_firewall')[:27]
+        rules = fw_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config
+        self.assertEqual(18, len(rules))
+        self.assertEqual({'source': {'address': '10.1.2.1'}, 'destination': {'address': '10.20.30.0/24', 'port': '80'}, 'protocol': 'tcp', 'action': 'accept'}, rules['10'])
+        self.assertEqual({'action': 'drop', 'state': {'invalid': 'enable'}}, rules['20'])
+
+    def test_generateFirewallConfigWithGroups(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+        customer = customer_models.Customer.objects.create(name='B')
+        networks = [network_models.Network.objects.create(ipv4_network_address='10.20.%d.0' % i, ipv4_network_bits=24, layer2_network_id=38 + i, owner=customer, name='net%d' % i, state=OWNED_OBJECT_STATE_LIVE) for i in range(2)]
+        hosts = firewall_models.ListAddressObject.objects.create(owner=customer, public=False, name='hosts', state=OWNED_OBJECT_STATE_LIVE)
+        mixed = firewall_models.ListAddressObject.objects.create(owner=customer, public=False, name='mixed', state=OWNED_OBJECT_STATE_LIVE)
+        for i in range(3):
+            host = firewall_models.HostAddressObject.objects.create(owner=customer, public=False, name='host %d' % i, ipv4_address='10.1.2.%d' % (2 * i + 1), ipv6_address='2001:db8::%d' % (2 * i + 1), state=OWNED_OBJECT_STATE_LIVE)
+            hosts.elements.add(host)
+            mixed.elements.add(host)
+        mixed.elements.add(firewall_models.CIDRAddressObject.objects.create(owner=customer, public=False, name='cidr', ipv4_network_address='10.3.0.0', ipv4_network_bits=16, state=OWNED_OBJECT_STATE_LIVE))
+        services = firewall_models.ListServiceObject.objects.create(owner=customer, public=False, name='web', state=OWNED_OBJECT_STATE_LIVE)
+        services.elements.add(firewall_models.SimpleServiceObject.objects.create(owner=customer, public=False, name='http', protocol='tcp', port=80, state=OWNED_OBJECT_STATE_LIVE))
+        services.elements.add(firewall_models.SimpleServiceObject.objects.create(owner=customer, public=False, name='https', protocol='tcp', port=443, state=OWNED_OBJECT_STATE_LIVE))
+        firewalls = []
+        for network in networks:
+            network_models.ManagedInterface.objects.create(ipv4_address=network.ipv4_network_address[:-1] + '1', router=router, network=network)
+            firewall = firewall_models.Firewall.objects.create(name='fw', stateful=False, related_network=network, default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+            firewalls.append(firewall)
+            ruleset = firewall_models.RuleSet.objects.create(priority=100, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+            ruleset.firewalls.add(firewall)
+            destination = firewall_models.NetworkAddressObject.objects.create(owner=customer, public=False, name=network.name, related_network=network, state=OWNED_OBJECT_STATE_LIVE)
+            firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=1, disable=False, source_address=hosts, destination_address=destination, destination_service=services, log=False, action=firewall_models.ACTION_ACCEPT, state=OWNED_OBJECT_STATE_LIVE)
+            firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=2, disable=False, source_address=mixed, destination_address=destination, log=False, action=firewall_models.ACTION_DROP, state=OWNED_OBJECT_STATE_LIVE)
+
+        (fw_cfg, _, _) = generateFirewallConfig(router, FIREWALL_MODE_GROUPS)
+        groups = fw_cfg.getSubConfig(['firewall', 'group']).config
+        self.assertEqual(1, len(groups['address-group']))
+        (address_group, address_group_config), = groups['address-group'].items()
+        self.assertEqual({'address': ['10.1.2.1', '10.1.2.3', '10.1.2.5']}, address_group_config)
+        (network_group, network_group_config), = groups['network-group'].items()
+        self.assertEqual({'network': ['10.1.2.1/32', '10.1.2.3/32', '10.1.2.5/32', '10.3.0.0/16']}, network_group_config)
+        (port_group, port_group_config), = groups['port-group'].items()
+        self.assertEqual({'port': ['443', '80']}, port_group_config)
+        # the networks have no IPv6 prefix, so no IPv6 rules and groups are generated
+        self.assertNotIn('ipv6-address-group', groups)
+
+        for (firewall, network) in zip(firewalls, networks):
+            fw_into_name = ('autogen_into_'+str(firewall.id)+'_fw')[:27]
+            rules = fw_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config
+            self.assertEqual({
+                '10': {'source': {'group': {'address-group': address_group}}, 'destination': {'address': '10.20.%s.0/24' % network.ipv4_network_address.split('.')[2], 'group': {'port-group': port_group}}, 'protocol': 'tcp', 'action': 'accept'},
+                '20': {'source': {'group': {'network-group': network_group}}, 'destination': {'address': '10.20.%s.0/24' % network.ipv4_network_address.split('.')[2]}, 'action': 'drop'},
+            }, rules)
+
+class Vyos13AddressAggregationTest(TestCase):
+    def test_aggregateAddresses(self):
+        addresses = [
+            ipaddress.IPv4Network('10.0.0.0/25'),
+            ipaddress.IPv4Network('10.0.0.128/25'),
+            ipaddress.IPv4Address('10.0.0.5'),
+            ipaddress.IPv4Address('10.1.0.1'),
+            ipaddress.IPv4Address('10.1.0.1'),
+            ipaddress.IPv6Address('2001:db8::1'),
+            ipaddress.IPv6Network('2001:db8::/64'),
+            ipaddress.IPv6Address('2001:db8:1::1'),
+            ipaddress.IPv4Address('10.1.0.0'),
+        ]
+        self.assertListEqual([
+            ipaddress.IPv4Network('10.0.0.0/24'),
+            ipaddress.IPv4Network('10.1.0.0/31'),
+            ipaddress.IPv6Network('2001:db8::/64'),
+            ipaddress.IPv6Address('2001:db8:1::1'),
+        ], aggregateAddresses(addresses))
+        self.assertListEqual([], aggregateAddresses([]))
+        interval = AddressInterval(4, int(ipaddress.IPv4Address('10.0.0.1')), int(ipaddress.IPv4Address('10.0.0.4')))
+        self.assertListEqual(['10.0.0.1/32', '10.0.0.2/31', '10.0.0.4/32'], [aggregated.toNetworkString() for aggregated in aggregateIntervals([interval])])
+
+    def test_getIntervalDirection(self):
+        network = ipaddress.IPv4Network('10.20.30.0/24')
+        bounds = getNetworkBounds(network)
+        inside = [AddressInterval.fromAddress(ipaddress.IPv4Address('10.20.30.5'))]
+        outside = [AddressInterval.fromAddress(ipaddress.IPv4Network('10.20.0.0/16')), AddressInterval.fromAddress(ipaddress.IPv6Address('2001:db8::1'))]
+        self.assertEqual((firewall_models.DIRECTION_FROM, None), getIntervalDirection(inside, outside, bounds, None))
+        self.assertEqual((firewall_models.DIRECTION_INTO, None), getIntervalDirection(outside, [AddressInterval.fromAddress(network)], bounds, None))
+        self.assertEqual((None, None), getIntervalDirection(outside, outside, bounds, None))
+        self.assertEqual(getDirection([ipaddress.IPv4Address('10.20.30.5')], [ipaddress.IPv4Network('10.20.0.0/16')], network, None), getIntervalDirection(inside, outside[:1], bounds, None))
+
+class Vyos13PortNormalizationTest(TestCase):
+    def test_normalizePorts(self):
+        self.assertListEqual(['22', '80-90', '443'], normalizePorts([(443, 443), (80, 85), (86, 86), (84, 90), (22, 22), (443, 443)]))
+        self.assertListEqual([], normalizePorts([]))
+
+    def test_splitPorts(self):
+        self.assertListEqual([['1']], splitPorts(['1']))
+        parts = splitPorts([str(port) for port in range(1, 14)] + ['100-200', '300-400'])
+        self.assertListEqual([[str(port) for port in range(1, 14)] + ['100-200'], ['300-400']], parts)
+
+    def test_resolveService(self):
+        customer = customer_models.Customer.objects.create(name='A')
+        def create(model, **kwargs):
+            return model.objects.create(owner=customer, public=False, name='service', state=OWNED_OBJECT_STATE_LIVE, **kwargs)
+        service_range = create(firewall_models.RangeServiceObject, protocol='tcp', start_port=8000, end_port=8080)
+        self.assertEqual((['8000-8080'], 'tcp'), resolveService(service_range))
+        self.assertEqual((['25'], 'tcp'), resolveService(create(firewall_models.RangeServiceObject, protocol='tcp', start_port=25, end_port=25)))
+        self.assertIsNone(resolveService(create(firewall_models.RangeServiceObject, protocol='tcp', start_port=80, end_port=79)))
+
+        inner_list = create(firewall_models.ListServiceObject)
+        inner_list.elements.add(create(firewall_models.SimpleServiceObject, protocol='tcp', port=8081))
+        inner_list.elements.add(service_range)
+        outer_list = create(firewall_models.ListServiceObject)
+        outer_list.elements.add(inner_list)
+        outer_list.elements.add(create(firewall_models.SimpleServiceObject, protocol='tcp', port=443))
+        outer_list.elements.add(create(firewall_models.SimpleServiceObject, protocol='tcp', port=8010))
+        self.assertEqual((['443', '8000-8081'], 'tcp'), resolveService(outer_list))
+
+        outer_list.elements.add(create(firewall_models.SimpleServiceObject, protocol='udp', port=53))
+        self.assertIsNone(resolveService(outer_list))
+        self.assertIsNone(resolveService(create(firewall_models.ListServiceObject)))
+
+class Vyos13ShadowedRuleTest(TestCase):
+    def test_removeShadowedRules(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+        customer = customer_models.Customer.objects.create(name='B')
+        network = network_models.Network.objects.create(ipv4_network_address='10.20.30.0', ipv4_network_bits=24, layer2_network_id=38, owner=customer, name='net', state=OWNED_OBJECT_STATE_LIVE)
+        network_models.ManagedInterface.objects.create(ipv4_address='10.20.30.1', router=router, network=network)
+        firewall = firewall_models.Firewall.objects.create(name='fw', stateful=True, related_network=network, default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        first_ruleset = firewall_models.RuleSet.objects.create(priority=10, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        second_ruleset = firewall_models.RuleSet.objects.create(priority=20, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        first_ruleset.firewalls.add(firewall)
+        second_ruleset.firewalls.add(firewall)
+        destination = firewall_models.NetworkAddressObject.objects.create(owner=customer, public=False, name='net', related_network=network, state=OWNED_OBJECT_STATE_LIVE)
+        def create(model, **kwargs):
+            return model.objects.create(owner=customer, public=False, name='object', state=OWNED_OBJECT_STATE_LIVE, **kwargs)
+        def add_rule(ruleset, priority, source, service=None, action=firewall_models.ACTION_ACCEPT):
+            return firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=priority, disable=False, source_address=source, destination_address=destination, destination_service=service, log=False, action=action, state=OWNED_OBJECT_STATE_LIVE)
+        web = create(firewall_models.ListServiceObject)
+        web.elements.add(create(firewall_models.SimpleServiceObject, protocol='tcp', port=80))
+        web.elements.add(create(firewall_models.SimpleServiceObject, protocol='tcp', port=443))
+        network_rule = add_rule(first_ruleset, 1, create(firewall_models.CIDRAddressObject, ipv4_network_address='10.1.0.0', ipv4_network_bits=16))
+        web_rule = add_rule(first_ruleset, 2, create(firewall_models.HostAddressObject, ipv4_address='10.9.9.9'), web)
+        shadowed_host_rule = add_rule(second_ruleset, 1, create(firewall_models.HostAddressObject, ipv4_address='10.1.2.3'), action=firewall_models.ACTION_DROP)
+        shadowed_port_rule = add_rule(second_ruleset, 2, create(firewall_models.HostAddressObject, ipv4_address='10.9.9.9'), create(firewall_models.SimpleServiceObject, protocol='tcp', port=443))
+        add_rule(second_ruleset, 3, create(firewall_models.HostAddressObject, ipv4_address='10.9.9.9'), create(firewall_models.SimpleServiceObject, protocol='udp', port=443))
+
+        for mode in [None, FIREWALL_MODE_GROUPS]:
+            shadowed_rules = []
+            (fw_cfg, _, _) = generateFirewallConfig(router, mode, shadowed_rules)
+            fw_into_name = ('autogen_into_'+str(firewall.id)+'_fw')[:27]
+            rules = fw_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config
+            self.assertListEqual(['10', '20', '50', '9999'], sorted(rules.keys(), key=int))
+            self.assertEqual('udp', rules['50']['protocol'])
+            self.assertListEqual([
+                ShadowedRule(firewall.id, firewall_models.DIRECTION_INTO, 4, '30', shadowed_host_rule.id, '10', network_rule.id),
+                ShadowedRule(firewall.id, firewall_models.DIRECTION_INTO, 4, '40', shadowed_port_rule.id, '20', web_rule.id),
+            ], shadowed_rules)
+
+class Vyos13RuleNumberTest(TestCase):
+    def test_allocateRuleNumbers(self):
+        self.assertDictEqual({'a': 10, 'b': 20, 'c': 30}, allocateRuleNumbers(['a', 'b', 'c'], {}))
+        self.assertDictEqual({'a': 10, 'x': 15, 'b': 20, 'c': 30, 'y': 40}, allocateRuleNumbers(['a', 'x', 'b', 'c', 'y'], {'a': 10, 'b': 20, 'c': 30, 'removed': 25}))
+        # a moved rule gets a new number, the others keep theirs
+        self.assertDictEqual({'a': 10, 'c': 15, 'b': 20}, allocateRuleNumbers(['a', 'c', 'b'], {'a': 10, 'b': 20, 'c': 30}))
+        self.assertDictEqual({'x': 5, 'a': 10, 'y': 12, 'z': 14, 'b': 16, 'c': 20}, allocateRuleNumbers(['x', 'a', 'y', 'z', 'b', 'c'], {'a': 10, 'b': 16, 'c': 20}))
+        # no gap left, the chain is renumbered
+        self.assertDictEqual({'a': 10, 'x': 20, 'b': 30}, allocateRuleNumbers(['a', 'x', 'b'], {'a': 10, 'b': 11}))
+        numbers = allocateRuleNumbers(['a', 'b', 'c'], {'a': MAX_RULE_NUMBER - 2})
+        self.assertListEqual([MAX_RULE_NUMBER - 2, MAX_RULE_NUMBER - 1, MAX_RULE_NUMBER], [numbers['a'], numbers['b'], numbers['c']])
+
+    def test_generateFirewallConfigStableNumbers(self):
+        router = basic_models.Vyos13Router.objects.create(name="A", loopback='127.0.1.1', deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+        customer = customer_models.Customer.objects.create(name='B')
+        network = network_models.Network.objects.create(ipv4_network_address='10.20.30.0', ipv4_network_bits=24, layer2_network_id=38, owner=customer, name='net', state=OWNED_OBJECT_STATE_LIVE)
+        network_models.ManagedInterface.objects.create(ipv4_address='10.20.30.1', router=router, network=network)
+        firewall = firewall_models.Firewall.objects.create(name='fw', stateful=True, related_network=network, default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset = firewall_models.RuleSet.objects.create(priority=10, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset.firewalls.add(firewall)
+        source = firewall_models.CIDRAddressObject.objects.create(owner=customer, public=False, name='clients', ipv4_network_address='10.1.0.0', ipv4_network_bits=16, state=OWNED_OBJECT_STATE_LIVE)
+        destination = firewall_models.NetworkAddressObject.objects.create(owner=customer, public=False, name='net', related_network=network, state=OWNED_OBJECT_STATE_LIVE)
+        def add_rule(priority, port):
+            service = firewall_models.SimpleServiceObject.objects.create(owner=customer, public=False, name='port %d' % port, protocol='tcp', port=port, state=OWNED_OBJECT_STATE_LIVE)
+            return firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=priority, disable=False, source_address=source, destination_address=destination, destination_service=service, log=False, action=firewall_models.ACTION_ACCEPT, state=OWNED_OBJECT_STATE_LIVE)
+        for i in range(1, 6):
+            add_rule(i * 10, 1000 + i)
+        fw_into_name = ('autogen_into_'+str(firewall.id)+'_fw')[:27]
+
+        # previews don't persist numbers
+        generateFirewallConfig(router)
+        self.assertFalse(firewall_models.FirewallRuleNumber.objects.exists())
+        (old_cfg, _, _) = generateFirewallConfig(router, persist_rule_numbers=True)
+        add_rule(5, 80)
+        self.assertDictEqual(old_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config['10'], generateFirewallConfig(router)[0].getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config['10'])
+        (new_cfg, _, _) = generateFirewallConfig(router, persist_rule_numbers=True)
+        old_rules = old_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config
+        new_rules = new_cfg.getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config
+        self.assertListEqual(['5'], [number for number in new_rules if not number in old_rules])
+        self.assertEqual('80', new_rules['5']['destination']['port'])
+        for (number, rule) in old_rules.items():
+            self.assertEqual(rule, new_rules[number])
+
+        # regenerating keeps all numbers, removing a rule releases its number
+        self.assertDictEqual(new_rules, generateFirewallConfig(router, persist_rule_numbers=True)[0].getSubConfig(['firewall', 'name', fw_into_name, 'rule']).config)
+        firewall_models.BasicRule.objects.filter(priority=30).delete()
+        generateFirewallConfig(router, persist_rule_numbers=True)
+        self.assertSetEqual({5, 10, 20, 40, 50}, set(firewall_models.FirewallRuleNumber.objects.filter(firewall_uuid=firewall.uuid, direction=firewall_models.DIRECTION_INTO).values_list('number', flat=True)))
+
+class Vyos13CompiledRuleSetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generateFirewallConfigCompilesSharedRuleSetOnce(self):
+        customer = customer_models.Customer.objects.create(name='B')
+        network = network_models.Network.objects.create(ipv4_network_address='10.20.30.0', ipv4_network_bits=24, layer2_network_id=38, owner=customer, name='net', state=OWNED_OBJECT_STATE_LIVE)
+        routers = []
+        for i in range(3):
+            router = basic_models.Vyos13Router.objects.create(name='router %d' % i, loopback='127.0.1.%d' % (i + 1), deploy=False, token='1234', fingerprint='5678', managed_interface_context=['interfaces', 'ethernet', 'eth0'])
+            network_models.ManagedInterface.objects.create(ipv4_address='10.20.30.%d' % (i + 1), router=router, network=network)
+            routers.append(router)
+        firewall = firewall_models.Firewall.objects.create(name='fw', stateful=False, related_network=network, default_action_into=firewall_models.ACTION_DROP, default_action_from=firewall_models.ACTION_ACCEPT, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset = firewall_models.RuleSet.objects.create(priority=10, owner=customer, public=False, state=OWNED_OBJECT_STATE_LIVE)
+        ruleset.firewalls.add(firewall)
+        source = firewall_models.HostAddressObject.objects.create(owner=customer, public=False, name='client', ipv4_address='10.1.2.3', state=OWNED_OBJECT_STATE_LIVE)
+        destination = firewall_models.NetworkAddressObject.objects.create(owner=customer, public=False, name='net', related_network=network, state=OWNED_OBJECT_STATE_LIVE)
+        rule = firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=1, disable=False, source_address=source, destination_address=destination, log=False, action=firewall_models.ACTION_ACCEPT, state=OWNED_OBJECT_STATE_LIVE)
+        fw_into_name = ('autogen_into_'+str(firewall.id)+'_fw')[:27]
+
+        with mock.patch.object(vyos13_adapter, 'compileRuleSet', wraps=vyos13_adapter.compileRuleSet) as compile_ruleset:
+            configs = [generateFirewallConfig(router)[0] for router in routers]
+            self.assertEqual(1, compile_ruleset.call_count)
+            for config in configs:
+                self.assertEqual({'source': {'address': '10.1.2.3'}, 'destination': {'address': '10.20.30.0/24'}, 'action': 'accept'}, config.getSubConfig(['firewall', 'name', fw_into_name, 'rule', '10']).config)
+
+            # changed objects invalidate the compiled rulesets
+            rule.action = firewall_models.ACTION_DROP
+            rule.save()
+            self.assertEqual('drop', generateFirewallConfig(routers[0])[0].getSubConfig(['firewall', 'name', fw_into_name, 'rule', '10']).config['action'])
+            self.assertEqual(2, compile_ruleset.call_count)
+            vyos13_adapter.invalidateAfterChangeset([])
+            generateFirewallConfig(routers[0])
+            self.assertEqual(3, compile_ruleset.call_count)
+
+            # the version is shared through the database, e.g. changed by another process
+            firewall_models.CompiledRuleSetVersion.objects.filter(pk=1).update(version=F('version') + 1)
+            generateFirewallConfig(routers[0])
+            self.assertEqual(4, compile_ruleset.call_count)
+
+            # objects prepared in a changeset don't invalidate the cache
+            version = vyos13_adapter.getCompiledRuleSetVersion()
+            firewall_models.BasicRule.objects.create(related_ruleset=ruleset, priority=2, disable=False, source_address=source, destination_address=destination, log=False, action=firewall_models.ACTION_ACCEPT, state=OWNED_OBJECT_STATE_PREPARED)
+            self.assertEqual(version, vyos13_adapter.getCompiledRuleSetVersion())
+            generateFirewallConfig(routers[0])
+            self.assertEqual(4, compile_ruleset.call_count)
+
+            with self.settings(VYCINITY_COMPILED_RULESET_CACHE_TTL=0):
+                generateFirewallConfig(routers[0])
+                generateFirewallConfig(routers[0])
+            self.assertEqual(6, compile_ruleset.call_count)
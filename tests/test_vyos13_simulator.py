@@ -0,0 +1,63 @@
+# This file is part of VyCinity.
+#
+# VyCinity is free software: you can redistribute it and/or modify it under the
+# terms of the GNU Affero General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# VyCinity is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU Affero General Public License for more
+# details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
+
+import copy
+import unittest
+from vycinity.benchmarks.vyos13_simulator import SimulatedRouterSettings, Vyos13Simulator
+from vycinity.s42.routerconfig import RouterCommunicationError
+from vycinity.s42.routerconfig.vyos13 import Vyos13Router, Vyos13RouterConfig
+
+class Vyos13SimulatorTest(unittest.TestCase):
+    def setUp(self):
+        self.simulator = Vyos13Simulator()
+
+    def tearDown(self):
+        self.simulator.stop()
+
+    def start_router(self, **kwargs):
+        (address, simulated_router) = self.simulator.add_router('127.0.0.1', 0, SimulatedRouterSettings(**kwargs))
+        return (Vyos13Router('http://%s:%d' % address, simulated_router.settings.api_key, False), simulated_router)
+
+    def test_config_roundtrip(self):
+        (router, simulated_router) = self.start_router(initial_config={'system': {'host-name': 'vyos'}})
+        wanted = {'name': {'fw1': {'default-action': 'drop', 'rule': {'10': {'action': 'accept', 'destination': {'port': '22'}}}}}}
+        router.putConfig(Vyos13RouterConfig(['firewall'], copy.deepcopy(wanted)))
+        self.assertEqual({'system': {'host-name': 'vyos'}, 'firewall': wanted}, router.getConfig().config)
+
+        router.putConfig(Vyos13RouterConfig(['firewall'], {'name': {'fw1': {'default-action': 'accept'}}}))
+        self.assertEqual({'name': {'fw1': {'default-action': 'accept'}}}, router.getConfig().config['firewall'])
+        self.assertEqual(2, simulated_router.configure_count)
+
+    def test_payload(self):
+        (router, _) = self.start_router(payload_entries=300)
+        self.assertEqual(300, len(router.getConfig().config['firewall']['group']['address-group']))
+
+    def test_failure_injection(self):
+        (router, simulated_router) = self.start_router(configure_failure_rate=1.0)
+        with self.assertRaises(RouterCommunicationError):
+            router.putConfig(Vyos13RouterConfig(['system'], {'host-name': 'failing'}))
+        self.assertEqual({}, router.getConfig().config)
+        self.assertEqual(1, simulated_router.failed_count)
+
+        (router, _) = self.start_router(retrieve_failure_rate=1.0)
+        with self.assertRaises(RouterCommunicationError):
+            router.getConfig()
+
+    def test_wrong_key(self):
+        (_, simulated_router) = self.start_router()
+        (address, _) = list(self.simulator.routers().items())[0]
+        with self.assertRaises(RouterCommunicationError):
+            Vyos13Router('http://%s:%d' % address, 'wrong', False).getConfig()
+        self.assertEqual(0, simulated_router.retrieve_count)
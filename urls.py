@@ -36,8 +36,11 @@ urlpatterns = [
     path('deployments/<uuid:id>', basic_views.DeploymentDetail.as_view()),
     path('customers', customer_views.CustomerList.as_view()),
     path('customers/<uuid:pk>', customer_views.CustomerDetailView.as_view()),
+    path('customers/<uuid:pk>/export', customer_views.CustomerExportView.as_view()),
     path('changesets', change_views.ChangeSetList.as_view()),
     path('changesets/<uuid:id>', change_views.ChangeSetDetailView.as_view()),
+    path('changesets/<uuid:id>/bulk', change_views.ChangeSetBulkView.as_view()),
+    path('changesets/<uuid:id>/import', change_views.ChangeSetImportView.as_view()),
     # Not ready to use yet
     #path('changes', change_views.ChangeList.as_view()),
     #path('changes/<uuid:id>', change_views.ChangeDetailView.as_view()),
@@ -15,7 +15,7 @@
 
 from abc import ABC, abstractmethod
 from django.http import Http404, HttpResponseForbidden
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from rest_framework import exceptions, status
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.views import APIView
@@ -25,6 +25,8 @@ from rest_framework.schemas.openapi import AutoSchema
 from rest_framework.serializers import Serializer, ValidationError
 from vycinity.models import OWNED_OBJECT_STATE_DELETED, OWNED_OBJECT_STATE_PREPARED, customer_models, change_models, AbstractOwnedObject, OWNED_OBJECT_STATE_LIVE
 from vycinity.permissions import IsOwnerOfObjectOrPublicObject
+from vycinity.serializers.firewall_serializers import get_reference_fields
+from vycinity.views.helpers import CursorModifiableSizePagination, conditional_response
 from typing import Any, List, Dict, Optional, Type
 from uuid import UUID
 
@@ -54,11 +56,29 @@ class GenericSchema(AutoSchema):
 
 class GenericOwnedObjectList(ListCreateAPIView, ABC):
     permission_classes = [IsOwnerOfObjectOrPublicObject]
+    pagination_class = CursorModifiableSizePagination
+    ordering = 'pk'
 
     @abstractmethod
     def get_model(self) -> Type[AbstractOwnedObject]:
         raise NotImplementedError('Model is not set.')
 
+    def load_references(self, query):
+        '''
+        Loads the owned objects referenced by the listed objects together with their owners, so
+        serializing a page doesn't query per reference. References are loaded non-polymorphically,
+        as the serializers only need their uuid and visibility.
+        '''
+        reference_fields = get_reference_fields(self.get_serializer_class())
+        query = query.select_related(*[related for (name, (_, many)) in reference_fields.items() if not many for related in [name, name + '__owner']])
+        return query.prefetch_related(*[Prefetch(name, queryset=model.objects.non_polymorphic().select_related('owner')) for (name, (model, many)) in reference_fields.items() if many])
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self, 'visible_customers'):
+            context['visible_customers'] = self.visible_customers
+        return context
+
     def get_queryset(self):
         '''
         Overrides ListCreateAPIView.get_queryset(). Returns a queryset including the current changeset.
@@ -68,16 +88,17 @@ class GenericOwnedObjectList(ListCreateAPIView, ABC):
 
         request: Request = self.request # type: ignore
         visible_customers = request.user.customer.get_visible_customers()
+        self.visible_customers = visible_customers
         if 'changeset' in request.query_params:
             try:
                 changeset = change_models.ChangeSet.objects.get(pk=UUID(self.request.GET['changeset']), owner__in=visible_customers)
-                return self.get_model().filter_by_changeset_and_visibility(query=self.get_model().objects.all(), changeset=changeset, visible_customers=visible_customers)
+                return self.load_references(self.get_model().filter_by_changeset_and_visibility(query=self.get_model().objects.all(), changeset=changeset, visible_customers=visible_customers))
             except ValueError as e:
                 raise e
             except change_models.ChangeSet.DoesNotExist as e:
                 raise Http404 from e
         else:
-            return self.get_model().filter_query_by_customers_or_public(self.get_model().objects.filter(state=OWNED_OBJECT_STATE_LIVE), visible_customers)
+            return self.load_references(self.get_model().filter_query_by_customers_or_public(self.get_model().objects.filter(state=OWNED_OBJECT_STATE_LIVE), visible_customers))
 
 
 class GenericOwnedObjectDetail(RetrieveUpdateDestroyAPIView):
@@ -98,10 +119,11 @@ class GenericOwnedObjectDetail(RetrieveUpdateDestroyAPIView):
 
         request: Request = self.request # type: ignore
         visible_customers = request.user.customer.get_visible_customers()
+        self.changeset = None
         if 'changeset' in request.query_params:
             try:
-                changeset = change_models.ChangeSet.objects.get(pk=UUID(self.request.GET['changeset']), owner__in=visible_customers)
-                return self.get_model().filter_by_changeset_and_visibility(query=self.get_model().objects.all(), changeset=changeset, visible_customers=visible_customers)
+                self.changeset = change_models.ChangeSet.objects.get(pk=UUID(self.request.GET['changeset']), owner__in=visible_customers)
+                return self.get_model().filter_by_changeset_and_visibility(query=self.get_model().objects.all(), changeset=self.changeset, visible_customers=visible_customers)
             except ValueError as e:
                 raise e
             except change_models.ChangeSet.DoesNotExist as e:
@@ -109,6 +131,25 @@ class GenericOwnedObjectDetail(RetrieveUpdateDestroyAPIView):
         else:
             return self.get_model().filter_query_by_customers_or_public(self.get_model().objects.filter(state=OWNED_OBJECT_STATE_LIVE), visible_customers)
 
+    def get_etag(self, instance: AbstractOwnedObject) -> str:
+        '''
+        Returns the ETag of an owned object. Modifying a live object creates a new row, so uuid,
+        primary key and state identify a version. Objects prepared in a changeset are modified in
+        place, for them the modification time of the changeset is included.
+        '''
+        etag = '{}-{}-{}'.format(instance.uuid, instance.pk, instance.state)
+        if self.changeset is not None:
+            etag += '-{}'.format(self.changeset.modified.isoformat())
+        return etag
+
+    def retrieve(self, request, *args, **kwargs):
+        '''
+        Overrides RetrieveUpdateDestroyAPIView.retrieve(). Answers with "304 Not Modified" if the
+        ETag given by `If-None-Match` is still valid, without serializing the object.
+        '''
+        instance = self.get_object()
+        return conditional_response(request, self.get_etag(instance), lambda: Response(self.get_serializer(instance).data))
+
 
     def destroy(self, request, *args, **kwargs):
         '''
@@ -13,19 +13,40 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+from django.db.models import Prefetch, TextField
+from django.db.models.functions import Cast
 from django.http import Http404
 from rest_framework import permissions
 from rest_framework.generics import ListCreateAPIView, ListAPIView, RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from vycinity.models.basic_models import Router, Vyos13LiveRouterConfig, Vyos13Router, Vyos13StaticConfigSection, Vyos13RouterConfig, Deployment, DEPLOYMENT_STATE_PREPARATION, DEPLOYMENT_STATE_READY
+from vycinity.models.basic_models import Router, RouterConfig, Vyos13LiveRouterConfig, Vyos13Router, Vyos13StaticConfigSection, Vyos13RouterConfig, Deployment, DEPLOYMENT_STATE_PREPARATION, DEPLOYMENT_STATE_READY
 from vycinity.permissions import IsRootCustomer
 from vycinity.s42.adapter import vyos13 as Vyos13Adapter
 from vycinity.s42.routerconfig import vyos13 as Vyos13ConfigEntities
 from vycinity.serializers.basic_serializers import Vyos13LiveRouterConfigSerializer, Vyos13RouterSerializer, Vyos13StaticConfigSectionSerializer, Vyos13RouterConfigSerializer, DeploymentSerializer, Vyos13RouterConfigDiffSerializer
 from vycinity.tasks import deploy, retrieve_vyos13_live_router_config
 from vycinity.views import GenericSchema
+from vycinity.views.helpers import CursorModifiableSizePagination, FieldSelectionMixin, RawJSON, StreamingJSONResponse, conditional_response, is_streaming_accepted, parse_field_selection
+
+
+def stream_config(queryset, serializer_class, **lookup) -> StreamingJSONResponse:
+    '''
+    Streams a stored configuration together with the other fields of its serializer. The
+    configuration is read from the database as serialized JSON and written to the response without
+    parsing it.
+
+    params:
+        queryset: The queryset of the configuration model, which has a `config` field.
+        serializer_class: The serializer for the fields besides the configuration.
+        lookup: The filter selecting a single configuration.
+    returns: The streaming response.
+    '''
+    instance = queryset.non_polymorphic().defer('config').annotate(config_json=Cast('config', output_field=TextField())).get(**lookup)
+    content = dict(serializer_class(instance, context={'expand': set()}).data)
+    content['config'] = RawJSON(instance.config_json)
+    return StreamingJSONResponse(content)
 
 
 class Vyos13RouterList(APIView):
@@ -77,7 +98,7 @@ class Vyos13RouterDetailView(APIView):
                 if trigger_deploy == True and result.deploy:
                     deployment = Deployment(change='changed router', state=DEPLOYMENT_STATE_PREPARATION)
                     deployment.save()
-                    generated_config = Vyos13Adapter.generateConfig(result)
+                    generated_config = Vyos13Adapter.generateConfig(result, persist_rule_numbers=True)
                     config = Vyos13RouterConfig.objects.create(router=result, config=generated_config.config)
                     deployment.configs.add(config)
                     deployment.state = DEPLOYMENT_STATE_READY
@@ -108,7 +129,7 @@ class Vyos13RouterDeployView(APIView):
         try:
             result = Vyos13Router.objects.get(pk=id)
             deployment = Deployment.objects.create(change='triggered router', state=DEPLOYMENT_STATE_PREPARATION)
-            generated_config = Vyos13Adapter.generateConfig(result)
+            generated_config = Vyos13Adapter.generateConfig(result, persist_rule_numbers=True)
             config = Vyos13RouterConfig.objects.create(router=result, config=generated_config.config)
             deployment.configs.add(config)
             deployment.state = DEPLOYMENT_STATE_READY
@@ -119,20 +140,24 @@ class Vyos13RouterDeployView(APIView):
         except (Vyos13Router.DoesNotExist):
             raise Http404()
 
-class Vyos13RouterLiveConfigListView(ListCreateAPIView):
+class Vyos13RouterLiveConfigListView(FieldSelectionMixin, ListCreateAPIView):
     '''
-    Display and retrieval of live configuration from a vyos13 router. Retrieval is paginated.
+    Display and retrieval of live configuration from a vyos13 router. Retrieval is paginated. The
+    configuration itself is only included with `?expand=config`.
     '''
     schema = GenericSchema(serializer=Vyos13LiveRouterConfigSerializer, tags=['router', 'vyos 1.3'], operation_id_base='Vyos13LiveRouterConfig', component_name='Vyos13LiveRouterConfig')
     permission_classes = [IsRootCustomer]
     serializer_class = Vyos13LiveRouterConfigSerializer
+    pagination_class = CursorModifiableSizePagination
+    ordering = '-created'
+    deferrable_fields = ['config']
 
     def get_queryset(self):
         router_id = self.kwargs['router_id']
         try:
             router = Vyos13Router.objects.get(pk=router_id)
-            configs = Vyos13LiveRouterConfig.objects.filter(router=router).order_by('-retrieved')
-            return configs
+            configs = Vyos13LiveRouterConfig.objects.filter(router=router).order_by('-created')
+            return self.defer_unselected(configs)
         except (Vyos13Router.DoesNotExist):
             raise Http404()
     
@@ -152,14 +177,24 @@ class Vyos13RouterLiveConfigListView(ListCreateAPIView):
 
 class Vyos13RouterLiveConfigDetailView(APIView):
     '''
-    Display of live configuration from a vyos13 router
+    Display of live configuration from a vyos13 router. JSON responses are streamed. The ETag is
+    based on the content hash of the configuration.
     '''
     schema = GenericSchema(serializer=Vyos13LiveRouterConfigSerializer, tags=['router', 'vyos 1.3'], operation_id_base='Vyos13LiveRouterConfig', component_name='Vyos13LiveRouterConfig')
     permission_classes = [IsRootCustomer]
 
     def get(self, request, router_id, lrc_id, format=None):
+        try:
+            config_hash = Vyos13LiveRouterConfig.objects.non_polymorphic().filter(router_id=router_id).values_list('config_hash', flat=True).get(pk=lrc_id)
+        except Vyos13LiveRouterConfig.DoesNotExist:
+            raise Http404()
+        return conditional_response(request, config_hash or 'pending', lambda: self.get_response(request, router_id, lrc_id))
+
+    def get_response(self, request, router_id, lrc_id):
         try:
             router = Vyos13Router.objects.get(pk=router_id)
+            if is_streaming_accepted(request):
+                return stream_config(Vyos13LiveRouterConfig.objects, Vyos13LiveRouterConfigSerializer, pk=lrc_id, router=router)
             lrc = Vyos13LiveRouterConfig.objects.get(pk=lrc_id)
             if (lrc.router != router):
                 raise Vyos13LiveRouterConfig.DoesNotExist()
@@ -170,7 +205,7 @@ class Vyos13RouterLiveConfigDetailView(APIView):
 
 class Vyos13RouterConfigDiffDetailView(APIView):
     '''
-    Display of diff to live configuration from a vyos13 router. Left side of the diff is the part, which will be removed, right side ist the part that will be added, when deploying.
+    Display of diff to live configuration from a vyos13 router. Left side of the diff is the part, which will be removed, right side ist the part that will be added, when deploying. JSON responses are streamed.
     '''
     schema = GenericSchema(serializer=Vyos13RouterConfigDiffSerializer, tags=['router', 'vyos 1.3'], operation_id_base='Vyos13LiveRouterConfig', component_name='Vyos13LiveRouterConfig')
     permission_classes = [IsRootCustomer]
@@ -186,7 +221,10 @@ class Vyos13RouterConfigDiffDetailView(APIView):
             if lrc.config is None:
                 return Response(data={'message': 'router config is not available yet'}, status=status.HTTP_400_BAD_REQUEST)
             retrieved_config = Vyos13ConfigEntities.Vyos13RouterConfig([], lrc.config)
-            serializer = Vyos13RouterConfigDiffSerializer(retrieved_config.diff(generated_config))
+            diff = retrieved_config.diff(generated_config)
+            if is_streaming_accepted(request):
+                return StreamingJSONResponse({'left': diff.left, 'right': diff.right})
+            serializer = Vyos13RouterConfigDiffSerializer(diff)
             return Response(serializer.data)
         except (Vyos13Router.DoesNotExist, Vyos13LiveRouterConfig.DoesNotExist):
             raise Http404()
@@ -227,7 +265,7 @@ class Vyos13StaticConfigSectionDetail(APIView):
                 deployment = Deployment(state=DEPLOYMENT_STATE_PREPARATION, change='change static_config_section')
                 deployment.save()
                 for router in routers:
-                    generated_config = Vyos13Adapter.generateConfig(router)
+                    generated_config = Vyos13Adapter.generateConfig(router, persist_rule_numbers=True)
                     config = Vyos13RouterConfig(router=router, config=generated_config.config)
                     config.save()
                     deployment.configs.add(config)
@@ -250,20 +288,32 @@ class Vyos13StaticConfigSectionDetail(APIView):
             raise Http404()
 
 
-class DeploymentList(ListAPIView):
+class DeploymentList(FieldSelectionMixin, ListAPIView):
     '''
     get:
-        Retrieve information about triggered deployments to routers.
+        Retrieve information about triggered deployments to routers. Configurations are listed by
+        their ids, `?expand=configs` returns a summary of each configuration instead.
     '''
     schema = GenericSchema(serializer=DeploymentSerializer, tags=['deployment'], operation_id_base='Deployment', component_name='Deployment')
     permission_classes = [IsRootCustomer]
-    queryset = Deployment.objects.all()
     serializer_class = DeploymentSerializer
+    pagination_class = CursorModifiableSizePagination
+    ordering = '-triggered'
+
+    def get_queryset(self):
+        (fields, expand) = parse_field_selection(self.request)
+        deployments = Deployment.objects.order_by('-triggered')
+        if fields is not None and 'configs' not in fields:
+            return deployments
+        if 'configs' in expand:
+            return deployments.prefetch_related(Prefetch('configs', queryset=Vyos13RouterConfig.objects.defer('config')))
+        return deployments.prefetch_related(Prefetch('configs', queryset=RouterConfig.objects.non_polymorphic().only('id')))
 
 class DeploymentDetail(RetrieveAPIView):
     '''
     get:
-        Retrieve information about triggered deployments to routers.
+        Retrieve information about triggered deployments to routers. The ETag is based on the time
+        of the last update.
     '''
     schema = GenericSchema(serializer=DeploymentSerializer, tags=['deployment'], operation_id_base='Deployment', component_name='Deployment')
     permission_classes = [IsRootCustomer]
@@ -271,21 +321,35 @@ class DeploymentDetail(RetrieveAPIView):
     queryset = Deployment.objects.all()
     serializer_class = DeploymentSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            last_update = Deployment.objects.non_polymorphic().values_list('last_update', flat=True).get(pk=kwargs[self.lookup_field])
+        except Deployment.DoesNotExist:
+            raise Http404()
+        return conditional_response(request, last_update.isoformat(), lambda: super(DeploymentDetail, self).retrieve(request, *args, **kwargs))
+
 
-class Vyos13RouterConfigList(ListAPIView):
+class Vyos13RouterConfigList(FieldSelectionMixin, ListAPIView):
     '''
     get:
-        The list for configuration for VyOS 1.3 routers
+        The list for configuration for VyOS 1.3 routers. The configuration itself is only included
+        with `?expand=config`.
     '''
     schema = GenericSchema(serializer=Vyos13RouterConfigSerializer, tags=['router', 'vyos 1.3', 'configuration'], operation_id_base='Vyos13RouterConfig', component_name='Vyos13RouterConfig')
     permission_classes = [IsRootCustomer]
-    queryset = Vyos13RouterConfig.objects.all()
     serializer_class = Vyos13RouterConfigSerializer
+    pagination_class = CursorModifiableSizePagination
+    ordering = '-created'
+    deferrable_fields = ['config']
+
+    def get_queryset(self):
+        return self.defer_unselected(Vyos13RouterConfig.objects.order_by('-created'))
 
 class Vyos13RouterConfigDetail(RetrieveAPIView):
     '''
     get:
-        A specific configuration for a VyOS 1.3 router
+        A specific configuration for a VyOS 1.3 router. JSON responses are streamed. The ETag is the
+        content hash of the configuration.
     '''
     schema = GenericSchema(serializer=Vyos13RouterConfigSerializer, tags=['router', 'vyos 1.3', 'configuration'], operation_id_base='Vyos13RouterConfig', component_name='Vyos13RouterConfig')
     permission_classes = [IsRootCustomer]
@@ -293,3 +357,18 @@ class Vyos13RouterConfigDetail(RetrieveAPIView):
     queryset = Vyos13RouterConfig.objects.all()
     serializer_class = Vyos13RouterConfigSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            config_hash = self.get_queryset().non_polymorphic().values_list('config_hash', flat=True).get(pk=kwargs[self.lookup_field])
+        except Vyos13RouterConfig.DoesNotExist:
+            raise Http404()
+        return conditional_response(request, config_hash, lambda: self.get_response(request, *args, **kwargs))
+
+    def get_response(self, request, *args, **kwargs):
+        if not is_streaming_accepted(request):
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            return stream_config(self.get_queryset(), Vyos13RouterConfigSerializer, pk=kwargs[self.lookup_field])
+        except Vyos13RouterConfig.DoesNotExist:
+            raise Http404()
+
@@ -19,7 +19,8 @@ from rest_framework.schemas.openapi import AutoSchema
 from rest_framework.views import APIView
 from vycinity.models import change_models
 from vycinity.serializers import change_serializers
-from vycinity.meta import change_management
+from vycinity.meta import bulk_changes, change_management, object_transfer
+from vycinity.views.helpers import CursorModifiableSizePagination, paginated_response
 
 class ChangeSetListSchema(AutoSchema):
     '''
@@ -41,7 +42,7 @@ class ChangeSetList(APIView):
     A changeset is a collection of changes.
 
     get:
-    Retrieve changesets.
+    Retrieve changesets, newest first. The result is paginated.
 
     post:
     Create an empty changeset.
@@ -49,10 +50,12 @@ class ChangeSetList(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
     schema = ChangeSetListSchema(tags=['changeset'], operation_id_base='ChangeSet', component_name='ChangeSet')
+    pagination_class = CursorModifiableSizePagination
+    ordering = '-created'
 
     def get(self, request, format=None):
-        change_sets = change_models.ChangeSet.objects.filter(owner__in=request.user.customer.get_visible_customers())
-        return Response(change_serializers.ChangeSetSerializer(change_sets, many=True).data)
+        change_sets = change_models.ChangeSet.objects.filter(owner__in=request.user.customer.get_visible_customers()).order_by('-created')
+        return paginated_response(self, change_sets, change_serializers.ChangeSetSerializer)
 
     def post(self, request, format=None):
         new_changeset = change_models.ChangeSet(owner=request.user.customer, user=request.user, owner_name=request.user.customer.name, user_name=request.user.name)
@@ -113,6 +116,84 @@ class ChangeSetDetailView(APIView):
             raise Response({'general': 'Not Found.'}, status=status.HTTP_404_NOT_FOUND)
 
 
+class ChangeSetBulkView(APIView):
+    '''
+    post:
+    Create, modify and delete many objects within a changeset in a single transaction. The request
+    contains lists `create`, `update` and `delete`. Each entry has the `type` of the object (e.g.
+    `RuleSet`) and its `uuid`, creations and modifications additionally have the `data` of the
+    object. The `uuid` of a new object may be chosen by the client, so other entries can reference
+    it. If any entry is invalid, nothing is changed and the errors are returned by position.
+    '''
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, id, format=None):
+        try:
+            changeset = change_models.ChangeSet.objects.get(pk=id)
+        except change_models.ChangeSet.DoesNotExist:
+            return Response({'general': 'Not Found.'}, status=status.HTTP_404_NOT_FOUND)
+        if not changeset.owner in request.user.customer.get_visible_customers():
+            return Response({'general': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+        if changeset.applied is not None:
+            return Response({'general': 'Changeset is already applied.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(request.data, dict):
+            return Response({'general': 'Expected an object.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        operations = {}
+        errors = {}
+        for (kind, require_data) in [('create', True), ('update', True), ('delete', False)]:
+            (operations[kind], kind_errors) = bulk_changes.parse_operations(kind, request.data.get(kind), require_data)
+            if len(kind_errors) > 0:
+                errors[kind] = kind_errors
+        if len(errors) > 0:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        if sum(len(kind_operations) for kind_operations in operations.values()) > bulk_changes.MAX_BULK_OPERATIONS:
+            return Response({'general': 'At most {} operations are allowed.'.format(bulk_changes.MAX_BULK_OPERATIONS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            result = bulk_changes.BulkChangeBuilder(changeset, request).apply(operations['create'], operations['update'], operations['delete'])
+        except bulk_changes.BulkChangeError as bce:
+            return Response(bce.errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'changeset': changeset.id, 'created': result.created, 'modified': result.modified, 'deleted': result.deleted})
+
+
+class ChangeSetImportView(APIView):
+    '''
+    post:
+    Import newline delimited JSON as exported by `/customers/<id>/export` into a changeset. All
+    objects are assigned to the customer given by the query parameter `owner`, the current customer
+    by default. The objects get new uuids, references between them are kept, so an export may be
+    imported into the installation it was created by. If any line is invalid, nothing is imported
+    and the errors are returned by line number.
+    '''
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, id, format=None):
+        try:
+            changeset = change_models.ChangeSet.objects.get(pk=id)
+        except change_models.ChangeSet.DoesNotExist:
+            return Response({'general': 'Not Found.'}, status=status.HTTP_404_NOT_FOUND)
+        visible_customers = request.user.customer.get_visible_customers()
+        if not changeset.owner in visible_customers:
+            return Response({'general': 'Access denied.'}, status=status.HTTP_403_FORBIDDEN)
+        if changeset.applied is not None:
+            return Response({'general': 'Changeset is already applied.'}, status=status.HTTP_400_BAD_REQUEST)
+        owner = request.user.customer
+        if 'owner' in request.query_params:
+            owner = next((customer for customer in visible_customers if str(customer.id) == request.query_params['owner']), None)
+            if owner is None:
+                return Response({'owner': ['Owner is not accessible by current user.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # read the body line by line instead of parsing it as a whole
+            imported = object_transfer.ObjectImporter(changeset, request, owner).import_lines(request._request)
+        except bulk_changes.BulkChangeError as bce:
+            return Response({'lines': bce.errors.get('create', {})}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'changeset': changeset.id, 'imported': imported})
+
+
 class ChangeList(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -13,12 +13,16 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
+from django.http import StreamingHttpResponse
 from rest_framework import permissions
-from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
+from rest_framework.renderers import JSONRenderer
 from rest_framework.request import Request
 from rest_framework.schemas.openapi import AutoSchema
+from vycinity.meta import object_transfer
 from vycinity.models.customer_models import Customer, User
 from vycinity.serializers.customer_serializers import CustomerSerializer
+from vycinity.views.helpers import NDJSONRenderer
 
 class CustomerSchema(AutoSchema):
     def get_serializer(self, path, method):
@@ -67,4 +71,22 @@ class CustomerDetailView(RetrieveUpdateDestroyAPIView):
     schema = CustomerSchema(tags=['customer'], operation_id_base='Customer', component_name='Customer')
     permission_classes = [IsOwnedCustomerForReadAndNotSameForWrite]
     serializer_class = CustomerSerializer
-    queryset = Customer.objects.all()
\ No newline at end of file
+    queryset = Customer.objects.all()
+
+
+class CustomerExportView(GenericAPIView):
+    '''
+    get:
+        Exports all live owned objects of a customer as newline delimited JSON (one object per
+        line). The export can be imported into a changeset by `/changesets/<id>/import`.
+    '''
+    schema = None
+    permission_classes = [IsOwnedCustomerForReadAndNotSameForWrite]
+    renderer_classes = [NDJSONRenderer, JSONRenderer]
+    queryset = Customer.objects.all()
+
+    def get(self, request, pk, format=None):
+        customer = self.get_object()
+        response = StreamingHttpResponse(object_transfer.export_objects(customer, request), content_type=NDJSONRenderer.media_type)
+        response['Content-Disposition'] = 'attachment; filename="{}.ndjson"'.format(customer.id)
+        return response
@@ -451,7 +451,7 @@ class ListServiceObjectList(GenericOwnedObjectList):
     def get_model(self):
         return models.ListServiceObject
     
-    def get_serializer(self):
+    def get_serializer_class(self):
         return serializers.ListServiceObjectSerializer
 
 
@@ -13,8 +13,199 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with VyCinity. If not, see <https://www.gnu.org/licenses/>.
 
-from rest_framework.pagination import PageNumberPagination
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.serializers import Serializer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type
+
+STREAMING_CHUNK_SIZE = 64 * 1024
+'''
+Size of the chunks written by a `StreamingJSONResponse`, in characters.
+'''
 
 class PageNumberModifiableSizePagination(PageNumberPagination):
     page_size_query_param = 'page_size'
-    max_page_size = 1000
\ No newline at end of file
+    max_page_size = 1000
+
+class CursorModifiableSizePagination(CursorPagination):
+    '''
+    Keyset pagination: the next page is selected by the position of the last element instead of an
+    offset, so deep pages are as cheap as the first one. The view defines the ordering by its
+    attribute `ordering`, which should be an indexed column that does not change, like the primary
+    key or a creation time.
+    '''
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None)
+        if ordering is None:
+            return super().get_ordering(request, queryset, view)
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
+
+def paginated_response(view, queryset, serializer_class: Type[Serializer]) -> Response:
+    '''
+    Paginates a queryset for views not based on the generic views of DRF, using the pagination
+    class of the view.
+
+    params:
+        view: The APIView handling the current request.
+        queryset: The queryset to paginate.
+        serializer_class: The serializer for the elements of the page.
+    returns: The paginated response or the complete list, if pagination is disabled.
+    '''
+    paginator = view.pagination_class() if view.pagination_class is not None else None
+    page = paginator.paginate_queryset(queryset, view.request, view=view) if paginator is not None else None
+    if page is None:
+        return Response(serializer_class(queryset, many=True).data)
+    return paginator.get_paginated_response(serializer_class(page, many=True).data)
+
+
+def parse_field_selection(request: Request) -> Tuple[Optional[Set[str]], Set[str]]:
+    '''
+    Parses the query parameters `fields` and `expand`, both comma separated lists of field names.
+
+    returns: The selected fields (`None` if all fields are selected) and the expanded fields.
+    '''
+    fields = request.query_params.get('fields')
+    expand = request.query_params.get('expand', '')
+    return (
+        None if fields is None else {field.strip() for field in fields.split(',') if field.strip()},
+        {field.strip() for field in expand.split(',') if field.strip()}
+    )
+
+class FieldSelectionMixin:
+    '''
+    Mixin for list views serialized by a serializer with `SelectableFieldsMixin`. Lists return only
+    a summary by default, big fields have to be requested by `?expand=<field>`. `?fields=<a>,<b>`
+    restricts the result to the given fields.
+
+    Columns listed in `deferrable_fields` are not loaded from the database unless the field is
+    expanded and selected, use `defer_unselected()` in `get_queryset()` for this.
+    '''
+    deferrable_fields: List[str] = []
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context() # type: ignore
+        (context['fields'], context['expand']) = parse_field_selection(self.request) # type: ignore
+        return context
+
+    def defer_unselected(self, queryset):
+        (fields, expand) = parse_field_selection(self.request) # type: ignore
+        deferred_fields = [field for field in self.deferrable_fields if field not in expand or (fields is not None and field not in fields)]
+        if len(deferred_fields) > 0:
+            return queryset.defer(*deferred_fields)
+        return queryset
+
+
+class RawJSON:
+    '''
+    Already serialized JSON, which is written to a `StreamingJSONResponse` without parsing it.
+    `None` stands for `null`.
+    '''
+
+    def __init__(self, text: Optional[str]):
+        self.text = text
+
+def iter_json_object(content: Dict[str, Any]) -> Iterator[str]:
+    '''
+    Serializes a dict incrementally, values of type `RawJSON` are inserted as they are. The output
+    is formatted like the output of the JSON renderer of DRF.
+
+    returns: The fragments of the serialized object.
+    '''
+    encoder = JSONEncoder(ensure_ascii=not api_settings.UNICODE_JSON, allow_nan=not api_settings.STRICT_JSON,
+        separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '))
+    item_separator = encoder.item_separator
+    key_separator = encoder.key_separator
+    yield '{'
+    for (index, (key, value)) in enumerate(content.items()):
+        if index > 0:
+            yield item_separator
+        yield encoder.encode(str(key))
+        yield key_separator
+        if isinstance(value, RawJSON):
+            if value.text is None:
+                yield 'null'
+            else:
+                for start in range(0, len(value.text), STREAMING_CHUNK_SIZE):
+                    yield value.text[start:start + STREAMING_CHUNK_SIZE]
+        else:
+            yield from encoder.iterencode(value)
+    yield '}'
+
+def _join_chunks(fragments: Iterable[str], chunk_size: int) -> Iterator[bytes]:
+    buffer: List[str] = []
+    buffered = 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        buffered += len(fragment)
+        if buffered >= chunk_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            buffered = 0
+    if len(buffer) > 0:
+        yield ''.join(buffer).encode('utf-8')
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    '''
+    A response writing a JSON object in chunks while serializing it, instead of building the
+    complete body in memory first. Used for big router configurations.
+    '''
+
+    def __init__(self, content: Dict[str, Any], status: int = 200, chunk_size: int = STREAMING_CHUNK_SIZE):
+        super().__init__(_join_chunks(iter_json_object(content), chunk_size), status=status, content_type='application/json')
+
+class NDJSONRenderer(JSONRenderer):
+    '''
+    Renders newline delimited JSON. Streamed NDJSON bodies are written by the view, this renderer
+    allows to negotiate the media type and renders other responses (e.g. errors) as a single line.
+    '''
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    compact = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(data, accepted_media_type, renderer_context) + b'\n'
+
+def is_streaming_accepted(request: Request) -> bool:
+    '''
+    Returns whether the response to the request may be a `StreamingJSONResponse`. That is the case
+    if JSON was negotiated, other formats like the browsable API are rendered by DRF.
+    '''
+    renderer = getattr(request, 'accepted_renderer', None)
+    return renderer is not None and renderer.format == 'json'
+
+
+def conditional_response(request: Request, etag: Optional[str], build_response: Callable[[], HttpResponseBase]) -> HttpResponseBase:
+    '''
+    Answers a request with `If-None-Match` by "304 Not Modified" if the ETag of the resource is
+    still the same, without building the response. Otherwise the response is built. The ETag is
+    added to both.
+
+    params:
+        request: The current request.
+        etag: The strong ETag of the current resource, unquoted. `None` disables the conditional
+              handling.
+        build_response: Builds the complete response.
+    returns: The response to send.
+    '''
+    if etag is None:
+        return build_response()
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build_response()
+    if response.status_code in [200, 304] and not response.has_header('ETag'):
+        response['ETag'] = etag
+    return response